@@ -0,0 +1,131 @@
+"""Marketplace analytics: job volume, fill rate, time to claim and complete,
+revenue and ratings by service.
+
+Triggers (migrations.create_analytics_rollups) add every posting, claim,
+completion, payment and review to per-service counters in Analytics_Hourly
+and Analytics_Daily as it happens. The report reads only those rollups: the
+rows for the period are pulled out as columns, summed per service, day or
+hour, and the derived metrics are computed a column at a time. Its cost
+depends on the number of services and days, not on how many jobs there have
+been, so plain arrays are fast enough.
+
+GET /admin/analytics?days=30 shows the report to the users named in
+ANALYTICS_ADMINS (comma-separated usernames).
+
+Times to claim and complete are measured from the day a job was posted,
+which is only stored as a date.
+"""
+import datetime
+import os
+from array import array
+from collections import namedtuple
+
+from flask import abort, redirect, render_template, request, session
+
+import queries
+from migrations import ROLLUP_COUNTERS
+
+ADMINS = {name.strip() for name in os.environ.get("ANALYTICS_ADMINS", "").split(",") if name.strip()}
+PERIODS = (7, 30, 90)
+HOURS_SHOWN = 48
+
+# derived metric -> (numerator, denominator) counters
+DERIVED = {
+    "fillRate": ("claimed", "posted"),
+    "hoursToClaim": ("claimHours", "claimed"),
+    "hoursToComplete": ("completeHours", "completed"),
+    "avgRating": ("ratingTotal", "reviews"),
+    "avgPayment": ("revenue", "payments"),
+}
+_FRACTIONAL = {"claimHours", "completeHours", "revenue"}
+
+Metrics = namedtuple("Metrics", ("key", *ROLLUP_COUNTERS, *DERIVED))
+
+
+def extract(rows, names):
+    """Columns of `rows` as {name: column of floats}."""
+    return {name: array("d", (getattr(row, name) for row in rows)) for name in names}
+
+
+def _group(keys, columns):
+    """Sum every column per distinct key. Returns (sorted keys, {name: sums})."""
+    groups = sorted(set(keys))
+    position = {key: i for i, key in enumerate(groups)}
+    index = [position[key] for key in keys]
+    sums = {}
+    for name, column in columns.items():
+        total = array("d", bytes(8 * len(groups)))
+        for i, value in zip(index, column):
+            total[i] += value
+        sums[name] = total
+    return groups, sums
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator per element; NaN where the denominator is 0."""
+    return array("d", (n / d if d else float("nan") for n, d in zip(numerator, denominator)))
+
+
+def _values(column, integer=False):
+    values = column.tolist()
+    if integer:
+        return [int(round(value)) for value in values]
+    return [None if value != value else value for value in values]
+
+
+def summarize(keys, columns):
+    """Counters and derived metrics per distinct key, as Metrics sorted by key."""
+    groups, sums = _group(keys, columns)
+    derived = {name: _ratio(sums[numerator], sums[denominator])
+               for name, (numerator, denominator) in DERIVED.items()}
+    fields = [_values(sums[name], integer=name not in _FRACTIONAL) for name in ROLLUP_COUNTERS]
+    fields += [_values(derived[name]) for name in DERIVED]
+    return [Metrics(*row) for row in zip(groups, *fields)]
+
+
+def report(conn, days=30, now=None):
+    """The analytics report for the last `days` days, from the rollups alone."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    since = (now.date() - datetime.timedelta(days=days - 1)).isoformat()
+    daily = queries.ANALYTICS_DAILY_SINCE.all(conn, (since,))
+    columns = extract(daily, ROLLUP_COUNTERS)
+    by_service = summarize([row.service for row in daily], columns)
+    by_day = summarize([row.day for row in daily], columns)
+    totals = summarize(["all"] * len(daily), columns)
+
+    hour_since = (now - datetime.timedelta(hours=HOURS_SHOWN - 1)).strftime("%Y-%m-%d %H:00")
+    hourly = queries.ANALYTICS_HOURLY_SINCE.all(conn, (hour_since,))
+    by_hour = summarize([row.hour for row in hourly], extract(hourly, ROLLUP_COUNTERS))
+    return {
+        "days": days,
+        "since": since,
+        "totals": totals[0] if totals else None,
+        "by_service": sorted(by_service, key=lambda metrics: -metrics.posted),
+        "by_day": by_day[::-1],
+        "by_hour": by_hour[::-1],
+    }
+
+
+def init_app(app, get_db):
+    """Add the /admin/analytics report to `app`."""
+
+    def admin_analytics():
+        if "user_id" not in session:
+            return redirect("/login")
+        conn = get_db()
+        try:
+            user = queries.USERNAME_BY_ID.one(conn, (session["user_id"],))
+            if user is None or user.username not in ADMINS:
+                abort(403)
+            try:
+                days = int(request.args.get("days", 30))
+            except ValueError:
+                days = 30
+            if days not in PERIODS:
+                days = 30
+            data = report(conn, days)
+        finally:
+            conn.close()
+        return render_template("admin_analytics.html", report=data, periods=PERIODS)
+
+    app.add_url_rule("/admin/analytics", "admin_analytics", admin_analytics)
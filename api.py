@@ -0,0 +1,173 @@
+"""Read-only JSON API under /api/v1.
+
+Every resource is a column-explicit keyset-paginated query. Rows are fetched
+as plain tuples (no sqlite3.Row, no dict per record) and encoded in one pass
+as {"fields": [...], "data": [[...], ...], "next_cursor": ...}, which keeps
+both CPU per request and payload size well below the HTML pages.
+
+Query parameters, for every resource:
+    fields   comma-separated subset of the resource's fields
+    limit    page size, 1..MAX_LIMIT (default DEFAULT_LIMIT)
+    cursor   next_cursor from the previous page
+plus the equality filters listed for the resource.
+"""
+import base64
+import binascii
+import json
+
+from flask import Blueprint, Response, request, session
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+RESOURCES = {
+    "contractors": {
+        "table": "Contractor",
+        "key": "contractorID",
+        "fields": ("contractorID", "companyID", "service", "firstName", "lastName", "city", "state", "rating"),
+        "filters": ("companyID", "service", "city", "state"),
+    },
+    "companies": {
+        "table": "Company",
+        "key": "companyID",
+        "fields": ("companyID", "name", "serviceType", "location"),
+        "filters": ("serviceType", "location"),
+    },
+    "jobrequests": {
+        "table": "Job_Request",
+        "key": "jobID",
+        "fields": ("jobID", "clientID", "contractorID", "companyID", "service", "status",
+                   "client_approval", "date_posted", "date_fulfilled"),
+        "filters": ("companyID", "service", "status"),
+    },
+    "claims": {
+        "table": "Contractor_Claim_Request",
+        "key": "requestID",
+        "fields": ("requestID", "jobID", "contractorID", "status", "date_requested"),
+        "filters": ("jobID", "status"),
+    },
+    "reviews": {
+        "table": "Review",
+        "key": "reviewID",
+        "fields": ("reviewID", "jobID", "clientID", "contractorID", "rating", "comment", "date"),
+        "filters": ("contractorID", "jobID"),
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(str(key).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ApiError("Invalid cursor")
+
+
+def _scope(cur, name):
+    """WHERE clause limiting job requests and claims to what the user may see."""
+    role, user_id = session.get("role"), session["user_id"]
+    if name not in ("jobrequests", "claims"):
+        return None, ()
+    if role == "client":
+        cur.execute("SELECT clientID FROM Client WHERE userID=?", (user_id,))
+        row = cur.fetchone()
+        client_id = row[0] if row else None
+        if name == "jobrequests":
+            return "clientID = ?", (client_id,)
+        return "jobID IN (SELECT jobID FROM Job_Request WHERE clientID = ?)", (client_id,)
+    cur.execute("SELECT contractorID FROM Contractor WHERE userID=?", (user_id,))
+    row = cur.fetchone()
+    contractor_id = row[0] if row else None
+    if name == "jobrequests":
+        # Contractors see open jobs and the jobs assigned to them
+        return "(contractorID IS NULL OR contractorID = ?)", (contractor_id,)
+    return "contractorID = ?", (contractor_id,)
+
+
+def _query(name, spec, cur):
+    fields = spec["fields"]
+    if request.args.get("fields"):
+        fields = tuple(request.args["fields"].split(","))
+        unknown = [f for f in fields if f not in spec["fields"]]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    # The key is always selected so the next cursor can be built
+    columns = fields if spec["key"] in fields else (spec["key"],) + fields
+
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError("limit must be an integer")
+
+    where, params = [], []
+    scope, scope_params = _scope(cur, name)
+    if scope:
+        where.append(scope)
+        params.extend(scope_params)
+    for column in spec["filters"]:
+        if column in request.args:
+            where.append(f"{column} = ?")
+            params.append(request.args[column])
+    if request.args.get("cursor"):
+        where.append(f"{spec['key']} > ?")
+        params.append(_decode_cursor(request.args["cursor"]))
+
+    sql = f"SELECT {', '.join(columns)} FROM {spec['table']}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {spec['key']} LIMIT ?"
+    params.append(limit + 1)
+
+    cur.row_factory = None
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][0])
+    if columns is not fields:
+        rows = [row[1:] for row in rows]
+    return fields, rows, next_cursor
+
+
+def create_api_blueprint(get_db):
+    """Build the /api/v1 blueprint on top of the app's connection factory."""
+    api = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+    @api.errorhandler(ApiError)
+    def api_error(error):
+        return Response(_dumps({"error": str(error)}), status=error.status, mimetype="application/json")
+
+    @api.before_request
+    def require_login():
+        if "user_id" not in session:
+            raise ApiError("Login required", 401)
+
+    @api.route("/<name>")
+    def list_resource(name):
+        spec = RESOURCES.get(name)
+        if spec is None:
+            raise ApiError(f"Unknown resource: {name}", 404)
+        conn = get_db()
+        try:
+            fields, rows, next_cursor = _query(name, spec, conn.cursor())
+        finally:
+            conn.close()
+        body = _dumps({"fields": fields, "data": rows, "next_cursor": next_cursor})
+        return Response(body, mimetype="application/json")
+
+    return api
@@ -1,15 +1,112 @@
-from flask import Flask, render_template, request, redirect, session, url_for, flash
+from flask import (Flask, current_app, render_template, request, redirect, session, url_for, flash, jsonify,
+                   get_flashed_messages, stream_template, stream_with_context)
+from flask.cli import AppGroup
+import os
 import sqlite3
-
-app = Flask(__name__)
-app.secret_key = "supersecret"
-DB_FILE = "project.db"
+import time
+
+import click
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import analytics
+import assets
+import bulk
+import config
+import idempotency
+import leaderboards
+import metrics
+import notifications
+import passwords
+import outbox
+import pricing
+import profiling
+import queries
+import ratelimit
+import schedule
+from api import create_api_blueprint
+from archive import archive_jobs, attach_archive
+from backup import backup_database
+from expiry import expire_stale
+from maintenance import enable_incremental_vacuum, run_maintenance
+from migrations import migrate
+
+
+def create_app(profile=None):
+    """Build the app for a profile in config.PROFILES (default: APP_CONFIG,
+    else production), with every route, extension and CLI command below."""
+    app = Flask(__name__)
+    app.config.from_object(config.PROFILES[profile or os.environ.get("APP_CONFIG", "production")])
+    if app.config["JINJA_CACHE_DIR"]:
+        os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+    if app.config["PROXY_HOPS"]:
+        # Client address and scheme from the trusted X-Forwarded-* hops
+        hops = app.config["PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    # Request/DB timing hooks and the /metrics endpoint
+    metrics.init_app(app)
+    # Opt-in per-request profiling (PROFILING_ENABLED / PROFILE_TOKEN)
+    profiling.init_app(app)
+    # Fingerprinted, precompressed static files behind asset_url()
+    assets.init_app(app)
+    # Token-bucket limits on logins and writes, ahead of any hook that opens the DB
+    ratelimit.init_app(app)
+    app.before_request(ensure_schema)
+
+    # JSON API (/api/v1) and the extensions
+    app.register_blueprint(create_api_blueprint(get_db))
+    notifications.init_app(app, get_db)
+    leaderboards.init_app(app, get_db)
+    analytics.init_app(app, get_db)
+    outbox.init_app(app, get_db)
+
+    for rule, view, options in _views:
+        app.add_url_rule(rule, view_func=view, **options)
+    for command in _commands.commands.values():
+        app.cli.add_command(command)
+    return app
+
+
+# Routes and CLI commands defined below, added to each app by create_app()
+_views = []
+_commands = AppGroup()
+
+
+def route(rule, **options):
+    """Like app.route(), for the apps create_app() builds; the endpoint is
+    the function's name."""
+    def register(view):
+        _views.append((rule, view, options))
+        return view
+    return register
+
+
+_defaults = config.PROFILES[os.environ.get("APP_CONFIG", "production")]
+DB_FILE = _defaults.DATABASE
+ARCHIVE_DB_FILE = _defaults.ARCHIVE_DATABASE
+# Finished jobs older than this many days move to the archive database
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+# Jobs and claims still pending after this many days are cancelled/declined
+PENDING_JOB_TTL_DAYS = int(os.environ.get("PENDING_JOB_TTL_DAYS", 60))
+PENDING_CLAIM_TTL_DAYS = int(os.environ.get("PENDING_CLAIM_TTL_DAYS", 14))
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", 7))
+# Streamed pages are sent in chunks of at least this many characters
+STREAM_CHUNK_SIZE = 8192
 
 # -------------------------------
 # Database Initialization
 # -------------------------------
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, uri=True)
+    # Only takes effect on a new, empty database; `flask vacuum` converts older ones
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # Streamed pages read from open cursors for as long as the download takes;
+    # in WAL mode that reader no longer holds off writers. Persistent, and a
+    # no-op for in-memory databases.
+    conn.execute("PRAGMA journal_mode=WAL")
     cur = conn.cursor()
 
     # Users
@@ -140,38 +237,97 @@ def init_db():
         pass
 
     conn.commit()
+    rebuild(conn, migrate(conn))
     conn.close()
 
+# Derived tables a migration left for app code to fill (migrations.Pending_Rebuild)
+REBUILDS = {"price_sketches": pricing.rebuild_sketches}
+
+def rebuild(conn, pending):
+    """Refill each pending derived table once, however many processes start at once."""
+    for name in pending:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("DELETE FROM Pending_Rebuild WHERE name = ?", (name,)).rowcount:
+            REBUILDS[name](conn)
+        conn.commit()
+
+# Database files this process has already initialized
+_schema_ready = set()
+
+def ensure_schema():
+    """Create tables and apply migrations before the first request this process serves."""
+    if DB_FILE not in _schema_ready:
+        init_db()
+        _schema_ready.add(DB_FILE)
+
+def warm_up():
+    """Do the work a fresh process would otherwise do on its first requests:
+    apply migrations and compile every template. gunicorn.conf.py runs this
+    in the master before it forks, so workers inherit both."""
+    init_db()
+    _schema_ready.add(DB_FILE)
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
+    # uri=True leaves plain paths alone and lets tests pass "file:...?mode=memory" URIs
+    conn = sqlite3.connect(DB_FILE, factory=metrics.TimedConnection,
+                           cached_statements=queries.STATEMENT_CACHE_SIZE, uri=True)
     conn.row_factory = sqlite3.Row
     return conn
 
+def stream_page(conn, template, **context):
+    """Send `template` to the client while it renders.
+
+    Listing routes pass open cursors instead of fetchall() results, so rows
+    are read as the page is written (init_db puts the database in WAL mode so
+    this does not block writers). `conn` is closed when the server closes the
+    response, even if the client went away before the first chunk.
+    """
+    # Pop flashes now: the session cookie is sent before the body is rendered
+    get_flashed_messages(with_categories=True)
+
+    def generate():
+        buffered, size = [], 0
+        for chunk in stream_template(template, **context):
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_CHUNK_SIZE:
+                yield "".join(buffered)
+                buffered, size = [], 0
+        if buffered:
+            yield "".join(buffered)
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype="text/html")
+    response.call_on_close(conn.close)
+    return response
+
+def get_archive_db():
+    """Connection to project.db with the job archive attached as `archive`."""
+    conn = get_db()
+    attach_archive(conn, ARCHIVE_DB_FILE)
+    return conn
+
 def get_client_id(user_id):
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT clientID FROM Client WHERE userID=?", (user_id,))
-    row = cur.fetchone()
+    row = queries.CLIENT_ID_BY_USER.one(conn, (user_id,))
     conn.close()
-    return row["clientID"] if row else None
+    return row.clientID if row else None
 
 def get_contractor_id(user_id):
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT contractorID FROM Contractor WHERE userID=?", (user_id,))
-    row = cur.fetchone()
+    row = queries.CONTRACTOR_ID_BY_USER.one(conn, (user_id,))
     conn.close()
-    return row["contractorID"] if row else None
+    return row.contractorID if row else None
 
 
 # -------------------------------
 # User Utilities
 # -------------------------------
 def create_user(username, password, role):
+    hashed = passwords.hash_password(password)
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO User (username, password, role) VALUES (?, ?, ?)",
-                (username, password, role))
+    cur = queries.INSERT_USER(conn, (username, hashed, role))
     conn.commit()
     user_id = cur.lastrowid
     conn.close()
@@ -180,41 +336,49 @@ def create_user(username, password, role):
 # -------------------------------
 # Routes
 # -------------------------------
-@app.route("/")
+@route("/")
 def index():
     if "user_id" in session:
         return redirect("/dashboard")
     return redirect("/login")
 
 # ----- Auth -----
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
         conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM User WHERE username=? AND password=?", (username, password))
-        user = cur.fetchone()
-        conn.close()
-        if user:
-            session["user_id"] = user["userID"]
-            session["role"] = user["role"]
+        user = queries.USER_BY_USERNAME.one(conn, (username,))
+        try:
+            valid = passwords.verify_password(password, user.password if user else None)
+            # Plain passwords from before hashing, and hashes at an old cost,
+            # are replaced as their owners log in
+            if valid and passwords.needs_rehash(user.password):
+                queries.SET_PASSWORD_HASH(conn, (passwords.hash_password(password), user.userID, user.password))
+                conn.commit()
+        except passwords.Busy:
+            return "Too many logins at once, please try again in a moment", 503, {"Retry-After": "1"}
+        finally:
+            conn.close()
+        if valid:
+            session["user_id"] = user.userID
+            session["role"] = user.role
             return redirect("/dashboard")
         return "Invalid credentials"
     return render_template("login.html")
 
-@app.route("/help")
+@route("/help")
 def help_page():
     return render_template("help.html")
 
-@app.route("/forgot")
+@route("/forgot")
 def forgotPasswordPage():
     return render_template("fp.html")
 
 
 
-@app.route("/register", methods=["GET", "POST"])
+@route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         username = request.form["username"]
@@ -224,31 +388,26 @@ def register():
             user_id = create_user(username, password, role)
 
             conn = get_db()
-            cur = conn.cursor()
             if role == "client":
-                cur.execute("""
-                    INSERT INTO Client (userID, firstName, lastName)
-                    VALUES (?, ?, ?)
-                """, (user_id, "First", "Last"))
+                queries.INSERT_CLIENT_PROFILE(conn, (user_id, "First", "Last"))
             else:
-                cur.execute("""
-                    INSERT INTO Contractor (userID, firstName, lastName, service)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, "First", "Last", "General"))
+                queries.INSERT_CONTRACTOR_PROFILE(conn, (user_id, "First", "Last", "General"))
             conn.commit()
             conn.close()
             return redirect("/login")
+        except passwords.Busy:
+            return "Too many sign-ups at once, please try again in a moment", 503, {"Retry-After": "1"}
         except Exception as e:
             return f"Registration failed: {e}"
     return render_template("register.html")
 
-@app.route("/logout")
+@route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
 
 # ----- Dashboard -----
-@app.route("/dashboard")
+@route("/dashboard")
 def dashboard_redirect():
     if "user_id" not in session:
         return redirect("/login")
@@ -256,85 +415,64 @@ def dashboard_redirect():
         return redirect("/dashboard/client")
     return redirect("/dashboard/contractor")
 
-@app.route("/dashboard/client")
+@route("/dashboard/client")
 def client_dashboard():
     if session.get("role") != "client":
         return "Access denied", 403
     user_id = session["user_id"]
     conn = get_db()
-    cur = conn.cursor()
 
     # Client profile
-    cur.execute("SELECT * FROM Client WHERE userID=?", (user_id,))
-    profile = cur.fetchone()
+    profile = queries.CLIENT_DASHBOARD_PROFILE.one(conn, (user_id,))
 
     # If profile doesn't exist, redirect to profile creation/edit
     if profile is None:
         flash("Please complete your client profile first.", "warning")
+        conn.close()
         return redirect("/profile/edit")
 
-    # Companies
-    cur.execute("SELECT * FROM Company")
-    companies = cur.fetchall()
-
-    # Pending contractor claim requests for this client's jobs
-    cur.execute("""
-        SELECT jc.*, c.firstName || ' ' || c.lastName AS contractorName, jr.service
-        FROM Contractor_Claim_Request jc
-        JOIN Contractor c ON jc.contractorID = c.contractorID
-        JOIN Job_Request jr ON jc.jobID = jr.jobID
-        WHERE jr.clientID=? AND jc.status='Pending'
-        ORDER BY jc.date_requested DESC
-    """, (profile["clientID"],))
-    pending_claims = cur.fetchall()
+    # Pending contractor claim requests for this client's jobs; the summary
+    # row says whether there are any to fetch
+    pending_claims = []
+    if profile.pendingClaims:
+        pending_claims = queries.PENDING_CLAIMS_FOR_CLIENT.all(conn, (profile.clientID,))
 
     conn.close()
     return render_template(
         "dashboard_client.html",
         profile=profile,
-        companies=companies,
         contractor_requests=pending_claims
     )
 
-@app.route("/dashboard/contractor")
+@route("/dashboard/contractor")
 def contractor_dashboard():
     if session.get("role") != "contractor":
         return "Access denied", 403
     user_id = session["user_id"]
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Contractor WHERE userID=?", (user_id,))
-    profile = cur.fetchone()
-    
+    profile = queries.CONTRACTOR_DASHBOARD_PROFILE.one(conn, (user_id,))
+
     # If profile doesn't exist, redirect to profile creation/edit
     if profile is None:
         flash("Please complete your contractor profile first.", "warning")
         conn.close()
         return redirect("/profile/edit")
-    
-    cur.execute("SELECT * FROM Company")
-    companies = cur.fetchall()
+
     conn.close()
-    return render_template("dashboard_contractor.html", profile=profile, companies=companies)
+    return render_template("dashboard_contractor.html", profile=profile)
 
 # ----- Profile Edit -----
-@app.route("/profile/edit", methods=["GET", "POST"])
+@route("/profile/edit", methods=["GET", "POST"])
 def edit_profile():
     if "user_id" not in session:
         return redirect("/login")
     user_id = session["user_id"]
     role = session["role"]
     conn = get_db()
-    cur = conn.cursor()
 
     if request.method == "POST":
         if role == "client":
-            cur.execute("""
-                UPDATE Client SET
-                    firstName=?, lastName=?, address=?, streetNumber=?, streetName=?,
-                    aptNumber=?, city=?, state=?, zip=?
-                WHERE userID=?
-            """, (
+            queries.UPDATE_CLIENT_PROFILE(conn, (
                 request.form.get("firstName"),
                 request.form.get("lastName"),
                 request.form.get("address"),
@@ -347,11 +485,7 @@ def edit_profile():
                 user_id
             ))
         else:
-            cur.execute("""
-                UPDATE Contractor SET
-                    firstName=?, lastName=?, service=?, city=?, state=?, rating=?
-                WHERE userID=?
-            """, (
+            queries.UPDATE_CONTRACTOR_PROFILE(conn, (
                 request.form.get("firstName"),
                 request.form.get("lastName"),
                 request.form.get("service"),
@@ -361,28 +495,28 @@ def edit_profile():
                 user_id
             ))
         conn.commit()
+        if role == "contractor":
+            contractor = queries.CONTRACTOR_ID_BY_USER.one(conn, (user_id,))
+            if contractor:
+                current_app.extensions["leaderboards"].refresh(conn, contractor.contractorID)
         conn.close()
         return redirect("/dashboard")
 
     if role == "client":
-        cur.execute("SELECT * FROM Client WHERE userID=?", (user_id,))
-        profile = cur.fetchone()
+        profile = queries.CLIENT_PROFILE_FORM.one(conn, (user_id,))
         conn.close()
         return render_template("profile_edit_client.html", profile=profile)
     else:
-        cur.execute("SELECT * FROM Contractor WHERE userID=?", (user_id,))
-        profile = cur.fetchone()
+        profile = queries.CONTRACTOR_PROFILE_FORM.one(conn, (user_id,))
         conn.close()
         return render_template("profile_edit_contractor.html", profile=profile)
 
 # ----- Companies -----
-@app.route("/companies")
+@route("/companies")
 def companies():
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT * FROM Company")
-    companies = cur.fetchall()
+    companies = queries.ALL_COMPANIES.all(conn)
+    conn.close()
 
     role = session.get("role")  # 'client' or 'contractor'
 
@@ -393,7 +527,7 @@ def companies():
     # clients get read-only view
     return render_template("companies_view.html", companies=companies)
 
-@app.route("/companies/add", methods=["POST"])
+@route("/companies/add", methods=["POST"])
 def add_company():
     if session.get("role") != "client":
         return "Not allowed", 403
@@ -401,27 +535,27 @@ def add_company():
     serviceType = request.form["serviceType"]
     location = request.form["location"]
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO Company (name, serviceType, location) VALUES (?, ?, ?)",
-                (name, serviceType, location))
+    queries.INSERT_COMPANY(conn, (name, serviceType, location))
     conn.commit()
     conn.close()
     return redirect("/companies")
 
-@app.route("/companies/delete/<int:company_id>")
+@route("/companies/delete/<int:company_id>")
 def delete_company(company_id):
     if session.get("role") != "contractor":
         return "Forbidden", 403
 
     conn = get_db()
-    cur = conn.cursor()
 
-    cur.execute("DELETE FROM Company WHERE companyID=?", (company_id,))
+    queries.DELETE_COMPANY(conn, (company_id,))
+    queries.CLEAR_JOB_COMPANY(conn, (company_id,))
+    queries.CLEAR_CONTRACTOR_COMPANY(conn, (company_id,))
     conn.commit()
+    conn.close()
 
     return redirect("/companies")
 
-@app.post("/companies/create")
+@route("/companies/create", methods=["POST"])
 def create_company():
     if session.get("role") != "contractor":
         return "Forbidden", 403
@@ -431,71 +565,47 @@ def create_company():
     location = request.form["location"]
 
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO Company (name, serviceType, location)
-        VALUES (?, ?, ?)
-    """, (name, service, location))
-
+    queries.INSERT_COMPANY(conn, (name, service, location))
     conn.commit()
+    conn.close()
     return redirect("/companies")
 
-@app.route("/companies/<int:company_id>/jobs")
+@route("/companies/<int:company_id>/jobs")
 def view_company_jobs(company_id):
-    conn = sqlite3.connect('project.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT jobID, service, status
-        FROM Job_Request
-        WHERE companyID = ?
-    """, (company_id,))
-    jobs = cursor.fetchall()
-
+    conn = get_db()
+    jobs = queries.JOBS_BY_COMPANY.all(conn, (company_id,))
     conn.close()
     return render_template("company_jobs.html", jobs=jobs, company_id=company_id)
 
 # ----- Contractors -----
-@app.route("/contractors")
+@route("/contractors")
 def list_contractors():
     if "user_id" not in session:
         return redirect("/login")
     conn = get_db()
-    cur = conn.cursor()
 
-    # Fetch all contractors with average rating
-    cur.execute("""
-        SELECT ctr.*, 
-               IFNULL(AVG(r.rating), 0) AS avg_rating
-        FROM Contractor ctr
-        LEFT JOIN Review r ON ctr.contractorID = r.contractorID
-        GROUP BY ctr.contractorID
-    """)
-    contractors = cur.fetchall()
+    # All contractors with average rating, and all reviews in the same
+    # contractor order so they can be paired up while streaming
+    contractors = queries.CONTRACTORS_WITH_RATING(conn)
+    reviews = queries.REVIEWS_BY_CONTRACTOR(conn)
 
-    # Fetch all reviews for all contractors
-    contractor_reviews = {}
-    cur.execute("""
-        SELECT r.contractorID, r.comment, r.rating, c.firstName || ' ' || c.lastName AS clientName
-        FROM Review r
-        JOIN Client c ON r.clientID = c.clientID
-    """)
-    for row in cur.fetchall():
-        contractor_reviews.setdefault(row["contractorID"], []).append({
-            "comment": row["comment"],
-            "rating": row["rating"],
-            "clientName": row["clientName"]
-        })
+    return stream_page(conn, "contractors.html", contractors=_with_reviews(contractors, reviews))
 
-    conn.close()
-    return render_template("contractors.html", contractors=contractors, contractor_reviews=contractor_reviews)
+def _with_reviews(contractors, reviews):
+    """Pair each contractor row with its reviews; both are ordered by contractorID."""
+    review = next(reviews, None)
+    for contractor in contractors:
+        own = []
+        while review is not None and review.contractorID <= contractor.contractorID:
+            if review.contractorID == contractor.contractorID:
+                own.append(review)
+            review = next(reviews, None)
+        yield contractor, own
 
 # -------------------------------
 # Job Requests
 # -------------------------------
-@app.route("/jobrequests")
+@route("/jobrequests")
 def view_jobrequests():
     if "user_id" not in session:
         return redirect("/login")
@@ -503,28 +613,19 @@ def view_jobrequests():
         return "Only clients can view their job requests", 403
 
     conn = get_db()
-    cur = conn.cursor()
     # Get clientID
-    cur.execute("SELECT clientID FROM Client WHERE userID=?", (session["user_id"],))
-    client_row = cur.fetchone()
+    client_row = queries.CLIENT_ID_BY_USER.one(conn, (session["user_id"],))
     if not client_row:
         return "Client profile not found", 400
-    client_id = client_row["clientID"]
+    client_id = client_row.clientID
 
     # Only their own job requests
-    cur.execute("""
-        SELECT jr.*, c.name AS companyName
-        FROM Job_Request jr
-        LEFT JOIN Company c ON jr.companyID = c.companyID
-        WHERE jr.clientID=?
-        ORDER BY jr.date_posted DESC
-    """, (client_id,))
-    jobrequests = cur.fetchall()
-    conn.close()
-    return render_template("view_jobrequests.html", jobrequests=jobrequests, role="client")
+    jobrequests = queries.CLIENT_JOB_REQUESTS(conn, (client_id,))
+    companies = queries.ALL_COMPANIES.all(conn)
+    return stream_page(conn, "view_jobrequests.html", jobrequests=jobrequests, companies=companies, role="client")
 
 
-@app.route("/jobrequests/new", methods=["GET", "POST"])
+@route("/jobrequests/new", methods=["GET", "POST"])
 def create_jobrequest():
     if "user_id" not in session:
         return redirect("/login")
@@ -532,32 +633,33 @@ def create_jobrequest():
         return "Only clients can create job requests", 403
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT clientID FROM Client WHERE userID=?", (session["user_id"],))
-    client_row = cur.fetchone()
+    client_row = queries.CLIENT_ID_BY_USER.one(conn, (session["user_id"],))
     if not client_row:
         return "Client profile not found", 400
-    client_id = client_row["clientID"]
+    client_id = client_row.clientID
 
     if request.method == "POST":
         company_id = request.form.get("companyID") or None
         service = request.form["service"]
-        cur.execute("""
-            INSERT INTO Job_Request (clientID, companyID, service, status, date_posted)
-            VALUES (?, ?, ?, 'Pending', DATE('now'))
-        """, (client_id, company_id, service))
+        try:
+            start, end = schedule.parse_window(request.form.get("scheduled_start"), request.form.get("scheduled_end"))
+        except ValueError as e:
+            conn.close()
+            flash(str(e), "error")
+            return redirect(url_for("create_jobrequest"))
+        queries.INSERT_JOB_REQUEST(conn, (client_id, company_id, service, start, end))
         conn.commit()
         conn.close()
 
         flash("Job request posted successfully!", "success")  #
         return redirect("/dashboard/client")  #
 
-    cur.execute("SELECT * FROM Company")
-    companies = cur.fetchall()
+    companies = queries.ALL_COMPANIES.all(conn)
+    prices = pricing.guidance(conn, queries.CLIENT_STATE.one(conn, (client_id,)).state)
     conn.close()
-    return render_template("job_request_new.html", companies=companies)
+    return render_template("job_request_new.html", companies=companies, prices=prices)
 
-@app.route("/jobrequests/edit/<int:job_id>", methods=["GET", "POST"])
+@route("/jobrequests/edit/<int:job_id>", methods=["GET", "POST"])
 def edit_jobrequest(job_id):
     if "user_id" not in session:
         return redirect("/login")
@@ -565,29 +667,38 @@ def edit_jobrequest(job_id):
         return "Only clients can edit job requests", 403
 
     conn = get_db()
-    cur = conn.cursor()
     # Check ownership
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=?", (job_id,))
-    job = cur.fetchone()
-    if not job or job["clientID"] != get_client_id(session["user_id"]):
+    job = queries.JOB_BY_ID.one(conn, (job_id,))
+    if not job or job.clientID != get_client_id(session["user_id"]):
         return "Access denied", 403
 
     if request.method == "POST":
         service = request.form["service"]
         company_id = request.form.get("companyID") or None
-        cur.execute("""
-            UPDATE Job_Request SET service=?, companyID=? WHERE jobID=?
-        """, (service, company_id, job_id))
+        try:
+            start, end = schedule.parse_window(request.form.get("scheduled_start"), request.form.get("scheduled_end"))
+        except ValueError as e:
+            conn.close()
+            flash(str(e), "error")
+            return redirect(url_for("edit_jobrequest", job_id=job_id))
+        conn.execute("BEGIN IMMEDIATE")
+        queries.UPDATE_JOB_REQUEST(conn, (service, company_id, start, end, job_id))
+        # The assigned contractor has to be free for the new window too
+        problem = job.contractorID and schedule.assignment_problem(conn, job_id, job.contractorID)
+        if problem:
+            conn.rollback()
+            conn.close()
+            flash(problem, "error")
+            return redirect(url_for("edit_jobrequest", job_id=job_id))
         conn.commit()
         conn.close()
         return redirect(url_for("view_jobrequests"))
 
-    cur.execute("SELECT * FROM Company")
-    companies = cur.fetchall()
+    companies = queries.ALL_COMPANIES.all(conn)
     conn.close()
-    return render_template("edit_jobrequest.html", job=job, companies=companies)
+    return render_template("edit_jobrequest.html", job=job, companies=companies, form_value=schedule.form_value)
 
-@app.route("/jobrequests/delete/<int:job_id>")
+@route("/jobrequests/delete/<int:job_id>")
 def delete_jobrequest(job_id):
     if "user_id" not in session:
         return redirect("/login")
@@ -595,58 +706,51 @@ def delete_jobrequest(job_id):
         return "Only clients can delete job requests", 403
 
     conn = get_db()
-    cur = conn.cursor()
     # Check ownership
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=?", (job_id,))
-    job = cur.fetchone()
-    if not job or job["clientID"] != get_client_id(session["user_id"]):
+    job = queries.JOB_BY_ID.one(conn, (job_id,))
+    if not job or job.clientID != get_client_id(session["user_id"]):
         return "Access denied", 403
 
-    cur.execute("DELETE FROM Job_Request WHERE jobID=?", (job_id,))
+    queries.DELETE_JOB_CLAIMS(conn, (job_id,))
+    queries.DELETE_JOB_REQUEST(conn, (job_id,))
     conn.commit()
     conn.close()
     return redirect(url_for("view_jobrequests"))
 
 # ----- Contractor updates job status -----
-@app.route("/jobrequests/complete/<int:job_id>", methods=["GET", "POST"])
+@route("/jobrequests/complete/<int:job_id>", methods=["GET", "POST"])
 def complete_job(job_id):
     if session.get("role") != "client":
         return "Access denied", 403
 
     client_id = get_client_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=? AND clientID=?", (job_id, client_id))
-    job = cur.fetchone()
-    if not job or job["status"] != "In Progress":
+    job = queries.JOB_FOR_CLIENT.one(conn, (job_id, client_id))
+    if not job or job.status != "In Progress":
         conn.close()
         return "Job not available", 400
 
     if request.method == "POST":
         rating = int(request.form["rating"])
         review_text = request.form.get("review")
-        payment = min(float(request.form["payment"]), 100000)
 
-        contractor_id = job["contractorID"]
+        contractor_id = job.contractorID
 
         # Insert review
-        cur.execute("""
-            INSERT INTO Review (jobID, clientID, contractorID, rating, comment, date)
-            VALUES (?, ?, ?, ?, ?, DATE('now'))
-        """, (job_id, client_id, contractor_id, rating, review_text))
+        queries.INSERT_REVIEW(conn, (job_id, client_id, contractor_id, rating, review_text))
 
-        # Update contractor earnings
-        cur.execute("UPDATE Contractor SET earnings = earnings + ? WHERE contractorID=?", (payment, contractor_id))
+        # Earnings come from the payment made after approval (client_payment),
+        # not from completing the job as well
 
         # Update job status
-        cur.execute("UPDATE Job_Request SET status='Completed' WHERE jobID=?", (job_id,))
+        queries.MARK_JOB_COMPLETED(conn, (job_id,))
 
         # Update contractor average rating
-        cur.execute("SELECT AVG(rating) as avg_rating FROM Review WHERE contractorID=?", (contractor_id,))
-        avg = cur.fetchone()["avg_rating"]
-        cur.execute("UPDATE Contractor SET rating=? WHERE contractorID=?", (avg, contractor_id))
+        avg = queries.CONTRACTOR_AVG_RATING.one(conn, (contractor_id,)).avg_rating
+        queries.SET_CONTRACTOR_RATING(conn, (avg, contractor_id))
 
         conn.commit()
+        current_app.extensions["leaderboards"].refresh(conn, contractor_id)
         conn.close()
         return redirect(url_for("client_jobs"))
 
@@ -656,16 +760,14 @@ def complete_job(job_id):
 # -------------------------------
 # Client approves or denies job completion
 # -------------------------------
-@app.route("/jobrequests/approval/<int:job_id>", methods=["GET", "POST"])
+@route("/jobrequests/approval/<int:job_id>", methods=["GET", "POST"])
 def client_approval(job_id):
     if "user_id" not in session or session.get("role") != "client":
         return redirect("/login")
 
     client_id = get_client_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=? AND clientID=?", (job_id, client_id))
-    job = cur.fetchone()
+    job = queries.JOB_FOR_CLIENT.one(conn, (job_id, client_id))
     if not job:
         conn.close()
         return "Job not found", 404
@@ -675,34 +777,32 @@ def client_approval(job_id):
         if decision not in ("Approved","Denied"):
             conn.close()
             return "Invalid decision", 400
-        cur.execute("UPDATE Job_Request SET client_approval=? WHERE jobID=?", (decision, job_id))
+        queries.SET_CLIENT_APPROVAL(conn, (decision, job_id))
         conn.commit()
         conn.close()
         if decision == "Approved":
             return redirect(f"/jobrequests/payment/{job_id}")
         return redirect("/jobrequests")
-    
+
     conn.close()
     return render_template("client_approval.html", job=job)
 
 # -------------------------------
 # Client pays contractor
 # -------------------------------
-@app.route("/jobrequests/payment/<int:job_id>", methods=["GET", "POST"])
+@route("/jobrequests/payment/<int:job_id>", methods=["GET", "POST"])
 def client_payment(job_id):
     if "user_id" not in session or session.get("role") != "client":
         return redirect("/login")
 
     client_id = get_client_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=? AND clientID=?", (job_id, client_id))
-    job = cur.fetchone()
-    if not job or job["client_approval"] != "Approved":
+    job = queries.JOB_FOR_CLIENT.one(conn, (job_id, client_id))
+    if not job or job.client_approval != "Approved":
         conn.close()
         return "Payment not allowed", 403
 
-    contractor_id = job["contractorID"]
+    contractor_id = job.contractorID
     if not contractor_id:
         conn.close()
         return "No contractor assigned", 400
@@ -710,171 +810,175 @@ def client_payment(job_id):
     if request.method == "POST":
         amount = float(request.form["amount"])
         method = request.form["method"]
-        cur.execute("""
-            INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date)
-            VALUES (?, ?, ?, ?, ?, DATE('now'))
-        """, (job_id, client_id, contractor_id, amount, method))
+        # A retried or double-clicked form pays only once
+        key, done = idempotency.request_key(), f"/jobrequests/review/{job_id}"
+        replayed = idempotency.begin(conn, session["user_id"], "client_payment", key, done)
+        if replayed is not None:
+            conn.close()
+            return redirect(replayed)
+        queries.INSERT_TRANSACTION(conn, (job_id, client_id, contractor_id, amount, method))
         # Update contractor earnings
-        cur.execute("UPDATE Contractor SET earnings = earnings + ? WHERE contractorID=?", (amount, contractor_id))
+        queries.ADD_CONTRACTOR_EARNINGS(conn, (amount, contractor_id))
+        pricing.record_payment(conn, job_id, amount)
         conn.commit()
         conn.close()
-        return redirect(f"/jobrequests/review/{job_id}")
+        idempotency.remember(session["user_id"], "client_payment", key, done)
+        return redirect(done)
 
     conn.close()
-    return render_template("client_payment.html", job=job)
+    return render_template("client_payment.html", job=job, idempotency_key=idempotency.new_key())
 
 # -------------------------------
 # Client leaves a review
 # -------------------------------
-@app.route("/jobrequests/review/<int:job_id>", methods=["GET", "POST"])
+@route("/jobrequests/review/<int:job_id>", methods=["GET", "POST"])
 def client_review(job_id):
     if "user_id" not in session or session.get("role") != "client":
         return redirect("/login")
 
     client_id = get_client_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=? AND clientID=?", (job_id, client_id))
-    job = cur.fetchone()
+    job = queries.JOB_FOR_CLIENT.one(conn, (job_id, client_id))
     if not job:
         conn.close()
         return "Job not found", 404
 
-    contractor_id = job["contractorID"]
+    contractor_id = job.contractorID
     if request.method == "POST":
         rating = int(request.form["rating"])
         comment = request.form.get("comment")
-        cur.execute("""
-            INSERT INTO Review (jobID, clientID, contractorID, rating, comment, date)
-            VALUES (?, ?, ?, ?, ?, DATE('now'))
-        """, (job_id, client_id, contractor_id, rating, comment))
+        key, done = idempotency.request_key(), "/dashboard/client"
+        replayed = idempotency.begin(conn, session["user_id"], "client_review", key, done)
+        if replayed is not None:
+            conn.close()
+            return redirect(replayed)
+        queries.INSERT_REVIEW(conn, (job_id, client_id, contractor_id, rating, comment))
         # Update contractor average rating
-        cur.execute("""
-            SELECT AVG(rating) as avg_rating FROM Review WHERE contractorID=?
-        """, (contractor_id,))
-        avg = cur.fetchone()["avg_rating"]
-        cur.execute("UPDATE Contractor SET rating=? WHERE contractorID=?", (avg, contractor_id))
+        avg = queries.CONTRACTOR_AVG_RATING.one(conn, (contractor_id,)).avg_rating
+        queries.SET_CONTRACTOR_RATING(conn, (avg, contractor_id))
         conn.commit()
+        current_app.extensions["leaderboards"].refresh(conn, contractor_id)
         conn.close()
-        return redirect("/dashboard/client")
+        idempotency.remember(session["user_id"], "client_review", key, done)
+        return redirect(done)
 
     conn.close()
-    return render_template("client_review.html", job=job)
+    return render_template("client_review.html", job=job, idempotency_key=idempotency.new_key())
 
 # Contractor sees open jobs and their claimed jobs
-@app.route("/dashboard/contractor/jobs")
+@route("/dashboard/contractor/jobs")
 def contractor_jobs():
     if session.get("role") != "contractor":
         return "Access denied", 403
 
     contractor_id = get_contractor_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    
-    # Open jobs (not yet claimed)
-    cur.execute("""
-        SELECT jr.*, c.name AS companyName, cli.firstName || ' ' || cli.lastName AS clientName
-        FROM Job_Request jr
-        LEFT JOIN Company c ON jr.companyID = c.companyID
-        LEFT JOIN Client cli ON jr.clientID = cli.clientID
-        WHERE jr.contractorID IS NULL
-        ORDER BY jr.date_posted DESC
-    """)
-    open_jobs = cur.fetchall()
 
+    # Open jobs (not yet claimed), or only those that fit the contractor's calendar
+    available_only = request.args.get("available") == "1"
+    if available_only:
+        open_jobs = queries.OPEN_JOBS_AVAILABLE(conn, (contractor_id,) * 4)
+    else:
+        open_jobs = queries.OPEN_JOBS(conn)
 
     # My claimed jobs
-    cur.execute("""
-        SELECT jr.*, c.name AS companyName, cli.firstName || ' ' || cli.lastName AS clientName
-        FROM Job_Request jr
-        LEFT JOIN Company c ON jr.companyID = c.companyID
-        LEFT JOIN Client cli ON jr.clientID = cli.clientID
-        WHERE jr.contractorID=?
-        ORDER BY jr.date_posted DESC
-    """, (contractor_id,))
-    my_jobs = cur.fetchall()
-    
-    conn.close()
-    return render_template("contractor_jobs.html", open_jobs=open_jobs, my_jobs=my_jobs)
+    my_jobs = queries.CONTRACTOR_JOBS(conn, (contractor_id,))
+
+    return stream_page(conn, "contractor_jobs.html", open_jobs=open_jobs, my_jobs=my_jobs,
+                       available_only=available_only)
 
 # Contractor claims a job
-@app.route("/jobrequests/claim/<int:job_id>")
+@route("/jobrequests/claim/<int:job_id>")
 def claim_job(job_id):
     if session.get("role") != "contractor":
         return "Access denied", 403
 
     contractor_id = get_contractor_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
+
+    # Hold the write lock from the checks to the assignment so two claims
+    # cannot both pass them
+    conn.execute("BEGIN IMMEDIATE")
 
     # Only allow claiming pending/unassigned jobs
-    cur.execute("SELECT * FROM Job_Request WHERE jobID=? AND status='Pending'", (job_id,))
-    job = cur.fetchone()
+    job = queries.PENDING_JOB_BY_ID.one(conn, (job_id,))
     if not job:
+        conn.rollback()
         conn.close()
         return "Job not available", 400
 
+    problem = schedule.assignment_problem(conn, job_id, contractor_id)
+    if problem:
+        conn.rollback()
+        conn.close()
+        flash(problem, "error")
+        return redirect(url_for("contractor_jobs"))
+
     # Assign contractor and set status to in progress
-    cur.execute("UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?",
-                (contractor_id, job_id))
+    queries.ASSIGN_CONTRACTOR(conn, (contractor_id, job_id))
     conn.commit()
     conn.close()
     return redirect(url_for("contractor_jobs"))
 
-@app.route("/dashboard/client/jobs")
+@route("/dashboard/client/jobs")
 def client_jobs():
     if session.get("role") != "client":
         return "Access denied", 403
-    
+
     client_id = get_client_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT jr.*, c.name AS companyName, ctr.firstName || ' ' || ctr.lastName AS contractorName
-        FROM Job_Request jr
-        LEFT JOIN Company c ON jr.companyID = c.companyID
-        LEFT JOIN Contractor ctr ON jr.contractorID = ctr.contractorID
-        WHERE jr.clientID=?
-        ORDER BY jr.date_posted DESC
-    """, (client_id,))
-    jobs = cur.fetchall()
+    jobs = queries.CLIENT_JOBS_WITH_CONTRACTOR.all(conn, (client_id,))
     conn.close()
     return render_template("client_jobs.html", jobs=jobs)
 
-@app.route("/dashboard/contractor/ratings")
+@route("/dashboard/client/jobs/history")
+def client_job_history():
+    if session.get("role") != "client":
+        return "Access denied", 403
+
+    client_id = get_client_id(session["user_id"])
+    conn = get_archive_db()
+    jobs = queries.CLIENT_JOB_HISTORY.all(conn, (client_id,))
+    conn.close()
+    return render_template("job_history.html", jobs=jobs, role="client")
+
+@route("/dashboard/contractor/jobs/history")
+def contractor_job_history():
+    if session.get("role") != "contractor":
+        return "Access denied", 403
+
+    contractor_id = get_contractor_id(session["user_id"])
+    conn = get_archive_db()
+    jobs = queries.CONTRACTOR_JOB_HISTORY.all(conn, (contractor_id,))
+    conn.close()
+    return render_template("job_history.html", jobs=jobs, role="contractor")
+
+@route("/dashboard/contractor/ratings")
 def contractor_ratings():
     if session.get("role") != "contractor":
         return "Access denied", 403
 
     contractor_id = get_contractor_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
 
     # Contractor info
-    cur.execute("SELECT * FROM Contractor WHERE contractorID=?", (contractor_id,))
-    contractor = cur.fetchone()
+    contractor = queries.CONTRACTOR_RATINGS_PROFILE.one(conn, (contractor_id,))
 
     # Reviews
-    cur.execute("SELECT r.*, c.firstName || ' ' || c.lastName AS clientName FROM Review r JOIN Client c ON r.clientID=c.clientID WHERE contractorID=?", (contractor_id,))
-    reviews = cur.fetchall()
+    reviews = queries.CONTRACTOR_RATINGS_REVIEWS.all(conn, (contractor_id,))
     conn.close()
     return render_template("contractor_ratings.html", contractor=contractor, reviews=reviews)
 
-@app.route("/request_claim/<int:job_id>")
+@route("/request_claim/<int:job_id>")
 def request_claim(job_id):
     if session.get("role") != "contractor":
         return "Access denied", 403
 
     contractor_id = get_contractor_id(session["user_id"])
     conn = get_db()
-    cur = conn.cursor()
 
     # Prevent duplicates
-    cur.execute("""
-        SELECT * FROM Contractor_Claim_Request
-        WHERE jobID=? AND contractorID=?
-    """, (job_id, contractor_id))
-    existing = cur.fetchone()
+    existing = queries.EXISTING_CLAIM.one(conn, (job_id, contractor_id))
 
     if existing:
         conn.close()
@@ -882,90 +986,156 @@ def request_claim(job_id):
         return redirect("/dashboard/contractor/jobs")
 
     # Insert new claim request
-    cur.execute("""
-        INSERT INTO Contractor_Claim_Request (jobID, contractorID, status, date_requested)
-        VALUES (?, ?, 'Pending', DATE('now'))
-    """, (job_id, contractor_id))
+    queries.INSERT_CLAIM(conn, (job_id, contractor_id))
 
     conn.commit()
     conn.close()
 
-    flash("Request sent successfully!", "success")  
+    flash("Request sent successfully!", "success")
     return redirect("/dashboard/contractor/jobs")
 
-@app.route("/approve_contractor/<int:job_id>/<int:contractor_id>")
+@route("/approve_contractor/<int:job_id>/<int:contractor_id>")
 def approve_contractor(job_id, contractor_id):
     if session.get("role") != "client":
         return "Access denied", 403
 
     conn = get_db()
-    cur = conn.cursor()
+    conn.execute("BEGIN IMMEDIATE")
+
+    problem = schedule.assignment_problem(conn, job_id, contractor_id)
+    if problem:
+        conn.rollback()
+        conn.close()
+        flash(problem, "error")
+        return redirect("/dashboard/client")
 
     # Accept this contractor
-    cur.execute("""
-        UPDATE Contractor_Claim_Request
-        SET status='Accepted'
-        WHERE jobID=? AND contractorID=?
-    """, (job_id, contractor_id))
+    queries.ACCEPT_CLAIM(conn, (job_id, contractor_id))
 
     # Reject all others
-    cur.execute("""
-        UPDATE Contractor_Claim_Request
-        SET status='Declined'
-        WHERE jobID=? AND contractorID<>?
-    """, (job_id, contractor_id))
+    queries.DECLINE_OTHER_CLAIMS(conn, (job_id, contractor_id))
 
     # Assign contractor to the job
-    cur.execute("""
-        UPDATE Job_Request
-        SET contractorID=?, status='In Progress'
-        WHERE jobID=?
-    """, (contractor_id, job_id))
+    queries.ASSIGN_CONTRACTOR(conn, (contractor_id, job_id))
 
     conn.commit()
     conn.close()
     return redirect("/dashboard/client")
 
-@app.route("/reject_contractor/<int:job_id>/<int:contractor_id>")
+@route("/reject_contractor/<int:job_id>/<int:contractor_id>")
 def reject_contractor(job_id, contractor_id):
     if session.get("role") != "client":
         return "Access denied", 403
 
     conn = get_db()
-    cur = conn.cursor()
 
-    cur.execute("""
-        UPDATE Contractor_Claim_Request
-        SET status='Declined'
-        WHERE jobID=? AND contractorID=?
-    """, (job_id, contractor_id))
+    queries.DECLINE_CLAIM(conn, (job_id, contractor_id))
 
     conn.commit()
     conn.close()
     return redirect("/dashboard/client")
 
-@app.route("/contractor_profile/<int:contractor_id>")
+def _bulk_response(outcomes, title, back):
+    if request.is_json:
+        return jsonify(results=[outcome._asdict() for outcome in outcomes])
+    return render_template("bulk_results.html", outcomes=outcomes, title=title, back=back)
+
+@route("/claims/bulk", methods=["POST"])
+def bulk_claims():
+    if session.get("role") != "client":
+        return "Access denied", 403
+
+    # JSON {"decisions": [{"requestID": 1, "decision": "approve"}, ...]}, or
+    # the dashboard form's decision-<requestID> fields
+    if request.is_json:
+        items = ((item.get("requestID"), item.get("decision"))
+                 for item in (request.get_json(silent=True) or {}).get("decisions", []))
+    else:
+        items = ((key.removeprefix("decision-"), value)
+                 for key, value in request.form.items() if key.startswith("decision-"))
+    decisions = {}
+    try:
+        for request_id, decision in items:
+            if decision in ("approve", "reject"):
+                decisions[int(request_id)] = decision
+    except (TypeError, ValueError):
+        return "Claim ids must be numbers", 400
+    if len(decisions) > bulk.MAX_ITEMS:
+        return f"At most {bulk.MAX_ITEMS} decisions at a time", 400
+
+    conn = get_db()
+    outcomes = bulk.decide_claims(conn, get_client_id(session["user_id"]), decisions)
+    conn.close()
+    return _bulk_response(outcomes, "Contractor Requests", url_for("client_dashboard"))
+
+@route("/jobrequests/bulk", methods=["POST"])
+def bulk_jobrequests():
+    if session.get("role") != "client":
+        return "Access denied", 403
+
+    action = request.form.get("action")
+    if action not in ("cancel", "edit"):
+        return "Unknown action", 400
+    try:
+        job_ids = list(dict.fromkeys(int(job_id) for job_id in request.form.getlist("jobID")))
+    except ValueError:
+        return "Job ids must be numbers", 400
+    if len(job_ids) > bulk.MAX_ITEMS:
+        return f"At most {bulk.MAX_ITEMS} jobs at a time", 400
+    service = request.form.get("service", "").strip()
+    company_id = request.form.get("companyID")
+    if action == "edit" and not (service or company_id):
+        flash("Choose a service or company to change the selected jobs to.", "error")
+        return redirect(url_for("view_jobrequests"))
+
+    conn = get_db()
+    outcomes = bulk.update_jobs(conn, get_client_id(session["user_id"]), job_ids, action, service, company_id)
+    conn.close()
+    return _bulk_response(outcomes, "Job Requests", url_for("view_jobrequests"))
+
+@route("/availability", methods=["GET", "POST"])
+def availability():
+    if session.get("role") != "contractor":
+        return "Access denied", 403
+
+    contractor_id = get_contractor_id(session["user_id"])
+    conn = get_db()
+    if request.method == "POST":
+        try:
+            starts, ends = schedule.parse_window(request.form.get("starts"), request.form.get("ends"))
+        except ValueError as e:
+            flash(str(e), "error")
+        else:
+            if starts:
+                queries.INSERT_AVAILABILITY(conn, (contractor_id, starts, ends))
+                conn.commit()
+        conn.close()
+        return redirect(url_for("availability"))
+
+    windows = queries.CONTRACTOR_AVAILABILITY.all(conn, (contractor_id,))
+    conn.close()
+    return render_template("availability.html", windows=windows)
+
+@route("/availability/<int:availability_id>/delete", methods=["POST"])
+def delete_availability(availability_id):
+    if session.get("role") != "contractor":
+        return "Access denied", 403
+
+    conn = get_db()
+    queries.DELETE_AVAILABILITY(conn, (availability_id, get_contractor_id(session["user_id"])))
+    conn.commit()
+    conn.close()
+    return redirect(url_for("availability"))
+
+@route("/contractor_profile/<int:contractor_id>")
 def contractor_profile(contractor_id):
     conn = get_db()
-    cur = conn.cursor()
 
     # Fetch contractor basic info
-    cur.execute("""
-        SELECT firstName, lastName, rating
-        FROM Contractor
-        WHERE contractorID=?
-    """, (contractor_id,))
-    contractor = cur.fetchone()
+    contractor = queries.CONTRACTOR_PUBLIC_PROFILE.one(conn, (contractor_id,))
 
     # Fetch all reviews with client names
-    cur.execute("""
-        SELECT r.comment, r.rating, r.date, c.firstName || ' ' || c.lastName AS clientName
-        FROM Review r
-        JOIN Client c ON r.clientID = c.clientID
-        WHERE r.contractorID=?
-        ORDER BY r.date DESC
-    """, (contractor_id,))
-    reviews = cur.fetchall()
+    reviews = queries.CONTRACTOR_PUBLIC_REVIEWS.all(conn, (contractor_id,))
 
     conn.close()
     return render_template(
@@ -975,27 +1145,110 @@ def contractor_profile(contractor_id):
     )
 
 
-
-
 # -------------------------------
-# Helper Functions
+# CLI Commands
 # -------------------------------
-def get_client_id(user_id):
+@_commands.command("build-assets")
+def build_assets_command():
+    """Fingerprint and precompress the files in static/ for /assets."""
+    manifest = assets.build_assets(current_app.static_folder)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+
+
+@_commands.command("archive-jobs")
+@click.option("--days", type=int, default=None, help="Archive finished jobs older than this many days.")
+@click.option("--interval", type=int, default=0, help="Repeat every INTERVAL seconds instead of running once.")
+def archive_jobs_command(days, interval):
+    """Move old Completed/Cancelled jobs into the archive database."""
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    while True:
+        conn = get_archive_db()
+        moved = archive_jobs(conn, days)
+        conn.close()
+        click.echo(f"Archived {moved} job(s) older than {days} days")
+        if not interval:
+            break
+        time.sleep(interval)
+
+@_commands.command("expire-stale")
+@click.option("--job-days", type=int, default=None, help="Cancel jobs pending for longer than this many days.")
+@click.option("--claim-days", type=int, default=None, help="Decline claims pending for longer than this many days.")
+@click.option("--interval", type=int, default=0, help="Repeat every INTERVAL seconds instead of running once.")
+def expire_stale_command(job_days, claim_days, interval):
+    """Cancel stale pending jobs and decline stale pending claims."""
+    job_days = PENDING_JOB_TTL_DAYS if job_days is None else job_days
+    claim_days = PENDING_CLAIM_TTL_DAYS if claim_days is None else claim_days
+    init_db()
+    while True:
+        conn = get_db()
+        report = expire_stale(conn, job_days, claim_days)
+        conn.close()
+        click.echo(f"Cancelled {report['jobs_cancelled']} job(s) pending over {job_days} days, "
+                   f"declined {report['claims_declined']} claim(s) pending over {claim_days} days")
+        if not interval:
+            break
+        time.sleep(interval)
+
+@_commands.command("maintenance")
+@click.option("--interval", type=int, default=0, help="Repeat every INTERVAL seconds instead of running once.")
+def maintenance_command(interval):
+    """Apply migrations, remove orphaned rows, vacuum free pages and optimize."""
+    init_db()
+    while True:
+        conn = get_archive_db()
+        report = run_maintenance(conn)
+        conn.close()
+        for name, count in report["orphans"].items():
+            click.echo(f"{name}: {count} orphaned row(s) cleaned up")
+        click.echo(f"Reclaimed {report['pages_reclaimed']} page(s), "
+                   f"database is now {report['page_count']} x {report['page_size']} bytes")
+        if not interval:
+            break
+        time.sleep(interval)
+
+@_commands.command("vacuum")
+def vacuum_command():
+    """Switch the database to incremental vacuuming with a one-off full VACUUM."""
+    init_db()
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT clientID FROM Client WHERE userID=?", (user_id,))
-    row = cur.fetchone()
+    converted = enable_incremental_vacuum(conn)
     conn.close()
-    return row["clientID"] if row else None
+    click.echo("Vacuumed; free pages are now reclaimed by maintenance" if converted
+               else "Already using incremental vacuum")
 
-def get_contractor_id(user_id):
+@_commands.command("rebuild-price-sketches")
+def rebuild_price_sketches_command():
+    """Recompute every price guidance sketch from Transactions."""
+    init_db()
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT contractorID FROM Contractor WHERE userID=?", (user_id,))
-    row = cur.fetchone()
+    pricing.rebuild_sketches(conn)
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM Price_Sketch").fetchone()[0]
     conn.close()
-    return row["contractorID"] if row else None
-
+    click.echo(f"Rebuilt {count} price sketch(es)")
+
+@_commands.command("backup")
+@click.option("--dest", default=None, help="Directory to write backups to.")
+@click.option("--keep", type=click.IntRange(min=1), default=None, help="Number of backups to keep (at least 1).")
+@click.option("--compress/--no-compress", default=True, help="Gzip the backup.")
+@click.option("--interval", type=int, default=0, help="Repeat every INTERVAL seconds instead of running once.")
+def backup_command(dest, keep, compress, interval):
+    """Take an online, integrity-checked backup of the database."""
+    dest = dest or BACKUP_DIR
+    keep = BACKUP_KEEP if keep is None else keep
+    while True:
+        for db_file in (DB_FILE, ARCHIVE_DB_FILE):
+            if os.path.exists(db_file):
+                path = backup_database(db_file, dest, compress=compress, keep=keep)
+                click.echo(f"Backed up {db_file} to {path}")
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+app = create_app()
+boards = app.extensions["leaderboards"]
 
 # -------------------------------
 # Run App
@@ -0,0 +1,97 @@
+"""Hot/cold archival of finished job requests.
+
+Settled jobs older than a cutoff are moved, together with their claim
+requests, out of project.db and into a separate archive database. A job is
+settled once nothing can happen to it any more: it was cancelled, or it was
+completed and the client either denied it or approved and paid for it. A
+completed job still awaiting approval or payment stays where client_approval
+and client_payment can find it.
+The archive is only ATTACHed when a history page or the archive command asks
+for it, so the hot Job_Request table stays small.
+
+Reviews and Transactions stay in the hot database because contractor ratings
+and earnings are computed from them; their jobID still resolves against
+archive.Job_Request since archived rows keep their original IDs.
+"""
+import sqlite3
+
+SETTLED = """(status = 'Cancelled'
+              OR (status = 'Completed'
+                  AND (client_approval = 'Denied'
+                       OR (client_approval = 'Approved'
+                           AND EXISTS (SELECT 1 FROM main.Transactions t WHERE t.jobID = Job_Request.jobID)))))"""
+
+# table -> (unique key, extra indexes used by the history views)
+ARCHIVED_TABLES = {
+    "Job_Request": ("jobID", (("clientID", "date_posted"), ("contractorID", "date_posted"))),
+    "Contractor_Claim_Request": ("requestID", (("jobID",),)),
+}
+
+
+def attach_archive(conn, archive_file):
+    """Attach the archive database as `archive` and make sure it is up to date."""
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_file,))
+    for table in ARCHIVED_TABLES:
+        _sync_table(conn, table)
+    conn.commit()
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _sync_table(conn, table):
+    """Create the archive copy of `table`, or add columns and indexes added since."""
+    key, indexes = ARCHIVED_TABLES[table]
+    archived = _columns(conn, "archive", table)
+    if not archived:
+        conn.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+        conn.execute(f"CREATE UNIQUE INDEX archive.idx_{table}_{key} ON {table}({key})")
+    else:
+        for column in _columns(conn, "main", table):
+            if column not in archived:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+    for columns in indexes:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_{'_'.join(columns)} "
+                     f"ON {table}({', '.join(columns)})")
+
+
+def archive_jobs(conn, older_than_days, batch_size=200):
+    """Move settled jobs older than `older_than_days` into the archive.
+
+    Work is done in batches, each in its own transaction, so the write lock on
+    project.db is only held briefly. `conn` must already have the archive
+    attached. Returns the number of jobs archived.
+    """
+    cutoff = f"-{int(older_than_days)} days"
+    total = 0
+    while True:
+        job_ids = [row[0] for row in conn.execute(f"""
+            SELECT jobID FROM main.Job_Request
+            WHERE {SETTLED}
+              AND COALESCE(date_fulfilled, date_posted) < DATE('now', ?)
+            LIMIT ?
+        """, (cutoff, batch_size))]
+        if not job_ids:
+            return total
+
+        ids = ",".join("?" * len(job_ids))
+        try:
+            # Marks this transaction's deletes as archiving for the outbox
+            # triggers (migrations.add_archive_events)
+            conn.execute("INSERT INTO main.Archive_Run DEFAULT VALUES")
+            for table in ARCHIVED_TABLES:
+                columns = ",".join(_columns(conn, "main", table))
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO archive.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE jobID IN ({ids})
+                """, job_ids)
+            # Claims first, then the jobs they point at
+            conn.execute(f"DELETE FROM main.Contractor_Claim_Request WHERE jobID IN ({ids})", job_ids)
+            conn.execute(f"DELETE FROM main.Job_Request WHERE jobID IN ({ids})", job_ids)
+            conn.execute("DELETE FROM main.Archive_Run")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        total += len(job_ids)
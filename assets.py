@@ -0,0 +1,119 @@
+"""Fingerprinted, precompressed static assets.
+
+build_assets() copies every file in static/ to static/dist/ under a name that
+carries a hash of its contents (style.css -> style.3f2a9c1b7d04.css), with
+.gz and, when the brotli package is installed, .br variants next to it, and
+records the names in static/dist/manifest.json. `flask build-assets` runs it
+at deploy time; the app also runs it on startup if the manifest is missing
+or older than one of the files.
+
+Templates link assets with asset_url("style.css"). /assets/<name> serves the
+best variant the browser accepts with Content-Encoding and, since the name
+changes whenever the contents do, Cache-Control: immutable for a year.
+Files without a manifest entry fall back to the plain /static URL.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Smaller files gain nothing from compression
+MIN_COMPRESS_SIZE = 256
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _write(path, data):
+    # Workers may build at the same time; the names depend only on content
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_dir):
+    """Fingerprint and precompress static_dir's files. Returns the manifest."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(static_dir)):
+        source = os.path.join(static_dir, name)
+        if not os.path.isfile(source):
+            continue
+        with open(source, "rb") as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        manifest[name] = hashed
+        target = os.path.join(dist, hashed)
+        if os.path.exists(target):
+            continue
+        if len(data) >= MIN_COMPRESS_SIZE:
+            _write(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(target + ".br", brotli.compress(data, quality=11))
+        _write(target, data)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_dir):
+    """The current manifest, or None if it is missing or out of date."""
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST)
+    try:
+        built = os.path.getmtime(path)
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for entry in os.scandir(static_dir):
+        if entry.is_file() and (entry.name not in manifest or entry.stat().st_mtime > built):
+            return None
+    return manifest
+
+
+def init_app(app):
+    """Build the assets if needed and add asset_url() and /assets to `app`."""
+    static_dir = app.static_folder
+    dist = os.path.join(static_dir, DIST_DIR)
+    manifest = load_manifest(static_dir)
+    if manifest is None:
+        manifest = build_assets(static_dir)
+    served = set(manifest.values())
+
+    def asset_url(name):
+        if name in manifest:
+            return url_for("assets", filename=manifest[name])
+        return url_for("static", filename=name)
+
+    def assets(filename):
+        if filename not in served:
+            abort(404)
+        path = os.path.join(dist, filename)
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if request.accept_encodings[coding] and os.path.exists(path + suffix):
+                path, encoding = path + suffix, coding
+                break
+        response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True,
+                             etag=True, max_age=None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+
+    app.add_url_rule("/assets/<path:filename>", "assets", assets)
+    app.add_template_global(asset_url)
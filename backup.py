@@ -0,0 +1,108 @@
+"""Online backups of the SQLite database.
+
+Uses the SQLite backup API, copying a few pages per step and sleeping between
+steps, so the app keeps reading and writing while a backup runs. A write to
+the database in between steps starts the copy over; after MAX_RESTARTS of
+those the rest is copied in one step, which holds off writers only for as
+long as it takes to read the file. Every copy is integrity-checked before it
+is kept, can be gzip-compressed, and older copies are rotated out.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+
+MAX_RESTARTS = 5
+
+
+class _Restarting(Exception):
+    """The stepped copy keeps being started over by writes."""
+
+
+def _throttle(pause, max_restarts):
+    last, restarts = None, 0
+
+    def progress(status, remaining, total):
+        nonlocal last, restarts
+        # A restarted copy has as much or more left than the step before
+        if last is not None and remaining >= last:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _Restarting()
+        last = remaining
+        if remaining:
+            time.sleep(pause)
+    return progress
+
+
+def verify_backup(path):
+    """Raise sqlite3.DatabaseError unless `path` passes PRAGMA integrity_check."""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Backup {path} failed integrity check: {result}")
+
+
+def rotate_backups(backup_dir, prefix, keep):
+    """Delete all but the newest `keep` backups starting with `prefix`."""
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, not {keep}")
+    backups = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(prefix) and not name.endswith(".tmp")
+    )
+    removed = backups[:-keep]
+    for name in removed:
+        os.remove(os.path.join(backup_dir, name))
+    return removed
+
+
+def backup_database(db_file, backup_dir, pages=64, pause=0.05, compress=True, keep=7,
+                    max_restarts=MAX_RESTARTS):
+    """Copy `db_file` into `backup_dir` while it stays in use.
+
+    Keeps the newest `keep` backups, which must be at least 1. Returns the
+    path of the new backup.
+    """
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, not {keep}")
+    os.makedirs(backup_dir, exist_ok=True)
+    prefix = os.path.splitext(os.path.basename(db_file))[0] + "-"
+    # Microseconds so backups taken within the same second do not collide
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(backup_dir, f"{prefix}{stamp}.db")
+    tmp_path = path + ".tmp"
+
+    source = sqlite3.connect(db_file)
+    dest = sqlite3.connect(tmp_path)
+    try:
+        try:
+            source.backup(dest, pages=pages, progress=_throttle(pause, max_restarts))
+        except _Restarting:
+            source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+
+    try:
+        verify_backup(tmp_path)
+        if compress:
+            path += ".gz"
+            with open(tmp_path, "rb") as raw, gzip.open(path + ".tmp", "wb") as packed:
+                shutil.copyfileobj(raw, packed)
+            os.remove(tmp_path)
+            tmp_path = path + ".tmp"
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    rotate_backups(backup_dir, prefix, keep)
+    return path
@@ -0,0 +1,126 @@
+"""Login throughput, and what it costs other routes, with and without the hash pool.
+
+Serves the app from a threaded server in this process, like one gthread
+worker, on a scratch database. For each mode, LOGIN_THREADS clients log in
+back to back while OTHER_THREADS logged-in clients load their dashboard,
+for --seconds; it prints logins per second, how many were shed with a 503,
+and dashboard latency percentiles next to a baseline with no logins at all.
+
+    python bench_login.py --seconds 10 --login-threads 8 --other-threads 4
+
+Modes:
+    inline   HASH_WORKERS=0: every login hashes on its request thread
+    pool     the configured HASH_WORKERS processes and HASH_QUEUE waiting
+"""
+import argparse
+import http.cookiejar
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import make_server
+
+import app as app_module
+import passwords
+import ratelimit
+
+
+def _opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                                       _NoRedirect())
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _request(opener, url, data=None):
+    """Status code of one request; redirects are returned, not followed."""
+    try:
+        with opener.open(url, data=urllib.parse.urlencode(data).encode() if data else None, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def _run(base, seconds, login_threads, other_threads):
+    stop = time.monotonic() + seconds
+    logins, shed, latencies = [], [], []
+
+    def log_in(i):
+        opener = _opener()
+        while time.monotonic() < stop:
+            status = _request(opener, f"{base}/login", {"username": f"bench{i % 20}", "password": "pw"})
+            (shed if status == 503 else logins).append(status)
+
+    def browse(i):
+        opener = _opener()
+        _request(opener, f"{base}/login", {"username": f"bench{i % 20}", "password": "pw"})
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            _request(opener, f"{base}/dashboard/client")
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=log_in, args=(i,)) for i in range(login_threads)]
+    threads += [threading.Thread(target=browse, args=(i,)) for i in range(other_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "logins/s": len(logins) / seconds,
+        "shed": len(shed),
+        "p50 ms": 1000 * statistics.median(latencies) if latencies else float("nan"),
+        "p95 ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--login-threads", type=int, default=8)
+    parser.add_argument("--other-threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        app_module.DB_FILE = os.path.join(scratch, "bench.db")
+        app_module.init_db()
+        ratelimit.RATE_LIMIT_ENABLED = False
+        for i in range(20):
+            user_id = app_module.create_user(f"bench{i}", "pw", "client")
+            conn = app_module.get_db()
+            app_module.queries.INSERT_CLIENT_PROFILE(conn, (user_id, "Bench", str(i)))
+            conn.commit()
+            conn.close()
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            rows = {"baseline": _run(base, args.seconds, 0, args.other_threads)}
+            for mode, pool in (("inline", passwords.HashPool(workers=0, queue=args.login_threads)),
+                               ("pool", passwords.HashPool())):
+                passwords.pool = pool
+                rows[mode] = _run(base, args.seconds, args.login_threads, args.other_threads)
+                pool.shutdown()
+        finally:
+            server.shutdown()
+
+    print(f"{'mode':<10}{'logins/s':>10}{'shed':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, row in rows.items():
+        print(f"{mode:<10}{row['logins/s']:>10.1f}{row['shed']:>8}{row['p50 ms']:>10.1f}{row['p95 ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
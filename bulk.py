@@ -0,0 +1,101 @@
+"""Bulk claim decisions and job actions for clients.
+
+A client can approve or reject any number of pending claims, or cancel or
+edit any number of pending jobs, in one request. Everything is checked from
+a single read of the items involved and then applied with one UPDATE per
+kind of change, all inside one write transaction, so a batch either lands
+whole or not at all. Each item gets an Outcome saying what happened to it;
+items that fail their checks are left alone without failing the batch.
+"""
+import json
+from collections import namedtuple
+
+import queries
+import schedule
+
+MAX_ITEMS = 200
+
+Outcome = namedtuple("Outcome", "id ok message")
+
+
+def _ids(values):
+    return json.dumps(list(values))
+
+
+def decide_claims(conn, client_id, decisions):
+    """Apply {requestID: "approve" | "reject"} to claims on client_id's jobs.
+
+    Returns an Outcome per claim, in the order given.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        outcomes = {}
+        accepted, rejected, assignments = [], [], {}
+        # contractorID -> windows approved earlier in this batch, which the
+        # schedule index does not hold yet
+        booked = {}
+        for claim in queries.CLAIMS_FOR_DECISION.all(conn, (_ids(decisions),)):
+            request_id, decision = claim.requestID, decisions[claim.requestID]
+            if claim.jobID is None or claim.clientID != client_id:
+                outcomes[request_id] = Outcome(request_id, False, "Claim not found.")
+            elif claim.status != "Pending":
+                outcomes[request_id] = Outcome(request_id, False, f"Claim was already {claim.status.lower()}.")
+            elif decision == "reject":
+                rejected.append(request_id)
+                outcomes[request_id] = Outcome(request_id, True, "Rejected.")
+            elif (claim.jobStatus != "Pending" or claim.assignedContractor is not None
+                    or claim.jobID in assignments):
+                outcomes[request_id] = Outcome(request_id, False, f"Job #{claim.jobID} already has a contractor.")
+            else:
+                problem = schedule.assignment_problem(conn, claim.jobID, claim.contractorID)
+                windows = booked.setdefault(claim.contractorID, [])
+                if not problem and claim.startMinute is not None and any(
+                        start < claim.endMinute and end > claim.startMinute for start, end in windows):
+                    problem = f"Job #{claim.jobID} overlaps another job approved for this contractor."
+                if problem:
+                    outcomes[request_id] = Outcome(request_id, False, problem)
+                    continue
+                accepted.append(request_id)
+                assignments[claim.jobID] = claim.contractorID
+                if claim.startMinute is not None:
+                    windows.append((claim.startMinute, claim.endMinute))
+                outcomes[request_id] = Outcome(request_id, True, f"Approved for job #{claim.jobID}.")
+
+        if accepted:
+            queries.ACCEPT_CLAIMS(conn, (_ids(accepted),))
+            queries.ASSIGN_CONTRACTORS(conn, (_ids(assignments.items()),))
+        if accepted or rejected:
+            queries.DECLINE_CLAIMS(conn, (_ids(rejected), _ids(assignments)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [outcomes[request_id] for request_id in decisions]
+
+
+def update_jobs(conn, client_id, job_ids, action, service=None, company_id=None):
+    """Cancel (action "cancel") or edit (action "edit": set service and/or
+    company_id) client_id's pending jobs. Returns an Outcome per job, in the
+    order given."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        outcomes, changed = {}, []
+        for job in queries.JOBS_FOR_BULK.all(conn, (_ids(job_ids),)):
+            if job.clientID != client_id:
+                outcomes[job.jobID] = Outcome(job.jobID, False, "Job not found.")
+            elif job.status != "Pending":
+                outcomes[job.jobID] = Outcome(job.jobID, False, f"Job is {job.status}, only pending jobs can change.")
+            else:
+                changed.append(job.jobID)
+                outcomes[job.jobID] = Outcome(job.jobID, True, "Cancelled." if action == "cancel" else "Updated.")
+
+        if changed and action == "cancel":
+            queries.CANCEL_JOBS(conn, (_ids(changed),))
+            queries.DECLINE_PENDING_CLAIMS_FOR_JOBS(conn, (_ids(changed),))
+        elif changed:
+            queries.EDIT_JOBS(conn, (service or None, company_id or None, _ids(changed)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [outcomes[job_id] for job_id in job_ids]
@@ -0,0 +1,43 @@
+"""Configuration profiles, picked by app.create_app() from APP_CONFIG.
+
+    development   debug, templates reloaded when edited
+    production    default; compiled templates cached on disk (JINJA_CACHE_DIR)
+    testing       TESTING on, nothing cached on disk
+"""
+import os
+import tempfile
+
+
+class Config:
+    SECRET_KEY = os.environ.get("SECRET_KEY", "supersecret")
+    DATABASE = os.environ.get("DATABASE", "project.db")
+    ARCHIVE_DATABASE = os.environ.get("ARCHIVE_DATABASE", "archive.db")
+    # Directory for Jinja's compiled-template cache; None disables it
+    JINJA_CACHE_DIR = None
+    # Proxies in front of the app that append to X-Forwarded-For (Render's
+    # load balancer is one); request.remote_addr is the address the nearest
+    # of them saw, which is what rate limiting keys anonymous clients on
+    PROXY_HOPS = int(os.environ.get("PROXY_HOPS", 1))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    TEMPLATES_AUTO_RELOAD = True
+    # Served directly by `flask run`; any X-Forwarded-For is the client's own
+    PROXY_HOPS = int(os.environ.get("PROXY_HOPS", 0))
+
+
+class ProductionConfig(Config):
+    TEMPLATES_AUTO_RELOAD = False
+    JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "contractor-jinja"))
+
+
+class TestingConfig(Config):
+    TESTING = True
+
+
+PROFILES = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "testing": TestingConfig,
+}
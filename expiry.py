@@ -0,0 +1,94 @@
+"""Expiry of stale pending jobs and claims.
+
+Pending jobs and claims otherwise wait forever, and both the open-jobs list
+and the pending-claims lookups on the client dashboard keep growing. The
+sweeper cancels jobs that have been pending longer than one TTL, declining
+their pending claims with them, and declines claims pending longer than
+another. Every row it changes gets an Expiry_Log entry.
+
+The oldest rows are found through partial indexes on the pending rows only
+(migrations.create_expiry_log) and changed a batch at a time, each batch in
+its own short write transaction. A batch that holds the lock longer than
+max_lock seconds halves the next one, so however busy the triggers on
+Job_Request are, other writers only ever wait a few milliseconds.
+"""
+import time
+
+
+def _sweep(conn, expire, days, batch_size, max_lock, pause):
+    """Call expire(conn, cutoff, limit) in write transactions until it
+    returns fewer than `limit` rows. Returns the total it returned."""
+    cutoff = f"-{int(days)} days"
+    limit, total = batch_size, 0
+    while True:
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = expire(conn, cutoff, limit)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        held = time.perf_counter() - started
+        total += changed
+        if changed < limit:
+            return total
+        if held > max_lock:
+            limit = max(1, limit // 2)
+        elif held < max_lock / 2:
+            limit = min(batch_size, limit * 2)
+        time.sleep(pause)
+
+
+def _log(conn, kind, item_ids):
+    conn.executemany("INSERT INTO Expiry_Log (kind, itemID) VALUES (?, ?)", ((kind, item_id) for item_id in item_ids))
+
+
+def _expire_jobs(conn, cutoff, limit):
+    job_ids = [row[0] for row in conn.execute("""
+        UPDATE Job_Request SET status = 'Cancelled'
+        WHERE jobID IN (
+            SELECT jobID FROM Job_Request
+            WHERE status = 'Pending' AND date_posted < DATE('now', ?)
+            ORDER BY date_posted LIMIT ?
+        )
+        RETURNING jobID
+    """, (cutoff, limit)).fetchall()]
+    claim_ids = [row[0] for row in conn.execute(f"""
+        UPDATE Contractor_Claim_Request SET status = 'Declined'
+        WHERE status = 'Pending' AND jobID IN ({",".join("?" * len(job_ids))})
+        RETURNING requestID
+    """, job_ids).fetchall()] if job_ids else []
+    _log(conn, "job", job_ids)
+    _log(conn, "claim", claim_ids)
+    return len(job_ids)
+
+
+def _expire_claims(conn, cutoff, limit):
+    claim_ids = [row[0] for row in conn.execute("""
+        UPDATE Contractor_Claim_Request SET status = 'Declined'
+        WHERE requestID IN (
+            SELECT requestID FROM Contractor_Claim_Request
+            WHERE status = 'Pending' AND date_requested < DATE('now', ?)
+            ORDER BY date_requested LIMIT ?
+        )
+        RETURNING requestID
+    """, (cutoff, limit)).fetchall()]
+    _log(conn, "claim", claim_ids)
+    return len(claim_ids)
+
+
+def expire_jobs(conn, days, batch_size=100, max_lock=0.005, pause=0.01):
+    """Cancel jobs pending for more than `days` days, and decline their
+    pending claims. Returns the number of jobs cancelled."""
+    return _sweep(conn, _expire_jobs, days, batch_size, max_lock, pause)
+
+
+def expire_claims(conn, days, batch_size=100, max_lock=0.005, pause=0.01):
+    """Decline claims pending for more than `days` days. Returns the number declined."""
+    return _sweep(conn, _expire_claims, days, batch_size, max_lock, pause)
+
+
+def expire_stale(conn, job_days, claim_days):
+    """Run both sweeps and return a report of what changed."""
+    return {"jobs_cancelled": expire_jobs(conn, job_days), "claims_declined": expire_claims(conn, claim_days)}
@@ -0,0 +1,92 @@
+"""Database fixtures shared by the tests.
+
+The schema is built once per test process by the app's own init_db() (the
+base tables plus every migration) into a template database in memory. Each
+test gets a copy of it, made with the backup API, in its own named in-memory
+database that app.get_db() opens through DB_FILE. Nothing is written to
+disk and every name carries the process id, so test processes can run in
+parallel.
+"""
+import itertools
+import os
+import sqlite3
+import unittest
+
+import app as app_module
+import idempotency
+import ratelimit
+
+_counter = itertools.count()
+_template = None
+
+
+def memory_uri(label):
+    """A shared-cache in-memory database URI unique to this process."""
+    return f"file:{label}-{os.getpid()}-{next(_counter)}?mode=memory&cache=shared"
+
+
+def template_db():
+    """Connection to the migrated template database, built on first use."""
+    global _template
+    if _template is None:
+        uri = memory_uri("template")
+        # An in-memory database lives as long as a connection to it is open
+        conn = sqlite3.connect(uri, uri=True)
+        old_file, app_module.DB_FILE = app_module.DB_FILE, uri
+        try:
+            app_module.init_db()
+        finally:
+            app_module.DB_FILE = old_file
+        _template = conn
+    return _template
+
+
+def clone_db():
+    """Copy the template into a new in-memory database. Returns (uri, conn);
+    the copy is dropped when conn is closed."""
+    uri = memory_uri("test")
+    conn = sqlite3.connect(uri, uri=True)
+    template_db().backup(conn)
+    return uri, conn
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test on a fresh clone of the template database.
+
+    app.DB_FILE points at the clone for the length of the test; self.conn is
+    a connection to it and self.client a Flask test client. Rate limiting is
+    off so tests can log in as often as they need.
+    """
+
+    def setUp(self):
+        self.old_file = app_module.DB_FILE
+        self.old_rate_limit = ratelimit.RATE_LIMIT_ENABLED
+        app_module.DB_FILE, self.conn = clone_db()
+        app_module._schema_ready.add(app_module.DB_FILE)
+        ratelimit.RATE_LIMIT_ENABLED = False
+        # Leaderboards loaded from another test's database
+        app_module.boards.clear()
+        idempotency.cache.clear()
+        self.client = app_module.app.test_client()
+
+    def tearDown(self):
+        app_module._schema_ready.discard(app_module.DB_FILE)
+        app_module.DB_FILE = self.old_file
+        ratelimit.RATE_LIMIT_ENABLED = self.old_rate_limit
+        self.conn.close()
+
+    def create_user(self, username, role, password="pw", **profile):
+        """Insert a user with a client or contractor profile. Returns (userID, profile id)."""
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO User (username, password, role) VALUES (?, ?, ?)", (username, password, role))
+        user_id = cur.lastrowid
+        profile = {"firstName": username.title(), "lastName": "Test", **profile}
+        columns = ", ".join(["userID", *profile])
+        marks = ", ".join("?" * (len(profile) + 1))
+        table = "Client" if role == "client" else "Contractor"
+        cur.execute(f"INSERT INTO {table} ({columns}) VALUES ({marks})", (user_id, *profile.values()))
+        self.conn.commit()
+        return user_id, cur.lastrowid
+
+    def login(self, username, password="pw"):
+        return self.client.post("/login", data={"username": username, "password": password})
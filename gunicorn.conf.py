@@ -0,0 +1,20 @@
+"""Gunicorn settings.
+
+The app is imported once in the master (preload_app) and warmed up there
+before any worker is forked: migrations are applied once rather than raced
+by every worker, and the compiled templates are shared copy-on-write. No
+database connection is left open across the fork.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Threaded workers so open /events streams do not tie up a whole process
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+preload_app = True
+
+
+def on_starting(server):
+    import app
+    app.warm_up()
@@ -0,0 +1,104 @@
+"""Idempotency keys for POSTs that must not be applied twice.
+
+The payment and review forms carry a random key (new_key(), rendered into a
+hidden field); other clients may send an Idempotency-Key header instead.
+The first POST with a key records it in Idempotency_Key, inside the same
+write transaction as its own writes, together with where it sends the user
+next. A retry, from a double click or a browser resending after a slow
+response, finds the key already taken and gets the same redirect without
+anything being written again. The (userID, endpoint, key) primary key
+settles races between workers: the second request waits for the first's
+write lock and then sees its row.
+
+Each worker also remembers the keys it has answered for CACHE_SECONDS, so a
+burst of retries is answered without touching the database at all. Keys are
+deleted after a day by maintenance.prune_idempotency_keys.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request
+
+import queries
+
+CACHE_SECONDS = float(os.environ.get("IDEMPOTENCY_CACHE_SECONDS", 300))
+CACHE_SIZE = 10000
+MAX_KEY_LENGTH = 100
+
+
+class DedupeCache:
+    """Results of recent keyed requests, dropped after `ttl` seconds or once
+    more than `size` are held, oldest first."""
+
+    def __init__(self, ttl=CACHE_SECONDS, size=CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, entry):
+        with self._lock:
+            found = self._entries.get(entry)
+            if found is None:
+                return None
+            expires, result = found
+            if expires < time.monotonic():
+                del self._entries[entry]
+                return None
+            return result
+
+    def put(self, entry, result):
+        with self._lock:
+            self._entries.pop(entry, None)
+            self._entries[entry] = (time.monotonic() + self.ttl, result)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = DedupeCache()
+
+
+def new_key():
+    """A fresh key for a form about to be rendered."""
+    return secrets.token_urlsafe(16)
+
+
+def request_key():
+    """The current request's key, or None if it did not send one."""
+    key = request.form.get("idempotency_key") or request.headers.get("Idempotency-Key")
+    return key[:MAX_KEY_LENGTH] if key else None
+
+
+def begin(conn, user_id, endpoint, key, result):
+    """Open the write transaction for a keyed POST.
+
+    Returns None if the key is new (or there is none): the caller makes its
+    writes and commits, and the key, with `result`, commits along with them.
+    Returns the result stored for the key if it has been used before; the
+    transaction is already closed and nothing should be written.
+    """
+    entry = (user_id, endpoint, key)
+    if key is not None:
+        replayed = cache.get(entry)
+        if replayed is not None:
+            return replayed
+    conn.execute("BEGIN IMMEDIATE")
+    if key is None or queries.CLAIM_IDEMPOTENCY_KEY(conn, (user_id, endpoint, key, result)).rowcount:
+        return None
+    replayed = queries.IDEMPOTENCY_RESULT.one(conn, (user_id, endpoint, key)).result
+    conn.rollback()
+    cache.put(entry, replayed)
+    return replayed
+
+
+def remember(user_id, endpoint, key, result):
+    """Cache a keyed POST's result once its transaction has committed."""
+    if key is not None:
+        cache.put((user_id, endpoint, key), result)
@@ -0,0 +1,180 @@
+"""Top-N contractor leaderboards, kept in memory.
+
+Contractors are ranked three ways:
+    rating     by rating, for those with at least MIN_REVIEWS reviews
+    completed  by number of completed jobs
+    recent     by the date of their last completed job
+and each ranking exists overall, per service, per city and per state. A
+board is a list of sort keys kept in order with bisect, so reading the top N
+is a slice and moving one contractor is two binary searches.
+
+Routes that change a contractor's standing (a review, a completed job, a
+profile edit) call refresh() after their commit, which re-reads that one
+contractor and moves them on every board. Boards are rebuilt from the
+database at most every RECONCILE_INTERVAL seconds on read, which repairs any
+drift and picks up changes other workers made to their own copies.
+
+GET /contractors/leaderboard?metric=rating&scope=service&value=Plumbing
+shows a board.
+"""
+import bisect
+import datetime
+import os
+import threading
+import time
+
+from flask import abort, redirect, render_template, request, session
+
+import queries
+
+MIN_REVIEWS = int(os.environ.get("LEADERBOARD_MIN_REVIEWS", 3))
+RECONCILE_INTERVAL = float(os.environ.get("LEADERBOARD_RECONCILE_INTERVAL", 300))
+TOP_N = 10
+
+METRICS = ("rating", "completed", "recent")
+SCOPES = ("all", "service", "city", "state")
+
+
+def _sort_key(metric, standing):
+    """Where `standing` sorts on the metric's boards, or None if it is not ranked."""
+    if metric == "rating":
+        if standing.rating is None or standing.reviewCount < MIN_REVIEWS:
+            return None
+        return (-standing.rating, -standing.reviewCount, standing.contractorID)
+    if metric == "completed":
+        if not standing.completedJobs:
+            return None
+        return (-standing.completedJobs, -(standing.rating or 0), standing.contractorID)
+    if not standing.lastCompleted:
+        return None
+    day = datetime.date.fromisoformat(standing.lastCompleted[:10]).toordinal()
+    return (-day, -standing.completedJobs, standing.contractorID)
+
+
+def _scope_values(standing):
+    """(scope, value) for every board the contractor belongs on."""
+    yield "all", ""
+    if standing.service:
+        yield "service", standing.service
+    if standing.city and standing.state:
+        yield "city", f"{standing.city}, {standing.state}"
+    if standing.state:
+        yield "state", standing.state
+
+
+class Board:
+    """Sort keys in order; the last item of each key is the contractor id."""
+
+    def __init__(self, keys=()):
+        self.keys = sorted(keys)
+
+    def add(self, key):
+        bisect.insort(self.keys, key)
+
+    def remove(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def top(self, n):
+        return [key[-1] for key in self.keys[:n]]
+
+
+class Leaderboards:
+    """Every board, indexed by (metric, scope, value)."""
+
+    def __init__(self, connect, interval=RECONCILE_INTERVAL):
+        self._connect = connect
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._standings = {}
+        self._loaded = None
+
+    def _placements(self, standing):
+        for metric in METRICS:
+            key = _sort_key(metric, standing)
+            if key is not None:
+                for scope, value in _scope_values(standing):
+                    yield (metric, scope, value), key
+
+    def reload(self, conn):
+        """Rebuild every board from the database."""
+        standings, keys = {}, {}
+        for standing in queries.CONTRACTOR_STANDINGS(conn):
+            standings[standing.contractorID] = standing
+            for board, key in self._placements(standing):
+                keys.setdefault(board, []).append(key)
+        boards = {board: Board(board_keys) for board, board_keys in keys.items()}
+        with self._lock:
+            self._boards, self._standings = boards, standings
+            self._loaded = time.monotonic()
+
+    def refresh(self, conn, contractor_id):
+        """Re-read one contractor and move them on their boards."""
+        standing = queries.CONTRACTOR_STANDING.one(conn, (contractor_id,))
+        with self._lock:
+            if self._loaded is None:
+                return
+            old = self._standings.pop(contractor_id, None)
+            if old is not None:
+                for board, key in self._placements(old):
+                    self._boards[board].remove(key)
+            if standing is not None:
+                self._standings[contractor_id] = standing
+                for board, key in self._placements(standing):
+                    self._boards.setdefault(board, Board()).add(key)
+
+    def clear(self):
+        """Drop everything; the next read reloads from the database."""
+        with self._lock:
+            self._boards, self._standings, self._loaded = {}, {}, None
+
+    def _reconcile(self):
+        loaded = self._loaded
+        if loaded is None or time.monotonic() - loaded >= self._interval:
+            conn = self._connect()
+            try:
+                self.reload(conn)
+            finally:
+                conn.close()
+
+    def top(self, metric, scope="all", value="", n=TOP_N):
+        """The first n standings on a board, best first."""
+        self._reconcile()
+        with self._lock:
+            board = self._boards.get((metric, scope, value))
+            if board is None:
+                return []
+            return [self._standings[contractor_id] for contractor_id in board.top(n)]
+
+    def values(self, scope):
+        """The values of `scope` that have at least one board, sorted."""
+        self._reconcile()
+        with self._lock:
+            return sorted({value for _, board_scope, value in self._boards if board_scope == scope})
+
+
+def init_app(app, get_db):
+    """Add /contractors/leaderboard to `app`. Returns the Leaderboards, for
+    routes to refresh()."""
+    boards = Leaderboards(get_db)
+    app.extensions["leaderboards"] = boards
+
+    def leaderboard():
+        if "user_id" not in session:
+            return redirect("/login")
+        metric = request.args.get("metric", "rating")
+        scope = request.args.get("scope", "all")
+        if metric not in METRICS or scope not in SCOPES:
+            abort(400)
+        value = request.args.get("value", "") if scope != "all" else ""
+        values = boards.values(scope) if scope != "all" else []
+        if scope != "all" and value not in values:
+            value = values[0] if values else ""
+        return render_template("leaderboard.html", standings=boards.top(metric, scope, value),
+                               metric=metric, scope=scope, value=value, values=values,
+                               metrics=METRICS, scopes=SCOPES, min_reviews=MIN_REVIEWS)
+
+    app.add_url_rule("/contractors/leaderboard", "leaderboard", leaderboard)
+    return boards
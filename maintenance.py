@@ -0,0 +1,184 @@
+"""Routine database upkeep: orphan cleanup, notification, hourly rollup,
+change feed and idempotency key pruning, incremental vacuum and optimize.
+
+Every step works in small batches with a commit in between so the app keeps
+serving requests while maintenance runs. The connection passed in must have
+the job archive attached (see archive.attach_archive) so rows that point at
+archived jobs are not mistaken for orphans.
+"""
+import time
+
+_LIVE_JOB = """(jobID IN (SELECT jobID FROM main.Job_Request)
+               OR jobID IN (SELECT jobID FROM archive.Job_Request))"""
+
+# table -> condition matching rows whose parent row no longer exists
+ORPHANS = {
+    "Contractor_Claim_Request": f"NOT {_LIVE_JOB}",
+    "Review": f"NOT {_LIVE_JOB}",
+    "Transactions": f"NOT {_LIVE_JOB}",
+}
+
+# (table, column) references to Company that are cleared when it is deleted
+COMPANY_REFERENCES = (("Job_Request", "companyID"), ("Contractor", "companyID"))
+
+
+def delete_orphans(conn, batch_size=500, pause=0.01):
+    """Delete orphaned rows batch by batch. Returns {table: rows deleted}."""
+    deleted = {}
+    rated = set()
+    for table, orphaned in ORPHANS.items():
+        deleted[table] = 0
+        while True:
+            # Every orphaned table names a contractor; for reviews it is the
+            # one whose rating has to be worked out again
+            contractors = [row[0] for row in conn.execute(f"""
+                DELETE FROM main.{table} WHERE rowid IN (
+                    SELECT rowid FROM main.{table} WHERE {orphaned} LIMIT ?
+                ) RETURNING contractorID
+            """, (batch_size,))]
+            conn.commit()
+            deleted[table] += len(contractors)
+            if table == "Review":
+                rated.update(contractor for contractor in contractors if contractor is not None)
+            if len(contractors) < batch_size:
+                break
+            time.sleep(pause)
+
+    # Ratings are averages over Review: refresh only the contractors who lost one
+    rated = sorted(rated)
+    for start in range(0, len(rated), batch_size):
+        batch = rated[start:start + batch_size]
+        conn.execute(f"""
+            UPDATE Contractor SET rating = (
+                SELECT AVG(rating) FROM Review WHERE Review.contractorID = Contractor.contractorID
+            ) WHERE contractorID IN ({",".join("?" * len(batch))})
+        """, batch)
+        conn.commit()
+        time.sleep(pause)
+
+    for table, column in COMPANY_REFERENCES:
+        cur = conn.execute(f"""
+            UPDATE main.{table} SET {column} = NULL
+            WHERE {column} IS NOT NULL AND {column} NOT IN (SELECT companyID FROM Company)
+        """)
+        conn.commit()
+        deleted[f"{table}.{column}"] = cur.rowcount
+    return deleted
+
+
+def prune_notifications(conn, keep_days=7, batch_size=500, pause=0.01):
+    """Delete notifications older than keep_days. Returns the number deleted.
+
+    They only exist to be replayed to streams that reconnect (notifications.py).
+    """
+    deleted = 0
+    while True:
+        cur = conn.execute("""
+            DELETE FROM Notification WHERE eventID IN (
+                SELECT eventID FROM Notification WHERE created < DATETIME('now', ?) LIMIT ?
+            )
+        """, (f"-{int(keep_days)} days", batch_size))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def prune_hourly_rollups(conn, keep_days=14, batch_size=500, pause=0.01):
+    """Delete hourly analytics rollups older than keep_days. Returns the
+    number deleted; the daily rollups keep the history."""
+    deleted = 0
+    while True:
+        cur = conn.execute("""
+            DELETE FROM Analytics_Hourly WHERE rowid IN (
+                SELECT rowid FROM Analytics_Hourly WHERE hour < STRFTIME('%Y-%m-%d %H:00', 'now', ?) LIMIT ?
+            )
+        """, (f"-{int(keep_days)} days", batch_size))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def prune_outbox(conn, keep_days=30, batch_size=500, pause=0.01):
+    """Delete change-feed events older than keep_days that every named
+    consumer has acknowledged (outbox.py). Returns the number deleted."""
+    deleted = 0
+    while True:
+        cur = conn.execute("""
+            DELETE FROM Outbox WHERE eventID IN (
+                SELECT eventID FROM Outbox
+                WHERE created < DATETIME('now', ?)
+                  AND eventID <= (SELECT IFNULL(MIN(position), 9223372036854775807) FROM Outbox_Consumer)
+                LIMIT ?
+            )
+        """, (f"-{int(keep_days)} days", batch_size))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def prune_idempotency_keys(conn, keep_days=1, batch_size=500, pause=0.01):
+    """Delete idempotency keys older than keep_days (idempotency.py); no
+    retry comes that late. Returns the number deleted."""
+    deleted = 0
+    while True:
+        cur = conn.execute("""
+            DELETE FROM Idempotency_Key WHERE rowid IN (
+                SELECT rowid FROM Idempotency_Key WHERE created < DATETIME('now', ?) LIMIT ?
+            )
+        """, (f"-{int(keep_days)} days", batch_size))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the database to auto_vacuum=INCREMENTAL. Returns whether it had to.
+
+    On an existing database that takes a full VACUUM, which rewrites the file
+    and holds off writers until it is done, so it is not part of
+    run_maintenance() but its own command (flask vacuum).
+    """
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.commit()
+    conn.execute("PRAGMA main.auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM main")
+    return True
+
+
+def incremental_vacuum(conn, pages_per_step=256, pause=0.01):
+    """Return free pages to the filesystem a few at a time.
+
+    Returns the number of pages reclaimed. Does nothing unless the database
+    uses auto_vacuum=INCREMENTAL (see enable_incremental_vacuum).
+    """
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] != 2:
+        return 0
+    before = conn.execute("PRAGMA main.page_count").fetchone()[0]
+    while conn.execute("PRAGMA main.freelist_count").fetchone()[0]:
+        conn.execute(f"PRAGMA main.incremental_vacuum({int(pages_per_step)})").fetchall()
+        conn.commit()
+        time.sleep(pause)
+    return before - conn.execute("PRAGMA main.page_count").fetchone()[0]
+
+
+def run_maintenance(conn):
+    """Run every maintenance step and return a report of what changed."""
+    report = {"orphans": delete_orphans(conn)}
+    report["notifications_pruned"] = prune_notifications(conn)
+    report["hourly_rollups_pruned"] = prune_hourly_rollups(conn)
+    report["outbox_pruned"] = prune_outbox(conn)
+    report["idempotency_keys_pruned"] = prune_idempotency_keys(conn)
+    report["pages_reclaimed"] = incremental_vacuum(conn)
+    conn.execute("PRAGMA main.optimize")
+    report["page_count"] = conn.execute("PRAGMA main.page_count").fetchone()[0]
+    report["page_size"] = conn.execute("PRAGMA main.page_size").fetchone()[0]
+    return report
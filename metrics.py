@@ -0,0 +1,314 @@
+"""Prometheus-style metrics for the app.
+
+Each process keeps its counters and histograms in memory and, at most once
+per FLUSH_INTERVAL, writes a snapshot to METRICS_DIR/metrics-<pid>.json.
+/metrics adds up the snapshots of every gunicorn worker, so whichever worker
+answers the scrape reports totals for the whole host. No locks are shared
+between workers: every process only ever writes its own file.
+
+/metrics is off unless METRICS_TOKEN is set; scrapers send it as
+"Authorization: Bearer <token>" (Prometheus: authorization.credentials).
+"""
+import hmac
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import Response, abort, request
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "contractor-metrics"))
+FLUSH_INTERVAL = 1.0
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Reentrant: a TimedConnection collected while the lock is held takes it again in __del__
+_lock = threading.RLock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., +Inf, sum]
+_gauges = {}      # (name, labels) -> value, reported only for live processes
+_last_flush = 0.0
+_request_state = threading.local()
+
+HELP = {
+    "http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "http_request_duration_seconds": ("histogram", "Request latency by endpoint."),
+    "db_queries_total": ("counter", "SQL statements executed, by endpoint."),
+    "db_time_seconds_total": ("counter", "Time spent executing and fetching SQL, by endpoint."),
+    "sqlite_busy_errors_total": ("counter", "Requests that failed with 'database is locked', by endpoint."),
+    "sqlite_connections_open": ("gauge", "SQLite connections currently open, by process."),
+    "rate_limited_total": ("counter", "Requests turned away with 429 by the rate limiter, by endpoint."),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add `amount` to the counter `name` with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Record `value` in the histogram `name` with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        buckets = _histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        buckets[-2] += 1
+        buckets[-1] += value
+
+
+def set_gauge(name, value, **labels):
+    key = _key(name, {**labels, "pid": str(os.getpid())})
+    with _lock:
+        _gauges[key] = value
+
+
+# -------------------------------
+# Instrumented SQLite connection
+# -------------------------------
+_open_connections = 0
+
+
+def _record_db_time(started, statements=0):
+    if getattr(_request_state, "active", False):
+        _request_state.db_time += time.perf_counter() - started
+        _request_state.queries += statements
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            _record_db_time(started, 1)
+
+    def executemany(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            _record_db_time(started, 1)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record_db_time(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record_db_time(started)
+
+    def __next__(self):
+        # Streamed pages read their rows by iterating the cursor
+        started = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            _record_db_time(started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that reports open connections and per-request DB time."""
+
+    def __init__(self, *args, **kwargs):
+        global _open_connections
+        super().__init__(*args, **kwargs)
+        with _lock:
+            _open_connections += 1
+        self._counted = True
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def _uncount(self):
+        global _open_connections
+        if getattr(self, "_counted", False):
+            self._counted = False
+            with _lock:
+                _open_connections -= 1
+
+    def close(self):
+        self._uncount()
+        super().close()
+
+    def __del__(self):
+        # Connections the routes forget to close count until they are collected
+        self._uncount()
+
+
+# -------------------------------
+# Multi-process store
+# -------------------------------
+def flush(force=False):
+    """Write this process's metrics to its snapshot file."""
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    set_gauge("sqlite_connections_open", _open_connections)
+    with _lock:
+        snapshot = {
+            "counters": [[n, list(l), v] for (n, l), v in _counters.items()],
+            "histograms": [[n, list(l), v] for (n, l), v in _histograms.items()],
+            "gauges": [[n, list(l), v] for (n, l), v in _gauges.items()],
+        }
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"metrics-{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Aggregate the snapshots of every process into counters, histograms and gauges."""
+    counters, histograms, gauges = {}, {}, {}
+    for name in os.listdir(METRICS_DIR) if os.path.isdir(METRICS_DIR) else ():
+        if not (name.startswith("metrics-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for n, labels, value in snapshot["counters"]:
+            key = (n, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for n, labels, values in snapshot["histograms"]:
+            key = (n, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(merged, values)]
+        if _pid_alive(int(name[len("metrics-"):-len(".json")])):
+            for n, labels, value in snapshot["gauges"]:
+                gauges[(n, tuple(map(tuple, labels)))] = value
+    return counters, histograms, gauges
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Render the aggregated metrics in the Prometheus text format."""
+    counters, histograms, gauges = collect()
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, (kind, name))[1]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), values in sorted(histograms.items()):
+        describe(name, "histogram")
+        for bound, count in zip(BUCKETS, values):
+            lines.append(f"{name}_bucket{_labels(labels, le=bound)} {count}")
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {values[-2]}')
+        lines.append(f"{name}_sum{_labels(labels)} {values[-1]}")
+        lines.append(f"{name}_count{_labels(labels)} {values[-2]}")
+    for (name, labels), value in sorted(gauges.items()):
+        describe(name, "gauge")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Flask hooks
+# -------------------------------
+def _before_request():
+    _request_state.active = True
+    _request_state.streaming = False
+    _request_state.started = time.perf_counter()
+    _request_state.db_time = 0.0
+    _request_state.queries = 0
+
+
+def _record(endpoint, method, status):
+    elapsed = time.perf_counter() - _request_state.started
+    inc("http_requests_total", endpoint=endpoint, method=method, status=status)
+    observe("http_request_duration_seconds", elapsed, endpoint=endpoint)
+    inc("db_queries_total", _request_state.queries, endpoint=endpoint)
+    inc("db_time_seconds_total", _request_state.db_time, endpoint=endpoint)
+
+
+def _after_request(response):
+    if getattr(_request_state, "active", False):
+        labels = (request.endpoint or "unmatched", request.method, str(response.status_code))
+        if response.is_streamed:
+            # The body, and the queries that feed it, run after this hook:
+            # keep counting until the server closes the response
+            _request_state.streaming = True
+            response.call_on_close(lambda: _close_stream(*labels))
+        else:
+            _record(*labels)
+    return response
+
+
+def _close_stream(*labels):
+    _record(*labels)
+    _request_state.active = _request_state.streaming = False
+    flush()
+
+
+def _teardown_request(exc):
+    if isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc):
+        inc("sqlite_busy_errors_total", endpoint=request.endpoint or "unmatched")
+    if not getattr(_request_state, "streaming", False):
+        _request_state.active = False
+        flush()
+
+
+def metrics_endpoint():
+    if not METRICS_TOKEN:
+        abort(404)
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied, METRICS_TOKEN):
+        return Response("Invalid metrics token", status=401)
+    flush(force=True)
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics endpoint (off unless METRICS_TOKEN is set) on `app`."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
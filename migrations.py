@@ -0,0 +1,841 @@
+"""Versioned schema migrations.
+
+init_db() creates the base tables; anything that changes an existing database
+goes here as a function appended to MIGRATIONS. Each one runs exactly once and
+the number applied so far is stored in PRAGMA user_version.
+
+Migrations only run SQL, inside the transaction migrate() opens for them:
+nothing that commits (VACUUM) and no app code whose queries may change later.
+Work of that kind is a maintenance command instead.
+"""
+
+# Tables from an earlier schema that nothing in app.py reads or writes
+LEGACY_TABLES = ("JobRequest", "Reviews", "Job_Claims")
+
+
+def drop_legacy_tables(conn):
+    for table in LEGACY_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def reserve_incremental_vacuum(conn):
+    """Version 2, deliberately a no-op: migrate() only records the bump.
+
+    It used to VACUUM the file into auto_vacuum=INCREMENTAL, which commits
+    the migration's transaction and rewrites the whole database at startup.
+    init_db() now creates databases with auto_vacuum=INCREMENTAL and `flask
+    vacuum` (maintenance.enable_incremental_vacuum) converts older ones.
+    """
+
+
+# Job_Card is a denormalized copy of Job_Request with the names the listing
+# pages show, kept in step with its source tables by the triggers below.
+_JOB_CARD_COLUMNS = """
+           jr.jobID, jr.clientID, jr.contractorID, jr.companyID, jr.service, jr.status,
+           jr.client_approval, jr.date_posted, jr.date_fulfilled,
+           (SELECT name FROM Company WHERE companyID = jr.companyID),
+           (SELECT firstName || ' ' || lastName FROM Client WHERE clientID = jr.clientID),
+           (SELECT firstName || ' ' || lastName FROM Contractor WHERE contractorID = jr.contractorID),
+           (SELECT COUNT(*) FROM Contractor_Claim_Request
+            WHERE jobID = jr.jobID AND status = 'Pending')"""
+
+# The card as create_job_cards built it, before Job_Request had a schedule
+_FIRST_JOB_CARD_SELECT = f"SELECT {_JOB_CARD_COLUMNS} FROM Job_Request jr"
+
+# The current card, with the job's window appended by add_job_card_schedules
+JOB_CARD_SELECT = f"""
+    SELECT {_JOB_CARD_COLUMNS},
+           jr.scheduled_start, jr.scheduled_end
+    FROM Job_Request jr
+"""
+
+_PENDING_CLAIMS = """
+    UPDATE Job_Card SET pendingClaims = (
+        SELECT COUNT(*) FROM Contractor_Claim_Request WHERE jobID = {job}.jobID AND status = 'Pending'
+    ) WHERE jobID = {job}.jobID;
+"""
+
+
+def _job_card_triggers(select):
+    return {
+        "job_card_job_insert": f"""
+            AFTER INSERT ON Job_Request BEGIN
+                INSERT OR REPLACE INTO Job_Card {select} WHERE jr.jobID = NEW.jobID;
+            END""",
+        "job_card_job_update": f"""
+            AFTER UPDATE ON Job_Request BEGIN
+                INSERT OR REPLACE INTO Job_Card {select} WHERE jr.jobID = NEW.jobID;
+            END""",
+    } | _JOB_CARD_SOURCE_TRIGGERS
+
+
+# Names and claim counts, which do not depend on the card's columns
+_JOB_CARD_SOURCE_TRIGGERS = {
+    "job_card_job_delete": """
+        AFTER DELETE ON Job_Request BEGIN
+            DELETE FROM Job_Card WHERE jobID = OLD.jobID;
+        END""",
+    "job_card_company_update": """
+        AFTER UPDATE OF name ON Company BEGIN
+            UPDATE Job_Card SET companyName = NEW.name WHERE companyID = NEW.companyID;
+        END""",
+    "job_card_company_delete": """
+        AFTER DELETE ON Company BEGIN
+            UPDATE Job_Card SET companyName = NULL WHERE companyID = OLD.companyID;
+        END""",
+    "job_card_client_insert": """
+        AFTER INSERT ON Client BEGIN
+            UPDATE Job_Card SET clientName = NEW.firstName || ' ' || NEW.lastName WHERE clientID = NEW.clientID;
+        END""",
+    "job_card_client_update": """
+        AFTER UPDATE OF firstName, lastName ON Client BEGIN
+            UPDATE Job_Card SET clientName = NEW.firstName || ' ' || NEW.lastName WHERE clientID = NEW.clientID;
+        END""",
+    "job_card_contractor_insert": """
+        AFTER INSERT ON Contractor BEGIN
+            UPDATE Job_Card SET contractorName = NEW.firstName || ' ' || NEW.lastName
+            WHERE contractorID = NEW.contractorID;
+        END""",
+    "job_card_contractor_update": """
+        AFTER UPDATE OF firstName, lastName ON Contractor BEGIN
+            UPDATE Job_Card SET contractorName = NEW.firstName || ' ' || NEW.lastName
+            WHERE contractorID = NEW.contractorID;
+        END""",
+    "job_card_claim_insert": f"""
+        AFTER INSERT ON Contractor_Claim_Request BEGIN
+            {_PENDING_CLAIMS.format(job="NEW")}
+        END""",
+    "job_card_claim_update": f"""
+        AFTER UPDATE OF jobID, status ON Contractor_Claim_Request BEGIN
+            {_PENDING_CLAIMS.format(job="OLD")}
+            {_PENDING_CLAIMS.format(job="NEW")}
+        END""",
+    "job_card_claim_delete": f"""
+        AFTER DELETE ON Contractor_Claim_Request BEGIN
+            {_PENDING_CLAIMS.format(job="OLD")}
+        END""",
+}
+
+JOB_CARD_TRIGGERS = _job_card_triggers(JOB_CARD_SELECT)
+
+
+def create_job_cards(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Job_Card (
+        jobID INTEGER PRIMARY KEY,
+        clientID INTEGER NOT NULL,
+        contractorID INTEGER,
+        companyID INTEGER,
+        service TEXT,
+        status TEXT,
+        client_approval TEXT,
+        date_posted DATE NOT NULL,
+        date_fulfilled DATE,
+        companyName TEXT,
+        clientName TEXT,
+        contractorName TEXT,
+        pendingClaims INTEGER NOT NULL DEFAULT 0
+    );""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_card_client ON Job_Card(clientID, date_posted DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_card_contractor ON Job_Card(contractorID, date_posted DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_card_company ON Job_Card(companyID)")
+    # Claim counts are looked up per job by the triggers
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_claim_job ON Contractor_Claim_Request(jobID, status)")
+    for name, body in _job_card_triggers(_FIRST_JOB_CARD_SELECT).items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.execute("DELETE FROM Job_Card")
+    conn.execute(f"INSERT INTO Job_Card {_FIRST_JOB_CARD_SELECT}")
+
+
+# Per-user dashboard counters. Each write that changes a job, claim,
+# transaction or review adjusts the affected rows by +/-1 (or the amount) in
+# the same statement, so a dashboard is one primary-key read.
+JOB_STATUS_COLUMNS = {
+    "Pending": "pendingJobs",
+    "In Progress": "inProgressJobs",
+    "Completed": "completedJobs",
+    "Cancelled": "cancelledJobs",
+}
+
+SUMMARY_KEYS = {"Client_Summary": "clientID", "Contractor_Summary": "contractorID"}
+
+_UNPAID = """({job}.client_approval = 'Approved'
+    AND NOT EXISTS (SELECT 1 FROM Transactions WHERE jobID = {job}.jobID))"""
+
+
+def _bump(table, key, changes):
+    """Upsert adding each {column: expression} in changes to table's row for key."""
+    key_column = SUMMARY_KEYS[table]
+    columns = ", ".join(changes)
+    values = ", ".join(changes.values())
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in changes)
+    return f"""
+            INSERT INTO {table} ({key_column}, {columns}) SELECT {key}, {values} WHERE {key} IS NOT NULL
+            ON CONFLICT({key_column}) DO UPDATE SET {updates};"""
+
+
+def _job_counts(job, sign, statuses=JOB_STATUS_COLUMNS):
+    changes = {column: f"{sign}({job}.status = '{status}')" for status, column in statuses.items()}
+    changes["unpaidApprovedJobs"] = f"{sign}{_UNPAID.format(job=job)}"
+    return changes
+
+
+def _job_parties(job, sign, statuses=JOB_STATUS_COLUMNS):
+    changes = _job_counts(job, sign, statuses)
+    return (_bump("Client_Summary", f"{job}.clientID", changes)
+            + _bump("Contractor_Summary", f"{job}.contractorID", changes))
+
+
+def _claim_parties(claim, sign):
+    changes = {"pendingClaims": f"{sign}({claim}.status = 'Pending')"}
+    client = f"(SELECT clientID FROM Job_Request WHERE jobID = {claim}.jobID)"
+    return (_bump("Client_Summary", client, changes)
+            + _bump("Contractor_Summary", f"{claim}.contractorID", changes))
+
+
+def _payment(txn, sign):
+    # The first payment on an approved job takes it off the unpaid count,
+    # removing the last one puts it back
+    remaining, unpaid_sign = (1, "-") if sign == "+" else (0, "+")
+    unpaid = f"""{unpaid_sign}(
+        (SELECT COUNT(*) FROM Transactions WHERE jobID = {txn}.jobID) = {remaining}
+        AND EXISTS (SELECT 1 FROM Job_Request WHERE jobID = {txn}.jobID AND client_approval = 'Approved'))"""
+    return (_bump("Client_Summary", f"{txn}.clientID",
+                  {"lifetimeSpend": f"{sign}{txn}.amount", "unpaidApprovedJobs": unpaid})
+            + _bump("Contractor_Summary", f"{txn}.contractorID", {"unpaidApprovedJobs": unpaid}))
+
+
+# Archiving a finished job deletes it from Job_Request; only the open
+# statuses are taken back then so completed/cancelled stay lifetime totals.
+_OPEN_STATUSES = {status: JOB_STATUS_COLUMNS[status] for status in ("Pending", "In Progress")}
+
+SUMMARY_TRIGGERS = {
+    "summary_client_insert": """
+        AFTER INSERT ON Client BEGIN
+            INSERT OR IGNORE INTO Client_Summary (clientID) VALUES (NEW.clientID);
+        END""",
+    "summary_contractor_insert": """
+        AFTER INSERT ON Contractor BEGIN
+            INSERT OR IGNORE INTO Contractor_Summary (contractorID) VALUES (NEW.contractorID);
+        END""",
+    "summary_job_insert": f"""
+        AFTER INSERT ON Job_Request BEGIN{_job_parties("NEW", "+")}
+        END""",
+    "summary_job_update": f"""
+        AFTER UPDATE OF clientID, contractorID, status, client_approval ON Job_Request BEGIN{_job_parties("OLD", "-")}{_job_parties("NEW", "+")}
+        END""",
+    "summary_job_delete": f"""
+        AFTER DELETE ON Job_Request BEGIN{_job_parties("OLD", "-", _OPEN_STATUSES)}
+        END""",
+    "summary_claim_insert": f"""
+        AFTER INSERT ON Contractor_Claim_Request BEGIN{_claim_parties("NEW", "+")}
+        END""",
+    "summary_claim_update": f"""
+        AFTER UPDATE OF jobID, contractorID, status ON Contractor_Claim_Request BEGIN{_claim_parties("OLD", "-")}{_claim_parties("NEW", "+")}
+        END""",
+    "summary_claim_delete": f"""
+        AFTER DELETE ON Contractor_Claim_Request BEGIN{_claim_parties("OLD", "-")}
+        END""",
+    "summary_transaction_insert": f"""
+        AFTER INSERT ON Transactions BEGIN{_payment("NEW", "+")}
+        END""",
+    "summary_transaction_delete": f"""
+        AFTER DELETE ON Transactions BEGIN{_payment("OLD", "-")}
+        END""",
+    "summary_review_insert": f"""
+        AFTER INSERT ON Review BEGIN{_bump("Contractor_Summary", "NEW.contractorID", {"reviewCount": "1"})}
+        END""",
+    "summary_review_delete": f"""
+        AFTER DELETE ON Review BEGIN{_bump("Contractor_Summary", "OLD.contractorID", {"reviewCount": "-1"})}
+        END""",
+}
+
+_COUNTERS = """
+           (SELECT COUNT(*) FROM Job_Request WHERE {key} = s.{key} AND status = 'Pending'),
+           (SELECT COUNT(*) FROM Job_Request WHERE {key} = s.{key} AND status = 'In Progress'),
+           (SELECT COUNT(*) FROM Job_Request WHERE {key} = s.{key} AND status = 'Completed'),
+           (SELECT COUNT(*) FROM Job_Request WHERE {key} = s.{key} AND status = 'Cancelled'),
+           {claims},
+           (SELECT COUNT(*) FROM Job_Request jr WHERE jr.{key} = s.{key} AND """ + _UNPAID.format(job="jr") + ")"
+
+_CLIENT_CLAIMS = """(SELECT COUNT(*) FROM Contractor_Claim_Request cr JOIN Job_Request jr ON jr.jobID = cr.jobID
+            WHERE jr.clientID = s.clientID AND cr.status = 'Pending')"""
+
+_CONTRACTOR_CLAIMS = """(SELECT COUNT(*) FROM Contractor_Claim_Request
+            WHERE contractorID = s.contractorID AND status = 'Pending')"""
+
+# Recomputes the counters from the source tables, for the backfill and for
+# checking the triggers against
+CLIENT_SUMMARY_SELECT = f"""
+    SELECT s.clientID,{_COUNTERS.format(key="clientID", claims=_CLIENT_CLAIMS)},
+           (SELECT IFNULL(SUM(amount), 0) FROM Transactions WHERE clientID = s.clientID)
+    FROM Client s
+"""
+
+CONTRACTOR_SUMMARY_SELECT = f"""
+    SELECT s.contractorID,{_COUNTERS.format(key="contractorID", claims=_CONTRACTOR_CLAIMS)},
+           (SELECT COUNT(*) FROM Review WHERE contractorID = s.contractorID)
+    FROM Contractor s
+"""
+
+_COUNTER_COLUMNS = """
+        pendingJobs INTEGER NOT NULL DEFAULT 0,
+        inProgressJobs INTEGER NOT NULL DEFAULT 0,
+        completedJobs INTEGER NOT NULL DEFAULT 0,
+        cancelledJobs INTEGER NOT NULL DEFAULT 0,
+        pendingClaims INTEGER NOT NULL DEFAULT 0,
+        unpaidApprovedJobs INTEGER NOT NULL DEFAULT 0,"""
+
+
+def create_summaries(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS Client_Summary (
+        clientID INTEGER PRIMARY KEY,{_COUNTER_COLUMNS}
+        lifetimeSpend REAL NOT NULL DEFAULT 0
+    );""")
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS Contractor_Summary (
+        contractorID INTEGER PRIMARY KEY,{_COUNTER_COLUMNS}
+        reviewCount INTEGER NOT NULL DEFAULT 0
+    );""")
+    # Looked up per job when a payment arrives or the approval changes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_job ON Transactions(jobID)")
+    for name, body in SUMMARY_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.execute("DELETE FROM Client_Summary")
+    conn.execute(f"INSERT INTO Client_Summary {CLIENT_SUMMARY_SELECT}")
+    conn.execute("DELETE FROM Contractor_Summary")
+    conn.execute(f"INSERT INTO Contractor_Summary {CONTRACTOR_SUMMARY_SELECT}")
+
+
+# One row per event the notification stream (notifications.py) pushes to a
+# user: a new claim on a client's job, a contractor's claim being accepted
+# or declined, and a payment reaching a contractor.
+NOTIFICATION_TRIGGERS = {
+    "notify_claim_insert": """
+        AFTER INSERT ON Contractor_Claim_Request WHEN NEW.status = 'Pending' BEGIN
+            INSERT INTO Notification (userID, kind, jobID, service, contractorID)
+            SELECT c.userID, 'claim', jr.jobID, jr.service, NEW.contractorID
+            FROM Job_Request jr JOIN Client c ON c.clientID = jr.clientID
+            WHERE jr.jobID = NEW.jobID;
+        END""",
+    "notify_claim_decision": """
+        AFTER UPDATE OF status ON Contractor_Claim_Request
+        WHEN NEW.status IN ('Accepted', 'Declined') AND OLD.status IS NOT NEW.status BEGIN
+            INSERT INTO Notification (userID, kind, jobID, service, contractorID)
+            SELECT c.userID, CASE NEW.status WHEN 'Accepted' THEN 'approval' ELSE 'rejection' END,
+                   NEW.jobID, (SELECT service FROM Job_Request WHERE jobID = NEW.jobID), NEW.contractorID
+            FROM Contractor c WHERE c.contractorID = NEW.contractorID;
+        END""",
+    "notify_payment": """
+        AFTER INSERT ON Transactions BEGIN
+            INSERT INTO Notification (userID, kind, jobID, service, contractorID, amount)
+            SELECT c.userID, 'payment', NEW.jobID, (SELECT service FROM Job_Request WHERE jobID = NEW.jobID),
+                   NEW.contractorID, NEW.amount
+            FROM Contractor c WHERE c.contractorID = NEW.contractorID;
+        END""",
+}
+
+
+def create_notifications(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Notification (
+        eventID INTEGER PRIMARY KEY AUTOINCREMENT,
+        userID INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        jobID INTEGER,
+        service TEXT,
+        contractorID INTEGER,
+        amount REAL,
+        created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_user ON Notification(userID, eventID)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_created ON Notification(created)")
+    for name, body in NOTIFICATION_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def add_lookup_indexes(conn):
+    # Per-contractor reviews, newest first; also serves the rating average
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_contractor ON Review(contractorID, date)")
+    # Company pages and the clean-up when a company is deleted
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_company ON Job_Request(companyID)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contractor_company ON Contractor(companyID)")
+
+
+# When each contractor last completed a job, for the recency leaderboard
+# (leaderboards.py); kept on the summary row so archiving does not lose it
+LAST_COMPLETED_TRIGGER = """
+    AFTER UPDATE OF status ON Job_Request
+    WHEN NEW.status = 'Completed' AND OLD.status IS NOT 'Completed' AND NEW.contractorID IS NOT NULL BEGIN
+        UPDATE Contractor_Summary
+        SET lastCompleted = MAX(IFNULL(lastCompleted, ''), IFNULL(NEW.date_fulfilled, DATE('now')))
+        WHERE contractorID = NEW.contractorID;
+    END"""
+
+
+def add_last_completed(conn):
+    if "lastCompleted" not in [row[1] for row in conn.execute("PRAGMA table_info(Contractor_Summary)")]:
+        conn.execute("ALTER TABLE Contractor_Summary ADD COLUMN lastCompleted DATE")
+    conn.execute("DROP TRIGGER IF EXISTS summary_last_completed")
+    conn.execute(f"CREATE TRIGGER summary_last_completed {LAST_COMPLETED_TRIGGER}")
+    conn.execute("""
+        UPDATE Contractor_Summary SET lastCompleted = (
+            SELECT MAX(IFNULL(date_fulfilled, date_posted)) FROM Job_Request
+            WHERE contractorID = Contractor_Summary.contractorID AND status = 'Completed'
+        )
+    """)
+
+
+def create_price_sketches(conn):
+    # Quantile sketches of what each service costs; see pricing.py
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Price_Sketch (
+            service TEXT NOT NULL COLLATE NOCASE,
+            region TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            median REAL,
+            p90 REAL,
+            digest BLOB NOT NULL,
+            PRIMARY KEY (service, region)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_price_sketch_region ON Price_Sketch(region, count)")
+
+
+# Hourly and daily marketplace counters per service for the analytics report
+# (analytics.py). Events are bucketed by when they happen, so the triggers
+# only ever add; archiving or deleting rows leaves history alone.
+ROLLUP_COUNTERS = ("posted", "claimed", "claimHours", "completed", "completeHours",
+                   "payments", "revenue", "reviews", "ratingTotal")
+
+# rollup table -> (bucket column, the bucket of an event happening now)
+ROLLUP_BUCKETS = {
+    "Analytics_Hourly": ("hour", "STRFTIME('%Y-%m-%d %H:00', 'now')"),
+    "Analytics_Daily": ("day", "DATE('now')"),
+}
+
+
+def _rollup(service, changes):
+    """Upserts adding each {column: expression} in changes to the current
+    hour's and day's rows for service."""
+    columns = ", ".join(changes)
+    values = ", ".join(changes.values())
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in changes)
+    return "".join(f"""
+            INSERT INTO {table} ({bucket}, service, {columns}) VALUES ({now}, IFNULL({service}, ''), {values})
+            ON CONFLICT({bucket}, service) DO UPDATE SET {updates};""" for table, (bucket, now) in ROLLUP_BUCKETS.items())
+
+
+def _hours_since_posted(job):
+    return f"(JULIANDAY('now') - JULIANDAY({job}.date_posted)) * 24"
+
+
+_JOB_SERVICE = "(SELECT service FROM Job_Request WHERE jobID = NEW.jobID)"
+
+ROLLUP_TRIGGERS = {
+    "analytics_job_posted": f"""
+        AFTER INSERT ON Job_Request BEGIN{_rollup("NEW.service", {"posted": "1"})}
+        END""",
+    "analytics_job_claimed": f"""
+        AFTER UPDATE OF contractorID ON Job_Request
+        WHEN OLD.contractorID IS NULL AND NEW.contractorID IS NOT NULL BEGIN{_rollup(
+            "NEW.service", {"claimed": "1", "claimHours": _hours_since_posted("NEW")})}
+        END""",
+    "analytics_job_completed": f"""
+        AFTER UPDATE OF status ON Job_Request
+        WHEN NEW.status = 'Completed' AND OLD.status IS NOT 'Completed' BEGIN{_rollup(
+            "NEW.service", {"completed": "1", "completeHours": _hours_since_posted("NEW")})}
+        END""",
+    "analytics_payment": f"""
+        AFTER INSERT ON Transactions BEGIN{_rollup(_JOB_SERVICE, {"payments": "1", "revenue": "NEW.amount"})}
+        END""",
+    "analytics_review": f"""
+        AFTER INSERT ON Review BEGIN{_rollup(_JOB_SERVICE, {"reviews": "1", "ratingTotal": "IFNULL(NEW.rating, 0)"})}
+        END""",
+}
+
+# Daily history from before the triggers existed, as far as the stored dates
+# place it: claims on the first accepted claim's date, completions only
+# where date_fulfilled is known
+_ROLLUP_BACKFILL = """
+    SELECT day, service, SUM(posted), SUM(claimed), SUM(claimHours), SUM(completed), SUM(completeHours),
+           SUM(payments), SUM(revenue), SUM(reviews), SUM(ratingTotal)
+    FROM (
+        SELECT date_posted AS day, IFNULL(service, '') AS service, 1 AS posted, 0 AS claimed, 0 AS claimHours,
+               0 AS completed, 0 AS completeHours, 0 AS payments, 0 AS revenue, 0 AS reviews, 0 AS ratingTotal
+        FROM Job_Request
+        UNION ALL
+        SELECT claimed_on, IFNULL(service, ''), 0, 1, (JULIANDAY(claimed_on) - JULIANDAY(date_posted)) * 24,
+               0, 0, 0, 0, 0, 0
+        FROM (SELECT jr.service, jr.date_posted,
+                     (SELECT MIN(date_requested) FROM Contractor_Claim_Request
+                      WHERE jobID = jr.jobID AND status = 'Accepted') AS claimed_on
+              FROM Job_Request jr WHERE jr.contractorID IS NOT NULL)
+        WHERE claimed_on IS NOT NULL
+        UNION ALL
+        SELECT date_fulfilled, IFNULL(service, ''), 0, 0, 0, 1, (JULIANDAY(date_fulfilled) - JULIANDAY(date_posted)) * 24,
+               0, 0, 0, 0
+        FROM Job_Request WHERE status = 'Completed' AND date_fulfilled IS NOT NULL
+        UNION ALL
+        SELECT t.date, IFNULL(jr.service, ''), 0, 0, 0, 0, 0, 1, t.amount, 0, 0
+        FROM Transactions t LEFT JOIN Job_Request jr ON jr.jobID = t.jobID
+        UNION ALL
+        SELECT r.date, IFNULL(jr.service, ''), 0, 0, 0, 0, 0, 0, 0, 1, IFNULL(r.rating, 0)
+        FROM Review r LEFT JOIN Job_Request jr ON jr.jobID = r.jobID
+    )
+    GROUP BY day, service
+"""
+
+
+_ROLLUP_REAL = {"claimHours", "completeHours", "revenue"}
+
+
+def create_analytics_rollups(conn):
+    counters = "".join(f"""
+        {column} {'REAL' if column in _ROLLUP_REAL else 'INTEGER'} NOT NULL DEFAULT 0,""" for column in ROLLUP_COUNTERS)
+    for table, (bucket, _) in ROLLUP_BUCKETS.items():
+        conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        {bucket} TEXT NOT NULL,
+        service TEXT NOT NULL COLLATE NOCASE,{counters}
+        PRIMARY KEY ({bucket}, service)
+    );""")
+    for name, body in ROLLUP_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.execute("DELETE FROM Analytics_Daily")
+    conn.execute(f"INSERT INTO Analytics_Daily (day, service, {', '.join(ROLLUP_COUNTERS)}) {_ROLLUP_BACKFILL}")
+
+
+# Scheduled windows on jobs and contractors' availability, with R*Tree
+# indexes over (contractor, minute) for conflict checks; see schedule.py.
+# Open jobs are indexed under contractor 0, and only Pending and In Progress
+# jobs are indexed at all, so finished jobs free their window.
+def _minute(value):
+    return f"CAST(STRFTIME('%s', {value}) AS INTEGER) / 60"
+
+
+_INDEX_JOB_WINDOW = f"""
+            INSERT INTO Job_Schedule (jobID, contractorLo, contractorHi, startMinute, endMinute)
+            SELECT NEW.jobID, IFNULL(NEW.contractorID, 0), IFNULL(NEW.contractorID, 0),
+                   {_minute("NEW.scheduled_start")}, {_minute("NEW.scheduled_end")}
+            WHERE NEW.scheduled_start IS NOT NULL AND NEW.scheduled_end IS NOT NULL
+              AND NEW.status IN ('Pending', 'In Progress');"""
+
+_INDEX_AVAILABILITY = f"""
+            INSERT INTO Availability_Index (availabilityID, contractorLo, contractorHi, startMinute, endMinute)
+            VALUES (NEW.availabilityID, NEW.contractorID, NEW.contractorID,
+                    {_minute("NEW.starts")}, {_minute("NEW.ends")});"""
+
+SCHEDULE_TRIGGERS = {
+    "schedule_job_insert": f"""
+        AFTER INSERT ON Job_Request BEGIN{_INDEX_JOB_WINDOW}
+        END""",
+    "schedule_job_update": f"""
+        AFTER UPDATE OF contractorID, status, scheduled_start, scheduled_end ON Job_Request BEGIN
+            DELETE FROM Job_Schedule WHERE jobID = OLD.jobID;{_INDEX_JOB_WINDOW}
+        END""",
+    "schedule_job_delete": """
+        AFTER DELETE ON Job_Request BEGIN
+            DELETE FROM Job_Schedule WHERE jobID = OLD.jobID;
+        END""",
+    "availability_insert": f"""
+        AFTER INSERT ON Contractor_Availability BEGIN{_INDEX_AVAILABILITY}
+        END""",
+    "availability_update": f"""
+        AFTER UPDATE ON Contractor_Availability BEGIN
+            DELETE FROM Availability_Index WHERE availabilityID = OLD.availabilityID;{_INDEX_AVAILABILITY}
+        END""",
+    "availability_delete": """
+        AFTER DELETE ON Contractor_Availability BEGIN
+            DELETE FROM Availability_Index WHERE availabilityID = OLD.availabilityID;
+        END""",
+}
+
+
+def add_job_schedules(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Job_Request)")]
+    for column in ("scheduled_start", "scheduled_end"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE Job_Request ADD COLUMN {column} DATETIME")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Contractor_Availability (
+        availabilityID INTEGER PRIMARY KEY AUTOINCREMENT,
+        contractorID INTEGER NOT NULL,
+        starts DATETIME NOT NULL,
+        ends DATETIME NOT NULL,
+        CHECK (ends > starts),
+        FOREIGN KEY(contractorID) REFERENCES Contractor(contractorID)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_availability_contractor ON Contractor_Availability(contractorID, starts)")
+    # 32-bit integer coordinates: minutes since 1970 fit until the year 6053
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS Job_Schedule
+                    USING rtree_i32(jobID, contractorLo, contractorHi, startMinute, endMinute)""")
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS Availability_Index
+                    USING rtree_i32(availabilityID, contractorLo, contractorHi, startMinute, endMinute)""")
+    for name, body in SCHEDULE_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def create_expiry_log(conn):
+    # What the expiry sweeper (expiry.py) cancelled or declined, and when
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Expiry_Log (
+        expiryID INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL CHECK(kind IN ('job', 'claim')),
+        itemID INTEGER NOT NULL,
+        expired DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expiry_log_expired ON Expiry_Log(expired)")
+    # Only the pending rows are ever swept, so only they are indexed
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_pending_posted ON Job_Request(date_posted) WHERE status = 'Pending'")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_claim_pending_requested
+                    ON Contractor_Claim_Request(date_requested) WHERE status = 'Pending'""")
+
+
+# The change feed (outbox.py): every change the app makes appends an event
+# to Outbox from the same statement, so it commits or rolls back with it
+def _event(topic, row, key, columns):
+    payload = ", ".join(f"'{column}', {row}.{column}" for column in columns)
+    return f"INSERT INTO Outbox (topic, entityID, payload) VALUES ('{topic}', {row}.{key}, json_object({payload}));"
+
+
+def _changed(columns):
+    return " OR ".join(f"NEW.{column} IS NOT OLD.{column}" for column in columns)
+
+
+JOB_EVENT_FIELDS = ("jobID", "clientID", "contractorID", "companyID", "service", "status", "client_approval",
+                    "date_posted", "date_fulfilled", "scheduled_start", "scheduled_end")
+CLAIM_EVENT_FIELDS = ("requestID", "jobID", "contractorID", "status", "date_requested")
+CONTRACTOR_EVENT_FIELDS = ("contractorID", "userID", "companyID", "service", "firstName", "lastName", "city", "state")
+CLIENT_EVENT_FIELDS = ("clientID", "userID", "firstName", "lastName", "city", "state")
+COMPANY_EVENT_FIELDS = ("companyID", "name", "serviceType", "location")
+AVAILABILITY_EVENT_FIELDS = ("availabilityID", "contractorID", "starts", "ends")
+_JOB_EDITS = ("service", "companyID", "scheduled_start", "scheduled_end")
+
+OUTBOX_TRIGGERS = {
+    "outbox_user_registered": f"""
+        AFTER INSERT ON User BEGIN
+            {_event("user.registered", "NEW", "userID", ("userID", "username", "role"))}
+        END""",
+    "outbox_contractor_added": f"""
+        AFTER INSERT ON Contractor BEGIN
+            {_event("contractor.profile", "NEW", "contractorID", CONTRACTOR_EVENT_FIELDS)}
+        END""",
+    "outbox_contractor_edited": f"""
+        AFTER UPDATE OF {', '.join(CONTRACTOR_EVENT_FIELDS[2:])} ON Contractor
+        WHEN {_changed(CONTRACTOR_EVENT_FIELDS[2:])} BEGIN
+            {_event("contractor.profile", "NEW", "contractorID", CONTRACTOR_EVENT_FIELDS)}
+        END""",
+    "outbox_client_added": f"""
+        AFTER INSERT ON Client BEGIN
+            {_event("client.profile", "NEW", "clientID", CLIENT_EVENT_FIELDS)}
+        END""",
+    "outbox_client_edited": f"""
+        AFTER UPDATE OF {', '.join(CLIENT_EVENT_FIELDS[2:])} ON Client
+        WHEN {_changed(CLIENT_EVENT_FIELDS[2:])} BEGIN
+            {_event("client.profile", "NEW", "clientID", CLIENT_EVENT_FIELDS)}
+        END""",
+    "outbox_company_added": f"""
+        AFTER INSERT ON Company BEGIN
+            {_event("company.added", "NEW", "companyID", COMPANY_EVENT_FIELDS)}
+        END""",
+    "outbox_company_deleted": f"""
+        AFTER DELETE ON Company BEGIN
+            {_event("company.deleted", "OLD", "companyID", COMPANY_EVENT_FIELDS)}
+        END""",
+    "outbox_job_posted": f"""
+        AFTER INSERT ON Job_Request BEGIN
+            {_event("job.posted", "NEW", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    "outbox_job_updated": f"""
+        AFTER UPDATE OF {', '.join(_JOB_EDITS)} ON Job_Request WHEN {_changed(_JOB_EDITS)} BEGIN
+            {_event("job.updated", "NEW", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    "outbox_job_assigned": f"""
+        AFTER UPDATE OF contractorID ON Job_Request
+        WHEN NEW.contractorID IS NOT NULL AND NEW.contractorID IS NOT OLD.contractorID BEGIN
+            {_event("job.assigned", "NEW", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    **{f"outbox_job_{status.lower()}": f"""
+        AFTER UPDATE OF status ON Job_Request WHEN NEW.status = '{status}' AND OLD.status IS NOT '{status}' BEGIN
+            {_event(f"job.{status.lower()}", "NEW", "jobID", JOB_EVENT_FIELDS)}
+        END""" for status in ("Completed", "Cancelled")},
+    **{f"outbox_job_{approval.lower()}": f"""
+        AFTER UPDATE OF client_approval ON Job_Request
+        WHEN NEW.client_approval = '{approval}' AND OLD.client_approval IS NOT '{approval}' BEGIN
+            {_event(f"job.{approval.lower()}", "NEW", "jobID", JOB_EVENT_FIELDS)}
+        END""" for approval in ("Approved", "Denied")},
+    # Archiving also deletes jobs, but only finished ones, which stay visible
+    # through the archive; anything else going away was deleted by its client
+    "outbox_job_deleted": f"""
+        AFTER DELETE ON Job_Request WHEN OLD.status NOT IN ('Completed', 'Cancelled') BEGIN
+            {_event("job.deleted", "OLD", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    "outbox_claim_requested": f"""
+        AFTER INSERT ON Contractor_Claim_Request BEGIN
+            {_event("claim.requested", "NEW", "requestID", CLAIM_EVENT_FIELDS)}
+        END""",
+    **{f"outbox_claim_{status.lower()}": f"""
+        AFTER UPDATE OF status ON Contractor_Claim_Request
+        WHEN NEW.status = '{status}' AND OLD.status IS NOT '{status}' BEGIN
+            {_event(f"claim.{status.lower()}", "NEW", "requestID", CLAIM_EVENT_FIELDS)}
+        END""" for status in ("Accepted", "Declined")},
+    "outbox_payment": f"""
+        AFTER INSERT ON Transactions BEGIN
+            {_event("payment.received", "NEW", "transactionID",
+                    ("transactionID", "jobID", "clientID", "contractorID", "amount", "method", "date"))}
+        END""",
+    "outbox_review": f"""
+        AFTER INSERT ON Review BEGIN
+            {_event("review.posted", "NEW", "reviewID",
+                    ("reviewID", "jobID", "clientID", "contractorID", "rating", "comment", "date"))}
+        END""",
+    "outbox_availability_added": f"""
+        AFTER INSERT ON Contractor_Availability BEGIN
+            {_event("availability.added", "NEW", "availabilityID", AVAILABILITY_EVENT_FIELDS)}
+        END""",
+    "outbox_availability_removed": f"""
+        AFTER DELETE ON Contractor_Availability BEGIN
+            {_event("availability.removed", "OLD", "availabilityID", AVAILABILITY_EVENT_FIELDS)}
+        END""",
+}
+
+
+def create_outbox(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Outbox (
+        eventID INTEGER PRIMARY KEY AUTOINCREMENT,
+        topic TEXT NOT NULL,
+        entityID INTEGER,
+        payload TEXT NOT NULL,
+        created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_created ON Outbox(created)")
+    # How far each named consumer has got; the outbox is only pruned behind all of them
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Outbox_Consumer (
+        name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        updated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""")
+    for name, body in OUTBOX_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def create_idempotency_keys(conn):
+    # Keys of POSTs already applied and where each sent the user (idempotency.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS Idempotency_Key (
+        userID INTEGER NOT NULL,
+        endpoint TEXT NOT NULL,
+        idempotencyKey TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (userID, endpoint, idempotencyKey)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_key_created ON Idempotency_Key(created)")
+
+
+# Archiving (archive.py) deletes finished jobs and their claims from the hot
+# database. It holds a row in Archive_Run for the length of each batch's
+# transaction, which no other connection can see, so deletes made inside it
+# are reported as archived and every other delete as deleted.
+_ARCHIVING = "EXISTS (SELECT 1 FROM Archive_Run)"
+ARCHIVE_OUTBOX_TRIGGERS = {
+    "outbox_job_deleted": f"""
+        AFTER DELETE ON Job_Request WHEN NOT {_ARCHIVING} BEGIN
+            {_event("job.deleted", "OLD", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    "outbox_job_archived": f"""
+        AFTER DELETE ON Job_Request WHEN {_ARCHIVING} BEGIN
+            {_event("job.archived", "OLD", "jobID", JOB_EVENT_FIELDS)}
+        END""",
+    "outbox_claim_deleted": f"""
+        AFTER DELETE ON Contractor_Claim_Request WHEN NOT {_ARCHIVING} BEGIN
+            {_event("claim.deleted", "OLD", "requestID", CLAIM_EVENT_FIELDS)}
+        END""",
+    "outbox_claim_archived": f"""
+        AFTER DELETE ON Contractor_Claim_Request WHEN {_ARCHIVING} BEGIN
+            {_event("claim.archived", "OLD", "requestID", CLAIM_EVENT_FIELDS)}
+        END""",
+}
+
+
+def add_archive_events(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS Archive_Run (started DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+    for name, body in ARCHIVE_OUTBOX_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+
+# Derived tables that only app code can fill (price sketches are TDigests built
+# in pricing.py) are queued here; migrate() reports them and init_db() rebuilds
+# them once the migrations are committed.
+def queue_price_sketch_rebuild(conn):
+    # create_price_sketches leaves the table empty on a database that
+    # already has payments
+    conn.execute("CREATE TABLE IF NOT EXISTS Pending_Rebuild (name TEXT PRIMARY KEY)")
+    conn.execute("INSERT OR IGNORE INTO Pending_Rebuild (name) VALUES ('price_sketches')")
+
+
+def add_job_card_schedules(conn):
+    # The contractor listings read the job's window from the card alone
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Job_Card)")]
+    for column in ("scheduled_start", "scheduled_end"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE Job_Card ADD COLUMN {column} DATETIME")
+    for name, body in JOB_CARD_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.execute("""
+        UPDATE Job_Card SET (scheduled_start, scheduled_end) = (
+            SELECT scheduled_start, scheduled_end FROM Job_Request WHERE jobID = Job_Card.jobID
+        )
+    """)
+
+
+MIGRATIONS = [
+    drop_legacy_tables,
+    reserve_incremental_vacuum,  # 2: reserved, was a VACUUM; see its docstring
+    create_job_cards,
+    create_summaries,
+    create_notifications,
+    add_lookup_indexes,
+    add_last_completed,
+    create_price_sketches,
+    create_analytics_rollups,
+    add_job_schedules,
+    create_expiry_log,
+    create_outbox,
+    create_idempotency_keys,
+    add_archive_events,
+    queue_price_sketch_rebuild,
+    add_job_card_schedules,
+]
+
+
+def migrate(conn):
+    """Apply any migrations newer than the database's user_version.
+
+    Each migration runs in its own write transaction and the version is
+    re-read once the lock is held, so several processes starting at once
+    apply every migration exactly once. Returns the names of the derived
+    tables waiting in Pending_Rebuild.
+    """
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+            conn.commit()
+            continue
+        migration(conn)
+        conn.execute(f"PRAGMA user_version={number}")
+        conn.commit()
+    return [name for (name,) in conn.execute("SELECT name FROM Pending_Rebuild")]
@@ -0,0 +1,205 @@
+"""Server-sent events for claim, approval, rejection and payment notices.
+
+Triggers (migrations.create_notifications) write a Notification row for the
+user each event concerns. Every worker runs one watcher thread that polls
+PRAGMA data_version on its own connection; the value changes whenever any
+other connection, in this process or another worker, commits. Only then are
+the new rows read and handed to that worker's subscribers, so open streams
+cost nothing while nothing happens.
+
+GET /events streams the logged-in user's events as
+    id: <eventID>
+    event: claim | approval | rejection | payment
+    data: {"jobID": ..., "service": ..., "contractorID": ..., "contractorName": ..., "amount": ...}
+Streams close after STREAM_TIMEOUT; the browser reconnects by itself and the
+Last-Event-ID it sends replays anything missed in between.
+
+An open stream holds one of the worker's request threads, so each worker
+keeps at most MAX_STREAMS open. Past that /events falls back to polling: it
+replays what was missed, tells the browser to come back in POLL_RETRY_MS
+and closes at once, leaving the threads free for ordinary pages. /events is
+also rate limited (ratelimit.LIMITED_GETS) so reconnect loops are bounded.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from flask import Response, request, session
+
+import metrics
+import queries
+
+POLL_INTERVAL = float(os.environ.get("NOTIFY_POLL_INTERVAL", 0.5))
+HEARTBEAT_INTERVAL = 15
+STREAM_TIMEOUT = 300
+QUEUE_SIZE = 100
+RETRY_MS = 3000
+# Streams open at once per worker; keep well below gunicorn's threads
+MAX_STREAMS = int(os.environ.get("NOTIFY_MAX_STREAMS", 2))
+POLL_RETRY_MS = 30000
+
+
+class Broker:
+    """In-process pub/sub: user id -> queues of the streams open for that user."""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+        self._streams = 0
+
+    def open_stream(self):
+        """Reserve one of the MAX_STREAMS stream slots; False if none is free."""
+        with self._lock:
+            if self._streams >= MAX_STREAMS:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock:
+            self._streams -= 1
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=QUEUE_SIZE)
+        subscriber.dropped = False
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="notifications", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.userID, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stream this far behind is closed; it catches up from the
+                # table when the browser reconnects
+                subscriber.dropped = True
+                self.unsubscribe(event.userID, subscriber)
+
+    def _watch(self):
+        conn = self._connect()
+        try:
+            last_id = queries.LATEST_NOTIFICATION.one(conn).eventID
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                time.sleep(POLL_INTERVAL)
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current == version:
+                    continue
+                version = current
+                for event in queries.NOTIFICATIONS_SINCE.all(conn, (last_id,)):
+                    self.publish(event)
+                    last_id = event.eventID
+        except Exception:
+            with self._lock:
+                self._thread = None
+            raise
+        finally:
+            conn.close()
+
+
+def format_event(event):
+    data = {
+        "jobID": event.jobID,
+        "service": event.service,
+        "contractorID": event.contractorID,
+        "contractorName": event.contractorName,
+        "amount": event.amount,
+    }
+    return f"id: {event.eventID}\nevent: {event.kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _missed(get_db, user_id, last_event_id):
+    """Events since last_event_id, or just the latest id when there is none."""
+    conn = get_db()
+    try:
+        if last_event_id is None:
+            # An id with no data sets the browser's Last-Event-ID without
+            # showing anything, so its next request picks up from here
+            return f"id: {queries.LATEST_NOTIFICATION.one(conn).eventID}\n\n", None
+        missed = queries.USER_NOTIFICATIONS_SINCE.all(conn, (user_id, last_event_id))
+    finally:
+        conn.close()
+    return "".join(map(format_event, missed)), missed[-1].eventID if missed else last_event_id
+
+
+def _poll(get_db, user_id, last_event_id):
+    body, _ = _missed(get_db, user_id, last_event_id)
+    yield f"retry: {POLL_RETRY_MS}\n\n" + body
+
+
+def _stream(broker, get_db, user_id, last_event_id):
+    # The slot is taken here rather than in the view so that it is only held
+    # once the body runs, and the finally below is sure to give it back
+    if not broker.open_stream():
+        metrics.inc("event_streams_refused_total")
+        yield from _poll(get_db, user_id, last_event_id)
+        return
+    subscriber = broker.subscribe(user_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        last = last_event_id
+        if last is not None:
+            body, last = _missed(get_db, user_id, last)
+            if body:
+                yield body
+
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        while time.monotonic() < deadline and not subscriber.dropped:
+            try:
+                event = subscriber.get(timeout=min(HEARTBEAT_INTERVAL, max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                # Comment line: keeps proxies from timing the stream out and
+                # lets the server notice a closed connection
+                yield ": keepalive\n\n"
+                continue
+            if last is not None and event.eventID <= last:
+                continue
+            yield format_event(event)
+            last = event.eventID
+    finally:
+        broker.unsubscribe(user_id, subscriber)
+        broker.close_stream()
+
+
+def init_app(app, get_db):
+    """Add the /events stream to `app`, reading notifications through get_db."""
+    broker = Broker(get_db)
+    app.extensions["notifications"] = broker
+
+    def events():
+        if "user_id" not in session:
+            return Response("Login required", status=401)
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID", ""))
+        except ValueError:
+            last_event_id = None
+        return Response(
+            _stream(broker, get_db, session["user_id"], last_event_id),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    app.add_url_rule("/events", "events", events)
+    return broker
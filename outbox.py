@@ -0,0 +1,162 @@
+"""Change feed for downstream stores (search index, caches, analytics).
+
+Triggers (migrations.create_outbox) append an event to Outbox for every
+change the app makes: users registering, profiles and companies, jobs being
+posted, edited, assigned, completed, approved, cancelled, deleted or
+archived, claims being requested, accepted, declined, deleted or archived,
+payments, reviews and availability.
+The event is written by the same statement as the change, so it commits or
+rolls back with it, and since SQLite has one writer at a time eventIDs are
+handed out in commit order: a consumer that remembers the last eventID it
+has seen can never skip one.
+
+The outbox starts empty when it is created, so a new consumer loads what
+already exists from the API and then reads the feed from the start; events
+are snapshots of the row, so applying one twice does no harm.
+
+With OUTBOX_TOKEN set, consumers send it as "Authorization: Bearer <token>":
+    GET  /outbox/events?after=<eventID>&limit=&topics=job,payment.received
+         {"events": [...], "next": <eventID to pass as after next time>}
+    GET  /outbox/events.ndjson?after=&topics=&follow=1
+         one event per line; with follow=1 the stream stays open and sends
+         new events as they commit, with a blank line as a keepalive
+    GET  /outbox/consumers/<name>            {"name": ..., "position": ...}
+    POST /outbox/consumers/<name>            {"position": <eventID>}
+Named consumers record their position so maintenance only prunes events
+every one of them has passed (maintenance.prune_outbox).
+"""
+import hmac
+import json
+import os
+import time
+
+from flask import Response, abort, jsonify, request
+
+import queries
+
+OUTBOX_TOKEN = os.environ.get("OUTBOX_TOKEN", "")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 0.5))
+HEARTBEAT_INTERVAL = 15
+STREAM_TIMEOUT = 300
+
+
+def read(conn, after=0, limit=DEFAULT_LIMIT, topics=None):
+    """Up to `limit` events after eventID `after`, oldest first, optionally
+    only those whose topic, or topic family ("job"), is in `topics`."""
+    if topics:
+        topics = json.dumps(list(topics))
+        return queries.OUTBOX_TOPICS_SINCE.all(conn, (after, topics, topics, limit))
+    return queries.OUTBOX_SINCE.all(conn, (after, limit))
+
+
+def encode(event):
+    """An event as one line of JSON. The payload is already JSON and is
+    spliced in as it is rather than decoded and encoded again."""
+    return (f'{{"id":{event.eventID},"topic":{json.dumps(event.topic)},'
+            f'"entityID":{json.dumps(event.entityID)},"created":{json.dumps(event.created)},'
+            f'"data":{event.payload}}}')
+
+
+def position(conn, consumer):
+    """The last eventID `consumer` has acknowledged, 0 if it never has."""
+    row = queries.OUTBOX_CONSUMER.one(conn, (consumer,))
+    return row.position if row else 0
+
+
+def ack(conn, consumer, event_id):
+    """Record that `consumer` has handled everything up to event_id."""
+    queries.ACK_OUTBOX(conn, (consumer, event_id))
+    conn.commit()
+
+
+def _follow(connect, after, topics, follow):
+    conn = connect()
+    try:
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        # PRAGMA data_version changes whenever another connection commits;
+        # read before draining so a commit landing mid-drain is not missed
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        while True:
+            # Drain everything committed so far, a page at a time
+            while True:
+                events = read(conn, after, MAX_LIMIT, topics)
+                if events:
+                    yield "".join(encode(event) + "\n" for event in events)
+                    after = events[-1].eventID
+                    heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+                if len(events) < MAX_LIMIT:
+                    break
+            if not follow or time.monotonic() >= deadline:
+                return
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != version:
+                    version = current
+                    break
+                if time.monotonic() >= heartbeat:
+                    yield "\n"
+                    heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+    finally:
+        conn.close()
+
+
+def _arguments():
+    try:
+        after = int(request.args.get("after", 0))
+        limit = min(max(int(request.args.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        abort(400)
+    topics = [topic.strip() for topic in request.args.get("topics", "").split(",") if topic.strip()]
+    return after, limit, topics
+
+
+def init_app(app, get_db):
+    """Add the /outbox feed to `app`. It is off unless OUTBOX_TOKEN is set."""
+
+    @app.before_request
+    def require_token():
+        if not (request.endpoint or "").startswith("outbox_"):
+            return None
+        if not OUTBOX_TOKEN:
+            abort(404)
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied, OUTBOX_TOKEN):
+            return Response("Invalid outbox token", status=401)
+        return None
+
+    def outbox_events():
+        after, limit, topics = _arguments()
+        conn = get_db()
+        try:
+            events = read(conn, after, limit, topics)
+        finally:
+            conn.close()
+        body = '{"events":[' + ",".join(map(encode, events)) + f'],"next":{events[-1].eventID if events else after}}}'
+        return Response(body, mimetype="application/json")
+
+    def outbox_stream():
+        after, _, topics = _arguments()
+        follow = request.args.get("follow") == "1"
+        return Response(_follow(get_db, after, topics, follow), mimetype="application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    def outbox_consumer(name):
+        conn = get_db()
+        try:
+            if request.method == "POST":
+                try:
+                    event_id = int((request.get_json(silent=True) or {}).get("position"))
+                except (TypeError, ValueError):
+                    return jsonify(error="position must be an eventID"), 400
+                ack(conn, name, event_id)
+            return jsonify(name=name, position=position(conn, name))
+        finally:
+            conn.close()
+
+    app.add_url_rule("/outbox/events", "outbox_events", outbox_events)
+    app.add_url_rule("/outbox/events.ndjson", "outbox_stream", outbox_stream)
+    app.add_url_rule("/outbox/consumers/<name>", "outbox_consumer", outbox_consumer, methods=["GET", "POST"])
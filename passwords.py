@@ -0,0 +1,141 @@
+"""Password hashing with scrypt, run on a small process pool.
+
+Passwords are stored as "scrypt$<n>$<r>$<p>$<salt>$<hash>" (base64 salt and
+hash). Rows from before hashing still hold the plain password: login accepts
+them, compared in constant time, and replaces them with a hash, as it does
+for hashes made with older cost parameters (needs_rehash).
+
+At the default cost a hash takes tens of milliseconds of CPU and 16 MiB of
+memory. Each web worker process hands them to a pool of HASH_WORKERS
+processes, so however many logins arrive at once only that many hashes run
+and the worker's threads stay free for other routes. At most HASH_QUEUE more
+may wait for the pool; beyond that hash_password() and verify_password()
+raise Busy at once, and the routes answer 503 with Retry-After instead of
+letting logins pile up. A hash that is not back within HASH_TIMEOUT raises
+Busy too, but keeps its place in the count until it actually finishes.
+HASH_WORKERS=0 hashes on the calling thread instead.
+
+The pool is started on first use, so a gunicorn master that imports the app
+before forking (preload_app) does not share one pool between its workers,
+and its processes come from a forkserver rather than being forked from a
+worker that is running request threads.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 16))
+# Longest a request waits for its hash, queueing included
+HASH_TIMEOUT = 10
+PREFIX = "scrypt"
+
+
+class Busy(Exception):
+    """Too many hashes are running or waiting; try again shortly."""
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n + 2 ** 20, dklen=32)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _hash(password, n, r, p):
+    salt = secrets.token_bytes(16)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def _verify(password, stored):
+    _, n, r, p, salt, expected = stored.split("$")
+    actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(actual, base64.b64decode(expected))
+
+
+class HashPool:
+    """A process pool that refuses work once `workers + queue` calls are in flight."""
+
+    def __init__(self, workers=HASH_WORKERS, queue=HASH_QUEUE):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("forkserver"))
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise Busy()
+        if not self.workers:
+            try:
+                return function(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash is done, not until we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            raise Busy() from None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+
+pool = HashPool()
+
+
+@functools.cache
+def _dummy():
+    # Checked against when the username does not exist, so unknown and known
+    # usernames take equally long to refuse
+    return _hash("", SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def is_hashed(stored):
+    return stored.startswith(PREFIX + "$")
+
+
+def hash_password(password):
+    """A new salted hash of `password` to store. May raise Busy."""
+    return pool.run(_hash, password, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def verify_password(password, stored):
+    """Whether `password` matches `stored` (a hash, a legacy plain password,
+    or None for an unknown user). May raise Busy."""
+    if stored is not None and not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    return pool.run(_verify, password, stored or _dummy()) and stored is not None
+
+
+def needs_rehash(stored):
+    """Whether `stored` should be replaced with a hash at today's cost."""
+    return not is_hashed(stored) or stored.split("$")[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
@@ -0,0 +1,172 @@
+"""Price guidance: what each service has cost, per region, from t-digests.
+
+Every payment is added to two quantile sketches in Price_Sketch: one for the
+job's service in the client's state and one for the service everywhere
+(region ''). A sketch is a merging t-digest: at most a few hundred
+(mean, weight) centroids however many payments it has seen, accurate at the
+tails, and two of them merge by merging their centroids. It is stored as
+packed doubles next to its median and 90th percentile, so the job request
+form reads guidance with one indexed lookup and never looks at Transactions.
+
+Sketches only grow: archiving or deleting transactions does not take
+payments back out. rebuild_sketches() recomputes them all from Transactions.
+"""
+import math
+import struct
+
+import queries
+
+COMPRESSION = 100
+# Guidance from fewer payments than this would give individual prices away
+MIN_SAMPLES = 3
+GUIDANCE_LIMIT = 20
+
+_HEADER = struct.Struct("<dd")
+
+
+class TDigest:
+    """A merging t-digest (Dunning & Ertl) with the k1 scale function."""
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.centroids = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self._buffer.extend(other.centroids)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        merged = []
+        mean, weight = points[0]
+        done = 0
+        k_start = self._k(0)
+        for point_mean, point_weight in points[1:]:
+            if self._k(min((done + weight + point_weight) / self.count, 1)) - k_start <= 1:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append((mean, weight))
+                done += weight
+                k_start = self._k(done / self.count)
+                mean, weight = point_mean, point_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None if nothing was added."""
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * self.count
+        # Each centroid's mean sits at the middle of its weight; interpolate
+        # between neighbouring middles, and towards min/max at the ends
+        previous_mean, previous_center = self.min, 0
+        done = 0
+        for mean, weight in self.centroids:
+            center = done + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_mean, previous_center = mean, center
+            done += weight
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span else 1
+        return previous_mean + (self.max - previous_mean) * fraction
+
+    def to_bytes(self):
+        self._compress()
+        flat = [value for centroid in self.centroids for value in centroid]
+        return _HEADER.pack(self.min, self.max) + struct.pack(f"<{len(flat)}d", *flat)
+
+    @classmethod
+    def from_bytes(cls, data, compression=COMPRESSION):
+        digest = cls(compression)
+        digest.min, digest.max = _HEADER.unpack_from(data)
+        flat = struct.unpack_from(f"<{(len(data) - _HEADER.size) // 8}d", data, _HEADER.size)
+        digest.centroids = list(zip(flat[::2], flat[1::2]))
+        digest.count = sum(flat[1::2])
+        return digest
+
+
+def _regions(state):
+    state = (state or "").strip().upper()
+    return (state, "") if state else ("",)
+
+
+def _save(conn, service, region, digest):
+    queries.UPSERT_PRICE_SKETCH(conn, (service, region, round(digest.count), digest.quantile(0.5),
+                                       digest.quantile(0.9), digest.to_bytes()))
+
+
+def record_payment(conn, job_id, amount):
+    """Add a payment for job_id to its sketches, in the caller's transaction.
+
+    Call it after the payment is inserted: the write lock is then already
+    held, so no other worker can change the sketch between read and write.
+    """
+    job = queries.PAYMENT_CONTEXT.one(conn, (job_id,))
+    if job is None or not job.service:
+        return
+    service = job.service.strip()
+    for region in _regions(job.state):
+        row = queries.PRICE_SKETCH.one(conn, (service, region))
+        digest = TDigest.from_bytes(row.digest) if row else TDigest()
+        digest.add(amount)
+        _save(conn, service, region, digest)
+
+
+def rebuild_sketches(conn):
+    """Recompute every sketch from the payments in Transactions."""
+    digests = {}
+    for payment in queries.ALL_PAYMENTS(conn):
+        if not payment.service:
+            continue
+        service = payment.service.strip()
+        for region in _regions(payment.state):
+            # Services differ only in case share a sketch, as they do in the table
+            key = (service.lower(), region)
+            if key not in digests:
+                digests[key] = (service, TDigest())
+            digests[key][1].add(payment.amount)
+    conn.execute("DELETE FROM Price_Sketch")
+    for (_, region), (service, digest) in digests.items():
+        _save(conn, service, region, digest)
+
+
+def guidance(conn, state):
+    """Median and 90th percentile price per service, from the client's state
+    where it has enough payments and from everywhere otherwise."""
+    rows = {}
+    for row in queries.PRICE_GUIDANCE.all(conn, ("", MIN_SAMPLES, GUIDANCE_LIMIT)):
+        rows[row.service.lower()] = row
+    state = (state or "").strip().upper()
+    if state:
+        for row in queries.PRICE_GUIDANCE.all(conn, (state, MIN_SAMPLES, GUIDANCE_LIMIT)):
+            rows[row.service.lower()] = row
+    return sorted(rows.values(), key=lambda row: row.service.lower())
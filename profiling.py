@@ -0,0 +1,157 @@
+"""Opt-in profiling of individual requests.
+
+Disabled unless PROFILING_ENABLED=1 and PROFILE_TOKEN are set. A request
+carrying that token in the X-Profile header or the _profile query parameter
+is run under a sampling profiler and tracemalloc. The samples are written to
+PROFILE_DIR as collapsed stacks (<stem>.folded, ready for flamegraph.pl or
+speedscope) with a summary (<stem>.json) that splits the samples into time
+spent in Python, in SQL and in Jinja rendering, and records peak memory.
+The response carries X-Profile-* headers pointing at the files.
+"""
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED") == "1"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.001))
+
+# Only one request is profiled at a time; tracemalloc is process-wide
+_profile_lock = threading.Lock()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+# The TimedCursor/TimedConnection methods (metrics.py) that wait on SQLite;
+# streamed pages read their rows through __next__
+_SQL_FUNCTIONS = ("execute", "executemany", "fetchone", "fetchall", "__next__")
+
+
+def _category(frames):
+    for frame in frames:
+        filename = frame.f_code.co_filename
+        if filename.endswith("metrics.py") and frame.f_code.co_name in _SQL_FUNCTIONS:
+            return "sql"
+        if f"{os.sep}jinja2{os.sep}" in filename or filename == "<template>" or filename.endswith(".html"):
+            return "jinja"
+    return "python"
+
+
+class Sampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            if not frames:
+                continue
+            self.stacks[";".join(_frame_name(f) for f in reversed(frames))] += 1
+            self.categories[_category(frames)] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _requested():
+    token = request.headers.get("X-Profile") or request.args.get("_profile")
+    return bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _before_request():
+    if not (PROFILING_ENABLED and PROFILE_TOKEN and _requested()):
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+    g._profile_tracing = tracemalloc.is_tracing()
+    if g._profile_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    g._profile_started = time.perf_counter()
+    g._profile_sampler = Sampler(threading.get_ident())
+    g._profile_sampler.start()
+
+
+def _after_request(response):
+    sampler = g.pop("_profile_sampler", None)
+    if sampler is None:
+        return response
+    try:
+        # Make sure lazily rendered bodies are included in the profile
+        response.get_data()
+        elapsed = time.perf_counter() - g._profile_started
+        sampler.stop()
+        _, peak = tracemalloc.get_traced_memory()
+        if not g._profile_tracing:
+            tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}")
+    with open(stem + ".folded", "w") as f:
+        f.write(sampler.collapsed())
+    summary = {
+        "path": request.full_path,
+        "endpoint": request.endpoint,
+        "duration_seconds": elapsed,
+        "samples": dict(sampler.categories),
+        "sample_interval_seconds": sampler.interval,
+        "peak_memory_bytes": peak,
+    }
+    with open(stem + ".json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    response.headers["X-Profile-File"] = stem + ".folded"
+    response.headers["X-Profile-Duration"] = f"{elapsed:.6f}"
+    response.headers["X-Profile-Peak-Memory"] = str(peak)
+    response.headers["X-Profile-Samples"] = ",".join(f"{k}={v}" for k, v in sorted(sampler.categories.items()))
+    return response
+
+
+def _teardown_request(exc):
+    # A request that raised never reaches after_request
+    sampler = g.pop("_profile_sampler", None)
+    if sampler is not None:
+        sampler.stop()
+        if not g._profile_tracing:
+            tracemalloc.stop()
+        _profile_lock.release()
+
+
+def init_app(app):
+    """Install the profiling hooks on `app`."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
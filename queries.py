@@ -0,0 +1,578 @@
+"""Named SQL statements used by the routes in app.py.
+
+Every statement lists the columns it needs instead of SELECT *. Rows come
+back as namedtuple records (attribute access, no per-row dict) whose class is
+built once per query from the first cursor description. All statements are
+plain string constants, so with the connection's statement cache sized to
+STATEMENT_CACHE_SIZE each one is parsed once per connection.
+
+Usage:
+    queries.CLIENT_ID_BY_USER.one(conn, (user_id,))   -> record or None
+    queries.ALL_COMPANIES.all(conn)                    -> list of records
+    queries.OPEN_JOBS(conn)                            -> cursor yielding records
+    queries.INSERT_COMPANY(conn, (name, s, loc))       -> cursor (for lastrowid)
+"""
+from collections import namedtuple
+
+REGISTRY = {}
+
+
+class Query:
+    __slots__ = ("name", "sql", "_factory")
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self._factory = None
+        REGISTRY[name] = self
+
+    def __call__(self, conn, params=()):
+        cur = conn.execute(self.sql, params)
+        if cur.description is not None:
+            if self._factory is None:
+                record = namedtuple(self.name, [column[0] for column in cur.description], rename=True)
+                self._factory = lambda _cursor, row, new=tuple.__new__, cls=record: new(cls, row)
+            cur.row_factory = self._factory
+        return cur
+
+    def one(self, conn, params=()):
+        return self(conn, params).fetchone()
+
+    def all(self, conn, params=()):
+        return self(conn, params).fetchall()
+
+    def __repr__(self):
+        return f"<Query {self.name}>"
+
+
+# -------------------------------
+# Users
+# -------------------------------
+INSERT_USER = Query("insert_user", "INSERT INTO User (username, password, role) VALUES (?, ?, ?)")
+
+USER_BY_USERNAME = Query("user_by_username", "SELECT userID, role, password FROM User WHERE username=?")
+
+USERNAME_BY_ID = Query("username_by_id", "SELECT username FROM User WHERE userID=?")
+
+# Only replaces the password it was read as, so a concurrent change wins
+SET_PASSWORD_HASH = Query("set_password_hash", "UPDATE User SET password=? WHERE userID=? AND password=?")
+
+CLIENT_ID_BY_USER = Query("client_id_by_user", "SELECT clientID FROM Client WHERE userID=?")
+
+CONTRACTOR_ID_BY_USER = Query("contractor_id_by_user", "SELECT contractorID FROM Contractor WHERE userID=?")
+
+INSERT_CLIENT_PROFILE = Query("insert_client_profile", """
+    INSERT INTO Client (userID, firstName, lastName)
+    VALUES (?, ?, ?)
+""")
+
+INSERT_CONTRACTOR_PROFILE = Query("insert_contractor_profile", """
+    INSERT INTO Contractor (userID, firstName, lastName, service)
+    VALUES (?, ?, ?, ?)
+""")
+
+# -------------------------------
+# Profiles
+# -------------------------------
+# The dashboards read the profile and its precomputed summary as one row
+CLIENT_DASHBOARD_PROFILE = Query("client_dashboard_profile", """
+    SELECT c.clientID, c.firstName, c.lastName,
+           IFNULL(s.pendingJobs, 0) AS pendingJobs, IFNULL(s.inProgressJobs, 0) AS inProgressJobs,
+           IFNULL(s.completedJobs, 0) AS completedJobs, IFNULL(s.cancelledJobs, 0) AS cancelledJobs,
+           IFNULL(s.pendingClaims, 0) AS pendingClaims,
+           IFNULL(s.unpaidApprovedJobs, 0) AS unpaidApprovedJobs,
+           IFNULL(s.lifetimeSpend, 0) AS lifetimeSpend
+    FROM Client c LEFT JOIN Client_Summary s ON s.clientID = c.clientID
+    WHERE c.userID=?
+""")
+
+CONTRACTOR_DASHBOARD_PROFILE = Query("contractor_dashboard_profile", """
+    SELECT c.contractorID, c.firstName, c.lastName, c.earnings, c.rating,
+           IFNULL(s.pendingJobs, 0) AS pendingJobs, IFNULL(s.inProgressJobs, 0) AS inProgressJobs,
+           IFNULL(s.completedJobs, 0) AS completedJobs, IFNULL(s.cancelledJobs, 0) AS cancelledJobs,
+           IFNULL(s.pendingClaims, 0) AS pendingClaims,
+           IFNULL(s.unpaidApprovedJobs, 0) AS unpaidApprovedJobs,
+           IFNULL(s.reviewCount, 0) AS reviewCount
+    FROM Contractor c LEFT JOIN Contractor_Summary s ON s.contractorID = c.contractorID
+    WHERE c.userID=?
+""")
+
+CLIENT_PROFILE_FORM = Query("client_profile_form", """
+    SELECT firstName, lastName, address, streetNumber, streetName, aptNumber, city, state, zip
+    FROM Client WHERE userID=?
+""")
+
+CONTRACTOR_PROFILE_FORM = Query("contractor_profile_form", """
+    SELECT firstName, lastName, service, city, state, rating FROM Contractor WHERE userID=?
+""")
+
+UPDATE_CLIENT_PROFILE = Query("update_client_profile", """
+    UPDATE Client SET
+        firstName=?, lastName=?, address=?, streetNumber=?, streetName=?,
+        aptNumber=?, city=?, state=?, zip=?
+    WHERE userID=?
+""")
+
+UPDATE_CONTRACTOR_PROFILE = Query("update_contractor_profile", """
+    UPDATE Contractor SET
+        firstName=?, lastName=?, service=?, city=?, state=?, rating=?
+    WHERE userID=?
+""")
+
+# -------------------------------
+# Companies
+# -------------------------------
+ALL_COMPANIES = Query("all_companies", "SELECT companyID, name, serviceType, location FROM Company")
+
+INSERT_COMPANY = Query("insert_company", """
+    INSERT INTO Company (name, serviceType, location)
+    VALUES (?, ?, ?)
+""")
+
+DELETE_COMPANY = Query("delete_company", "DELETE FROM Company WHERE companyID=?")
+
+CLEAR_JOB_COMPANY = Query("clear_job_company", "UPDATE Job_Request SET companyID=NULL WHERE companyID=?")
+
+CLEAR_CONTRACTOR_COMPANY = Query("clear_contractor_company", "UPDATE Contractor SET companyID=NULL WHERE companyID=?")
+
+JOBS_BY_COMPANY = Query("jobs_by_company", """
+    SELECT jobID, service, status
+    FROM Job_Request
+    WHERE companyID = ?
+""")
+
+# -------------------------------
+# Contractors and reviews
+# -------------------------------
+CONTRACTORS_WITH_RATING = Query("contractors_with_rating", """
+    SELECT ctr.contractorID, ctr.firstName, ctr.lastName, ctr.service, ctr.city, ctr.state,
+           IFNULL(AVG(r.rating), 0) AS avg_rating
+    FROM Contractor ctr
+    LEFT JOIN Review r ON ctr.contractorID = r.contractorID
+    GROUP BY ctr.contractorID
+    ORDER BY ctr.contractorID
+""")
+
+REVIEWS_BY_CONTRACTOR = Query("reviews_by_contractor", """
+    SELECT r.contractorID, r.comment, r.rating, c.firstName || ' ' || c.lastName AS clientName
+    FROM Review r
+    JOIN Client c ON r.clientID = c.clientID
+    ORDER BY r.contractorID
+""")
+
+CONTRACTOR_STANDINGS = Query("contractor_standings", """
+    SELECT ctr.contractorID, ctr.firstName, ctr.lastName, ctr.service, ctr.city, ctr.state, ctr.rating,
+           IFNULL(s.reviewCount, 0) AS reviewCount, IFNULL(s.completedJobs, 0) AS completedJobs,
+           s.lastCompleted
+    FROM Contractor ctr
+    LEFT JOIN Contractor_Summary s ON s.contractorID = ctr.contractorID
+""")
+
+CONTRACTOR_STANDING = Query("contractor_standing", """
+    SELECT ctr.contractorID, ctr.firstName, ctr.lastName, ctr.service, ctr.city, ctr.state, ctr.rating,
+           IFNULL(s.reviewCount, 0) AS reviewCount, IFNULL(s.completedJobs, 0) AS completedJobs,
+           s.lastCompleted
+    FROM Contractor ctr
+    LEFT JOIN Contractor_Summary s ON s.contractorID = ctr.contractorID
+    WHERE ctr.contractorID = ?
+""")
+
+CONTRACTOR_RATINGS_PROFILE = Query("contractor_ratings_profile", """
+    SELECT firstName, lastName, rating, earnings FROM Contractor WHERE contractorID=?
+""")
+
+CONTRACTOR_RATINGS_REVIEWS = Query("contractor_ratings_reviews", """
+    SELECT r.rating, r.comment, c.firstName || ' ' || c.lastName AS clientName
+    FROM Review r JOIN Client c ON r.clientID=c.clientID
+    WHERE contractorID=?
+""")
+
+CONTRACTOR_PUBLIC_PROFILE = Query("contractor_public_profile", """
+    SELECT firstName, lastName, rating
+    FROM Contractor
+    WHERE contractorID=?
+""")
+
+CONTRACTOR_PUBLIC_REVIEWS = Query("contractor_public_reviews", """
+    SELECT r.comment, r.rating, r.date, c.firstName || ' ' || c.lastName AS clientName
+    FROM Review r
+    JOIN Client c ON r.clientID = c.clientID
+    WHERE r.contractorID=?
+    ORDER BY r.date DESC
+""")
+
+INSERT_REVIEW = Query("insert_review", """
+    INSERT INTO Review (jobID, clientID, contractorID, rating, comment, date)
+    VALUES (?, ?, ?, ?, ?, DATE('now'))
+""")
+
+CONTRACTOR_AVG_RATING = Query("contractor_avg_rating", """
+    SELECT AVG(rating) AS avg_rating FROM Review WHERE contractorID=?
+""")
+
+SET_CONTRACTOR_RATING = Query("set_contractor_rating", "UPDATE Contractor SET rating=? WHERE contractorID=?")
+
+ADD_CONTRACTOR_EARNINGS = Query("add_contractor_earnings", """
+    UPDATE Contractor SET earnings = earnings + ? WHERE contractorID=?
+""")
+
+# -------------------------------
+# Analytics
+# -------------------------------
+# Rollups maintained by triggers (migrations.create_analytics_rollups), read by analytics.py
+ANALYTICS_DAILY_SINCE = Query("analytics_daily_since", """
+    SELECT day, service, posted, claimed, claimHours, completed, completeHours,
+           payments, revenue, reviews, ratingTotal
+    FROM Analytics_Daily WHERE day >= ?
+""")
+
+ANALYTICS_HOURLY_SINCE = Query("analytics_hourly_since", """
+    SELECT hour, service, posted, claimed, claimHours, completed, completeHours,
+           payments, revenue, reviews, ratingTotal
+    FROM Analytics_Hourly WHERE hour >= ?
+""")
+
+# -------------------------------
+# Pricing
+# -------------------------------
+# Price guidance sketches (pricing.py)
+CLIENT_STATE = Query("client_state", "SELECT state FROM Client WHERE clientID=?")
+
+PAYMENT_CONTEXT = Query("payment_context", """
+    SELECT j.service, c.state
+    FROM Job_Request j
+    JOIN Client c ON c.clientID = j.clientID
+    WHERE j.jobID = ?
+""")
+
+ALL_PAYMENTS = Query("all_payments", """
+    SELECT t.amount, j.service, c.state
+    FROM Transactions t
+    JOIN Job_Request j ON j.jobID = t.jobID
+    JOIN Client c ON c.clientID = j.clientID
+""")
+
+PRICE_SKETCH = Query("price_sketch", """
+    SELECT digest FROM Price_Sketch WHERE service = ? AND region = ?
+""")
+
+UPSERT_PRICE_SKETCH = Query("upsert_price_sketch", """
+    INSERT INTO Price_Sketch (service, region, count, median, p90, digest)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (service, region) DO UPDATE SET
+        count = excluded.count, median = excluded.median, p90 = excluded.p90, digest = excluded.digest
+""")
+
+PRICE_GUIDANCE = Query("price_guidance", """
+    SELECT service, count, median, p90 FROM Price_Sketch
+    WHERE region = ? AND count >= ?
+    ORDER BY count DESC
+    LIMIT ?
+""")
+
+# -------------------------------
+# Job requests
+# -------------------------------
+JOB_BY_ID = Query("job_by_id", """
+    SELECT jobID, clientID, contractorID, companyID, service, status, client_approval,
+           scheduled_start, scheduled_end
+    FROM Job_Request WHERE jobID=?
+""")
+
+JOB_FOR_CLIENT = Query("job_for_client", """
+    SELECT jobID, clientID, contractorID, companyID, service, status, client_approval
+    FROM Job_Request WHERE jobID=? AND clientID=?
+""")
+
+PENDING_JOB_BY_ID = Query("pending_job_by_id", """
+    SELECT jobID FROM Job_Request WHERE jobID=? AND status='Pending'
+""")
+
+# Listing pages read the trigger-maintained Job_Card table (see migrations.py)
+CLIENT_JOB_REQUESTS = Query("client_job_requests", """
+    SELECT jobID, service, status, date_posted, date_fulfilled, companyName
+    FROM Job_Card
+    WHERE clientID=?
+    ORDER BY date_posted DESC
+""")
+
+CLIENT_JOBS_WITH_CONTRACTOR = Query("client_jobs_with_contractor", """
+    SELECT jobID, service, status, companyName, contractorName
+    FROM Job_Card
+    WHERE clientID=?
+    ORDER BY date_posted DESC
+""")
+
+OPEN_JOBS = Query("open_jobs", """
+    SELECT jobID, service, status, companyName, clientName, scheduled_start, scheduled_end
+    FROM Job_Card
+    WHERE contractorID IS NULL
+    ORDER BY date_posted DESC
+""")
+
+# Open jobs whose window lies inside one of the contractor's availability
+# windows and clashes with none of their jobs; both lookups go through the
+# R*Tree indexes (migrations.add_job_schedules). CROSS JOIN keeps that join
+# order instead of starting from every open job.
+OPEN_JOBS_AVAILABLE = Query("open_jobs_available", """
+    SELECT DISTINCT jc.jobID, jc.service, jc.status, jc.companyName, jc.clientName,
+           jc.scheduled_start, jc.scheduled_end, s.startMinute
+    FROM Availability_Index a
+    CROSS JOIN Job_Schedule s
+      ON s.contractorLo <= 0 AND s.contractorHi >= 0
+     AND s.startMinute >= a.startMinute AND s.endMinute <= a.endMinute
+    CROSS JOIN Job_Card jc ON jc.jobID = s.jobID
+    WHERE a.contractorLo <= ? AND a.contractorHi >= ?
+      AND jc.contractorID IS NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM Job_Schedule b
+          WHERE b.contractorLo <= ? AND b.contractorHi >= ?
+            AND b.startMinute < s.endMinute AND b.endMinute > s.startMinute
+      )
+    ORDER BY s.startMinute
+""")
+
+CONTRACTOR_JOBS = Query("contractor_jobs", """
+    SELECT jobID, service, status, companyName, clientName, scheduled_start, scheduled_end
+    FROM Job_Card
+    WHERE contractorID=?
+    ORDER BY date_posted DESC
+""")
+
+INSERT_JOB_REQUEST = Query("insert_job_request", """
+    INSERT INTO Job_Request (clientID, companyID, service, scheduled_start, scheduled_end, status, date_posted)
+    VALUES (?, ?, ?, ?, ?, 'Pending', DATE('now'))
+""")
+
+UPDATE_JOB_REQUEST = Query("update_job_request", """
+    UPDATE Job_Request SET service=?, companyID=?, scheduled_start=?, scheduled_end=? WHERE jobID=?
+""")
+
+DELETE_JOB_REQUEST = Query("delete_job_request", "DELETE FROM Job_Request WHERE jobID=?")
+
+ASSIGN_CONTRACTOR = Query("assign_contractor", """
+    UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?
+""")
+
+JOB_WINDOW = Query("job_window", """
+    SELECT scheduled_start, scheduled_end,
+           CAST(STRFTIME('%s', scheduled_start) AS INTEGER) / 60 AS startMinute,
+           CAST(STRFTIME('%s', scheduled_end) AS INTEGER) / 60 AS endMinute
+    FROM Job_Request WHERE jobID=?
+""")
+
+SCHEDULE_CONFLICT = Query("schedule_conflict", """
+    SELECT s.jobID, jr.scheduled_start, jr.scheduled_end
+    FROM Job_Schedule s
+    JOIN Job_Request jr ON jr.jobID = s.jobID
+    WHERE s.contractorLo <= ? AND s.contractorHi >= ?
+      AND s.startMinute < ? AND s.endMinute > ? AND s.jobID != ?
+    LIMIT 1
+""")
+
+HAS_AVAILABILITY = Query("has_availability", """
+    SELECT 1 AS found FROM Contractor_Availability WHERE contractorID=? LIMIT 1
+""")
+
+AVAILABILITY_COVERING = Query("availability_covering", """
+    SELECT availabilityID FROM Availability_Index
+    WHERE contractorLo <= ? AND contractorHi >= ?
+      AND startMinute <= ? AND endMinute >= ?
+    LIMIT 1
+""")
+
+CONTRACTOR_AVAILABILITY = Query("contractor_availability", """
+    SELECT availabilityID, starts, ends FROM Contractor_Availability
+    WHERE contractorID=? AND ends > DATETIME('now')
+    ORDER BY starts
+""")
+
+INSERT_AVAILABILITY = Query("insert_availability", """
+    INSERT INTO Contractor_Availability (contractorID, starts, ends) VALUES (?, ?, ?)
+""")
+
+DELETE_AVAILABILITY = Query("delete_availability", """
+    DELETE FROM Contractor_Availability WHERE availabilityID=? AND contractorID=?
+""")
+
+MARK_JOB_COMPLETED = Query("mark_job_completed", """
+    UPDATE Job_Request SET status='Completed', date_fulfilled=DATE('now') WHERE jobID=?
+""")
+
+SET_CLIENT_APPROVAL = Query("set_client_approval", "UPDATE Job_Request SET client_approval=? WHERE jobID=?")
+
+INSERT_TRANSACTION = Query("insert_transaction", """
+    INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date)
+    VALUES (?, ?, ?, ?, ?, DATE('now'))
+""")
+
+CLIENT_JOB_HISTORY = Query("client_job_history", """
+    SELECT jr.jobID, jr.service, jr.status, jr.date_posted, jr.date_fulfilled, c.name AS companyName,
+           ctr.firstName || ' ' || ctr.lastName AS otherName
+    FROM archive.Job_Request jr
+    LEFT JOIN Company c ON jr.companyID = c.companyID
+    LEFT JOIN Contractor ctr ON jr.contractorID = ctr.contractorID
+    WHERE jr.clientID=?
+    ORDER BY jr.date_posted DESC
+""")
+
+CONTRACTOR_JOB_HISTORY = Query("contractor_job_history", """
+    SELECT jr.jobID, jr.service, jr.status, jr.date_posted, jr.date_fulfilled, c.name AS companyName,
+           cli.firstName || ' ' || cli.lastName AS otherName
+    FROM archive.Job_Request jr
+    LEFT JOIN Company c ON jr.companyID = c.companyID
+    LEFT JOIN Client cli ON jr.clientID = cli.clientID
+    WHERE jr.contractorID=?
+    ORDER BY jr.date_posted DESC
+""")
+
+# -------------------------------
+# Claim requests
+# -------------------------------
+PENDING_CLAIMS_FOR_CLIENT = Query("pending_claims_for_client", """
+    SELECT jc.requestID, jc.jobID, jc.contractorID, jc.date_requested,
+           c.firstName || ' ' || c.lastName AS contractorName, card.service
+    FROM Job_Card card
+    JOIN Contractor_Claim_Request jc ON jc.jobID = card.jobID
+    JOIN Contractor c ON jc.contractorID = c.contractorID
+    WHERE card.clientID=? AND card.pendingClaims > 0 AND jc.status='Pending'
+    ORDER BY jc.date_requested DESC
+""")
+
+EXISTING_CLAIM = Query("existing_claim", """
+    SELECT requestID FROM Contractor_Claim_Request
+    WHERE jobID=? AND contractorID=?
+""")
+
+INSERT_CLAIM = Query("insert_claim", """
+    INSERT INTO Contractor_Claim_Request (jobID, contractorID, status, date_requested)
+    VALUES (?, ?, 'Pending', DATE('now'))
+""")
+
+ACCEPT_CLAIM = Query("accept_claim", """
+    UPDATE Contractor_Claim_Request
+    SET status='Accepted'
+    WHERE jobID=? AND contractorID=?
+""")
+
+DECLINE_OTHER_CLAIMS = Query("decline_other_claims", """
+    UPDATE Contractor_Claim_Request
+    SET status='Declined'
+    WHERE jobID=? AND contractorID<>?
+""")
+
+DECLINE_CLAIM = Query("decline_claim", """
+    UPDATE Contractor_Claim_Request
+    SET status='Declined'
+    WHERE jobID=? AND contractorID=?
+""")
+
+# Bulk claim decisions and job actions (bulk.py); ids arrive as one JSON
+# array parameter and are expanded with json_each, so each step is a
+# single statement however many items there are
+CLAIMS_FOR_DECISION = Query("claims_for_decision", """
+    SELECT d.value AS requestID, cr.jobID, cr.contractorID, cr.status, jr.clientID,
+           jr.status AS jobStatus, jr.contractorID AS assignedContractor,
+           CAST(STRFTIME('%s', jr.scheduled_start) AS INTEGER) / 60 AS startMinute,
+           CAST(STRFTIME('%s', jr.scheduled_end) AS INTEGER) / 60 AS endMinute
+    FROM json_each(?) d
+    LEFT JOIN Contractor_Claim_Request cr ON cr.requestID = d.value
+    LEFT JOIN Job_Request jr ON jr.jobID = cr.jobID
+""")
+
+ACCEPT_CLAIMS = Query("accept_claims", """
+    UPDATE Contractor_Claim_Request SET status='Accepted'
+    WHERE requestID IN (SELECT value FROM json_each(?))
+""")
+
+# The rejected claims, and every other claim on the jobs just assigned
+DECLINE_CLAIMS = Query("decline_claims", """
+    UPDATE Contractor_Claim_Request SET status='Declined'
+    WHERE requestID IN (SELECT value FROM json_each(?))
+       OR (jobID IN (SELECT value FROM json_each(?)) AND status <> 'Accepted')
+""")
+
+ASSIGN_CONTRACTORS = Query("assign_contractors", """
+    UPDATE Job_Request SET contractorID = a.contractorID, status = 'In Progress'
+    FROM (SELECT json_extract(value, '$[0]') AS jobID, json_extract(value, '$[1]') AS contractorID
+          FROM json_each(?)) a
+    WHERE Job_Request.jobID = a.jobID
+""")
+
+JOBS_FOR_BULK = Query("jobs_for_bulk", """
+    SELECT d.value AS jobID, jr.clientID, jr.status
+    FROM json_each(?) d
+    LEFT JOIN Job_Request jr ON jr.jobID = d.value
+""")
+
+CANCEL_JOBS = Query("cancel_jobs", """
+    UPDATE Job_Request SET status='Cancelled' WHERE jobID IN (SELECT value FROM json_each(?))
+""")
+
+DECLINE_PENDING_CLAIMS_FOR_JOBS = Query("decline_pending_claims_for_jobs", """
+    UPDATE Contractor_Claim_Request SET status='Declined'
+    WHERE jobID IN (SELECT value FROM json_each(?)) AND status='Pending'
+""")
+
+EDIT_JOBS = Query("edit_jobs", """
+    UPDATE Job_Request SET service = IFNULL(?, service), companyID = IFNULL(?, companyID)
+    WHERE jobID IN (SELECT value FROM json_each(?))
+""")
+
+DELETE_JOB_CLAIMS = Query("delete_job_claims", "DELETE FROM Contractor_Claim_Request WHERE jobID=?")
+
+# Notification stream (notifications.py)
+LATEST_NOTIFICATION = Query("latest_notification", "SELECT IFNULL(MAX(eventID), 0) AS eventID FROM Notification")
+
+NOTIFICATIONS_SINCE = Query("notifications_since", """
+    SELECT n.eventID, n.userID, n.kind, n.jobID, n.service, n.contractorID, n.amount,
+           c.firstName || ' ' || c.lastName AS contractorName
+    FROM Notification n LEFT JOIN Contractor c ON c.contractorID = n.contractorID
+    WHERE n.eventID > ?
+    ORDER BY n.eventID
+""")
+
+USER_NOTIFICATIONS_SINCE = Query("user_notifications_since", """
+    SELECT n.eventID, n.userID, n.kind, n.jobID, n.service, n.contractorID, n.amount,
+           c.firstName || ' ' || c.lastName AS contractorName
+    FROM Notification n LEFT JOIN Contractor c ON c.contractorID = n.contractorID
+    WHERE n.userID = ? AND n.eventID > ?
+    ORDER BY n.eventID
+""")
+
+# Idempotency keys (idempotency.py); a conflict means the key was used before
+CLAIM_IDEMPOTENCY_KEY = Query("claim_idempotency_key", """
+    INSERT INTO Idempotency_Key (userID, endpoint, idempotencyKey, result) VALUES (?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+""")
+
+IDEMPOTENCY_RESULT = Query("idempotency_result", """
+    SELECT result FROM Idempotency_Key WHERE userID=? AND endpoint=? AND idempotencyKey=?
+""")
+
+# Change feed (outbox.py)
+OUTBOX_SINCE = Query("outbox_since", """
+    SELECT eventID, topic, entityID, payload, created FROM Outbox
+    WHERE eventID > ?
+    ORDER BY eventID LIMIT ?
+""")
+
+# Topics given as a JSON array; "job" matches every job.* topic
+OUTBOX_TOPICS_SINCE = Query("outbox_topics_since", """
+    SELECT eventID, topic, entityID, payload, created FROM Outbox
+    WHERE eventID > ?
+      AND (topic IN (SELECT value FROM json_each(?))
+           OR SUBSTR(topic, 1, INSTR(topic, '.') - 1) IN (SELECT value FROM json_each(?)))
+    ORDER BY eventID LIMIT ?
+""")
+
+OUTBOX_CONSUMER = Query("outbox_consumer", "SELECT name, position, updated FROM Outbox_Consumer WHERE name=?")
+
+# Positions only move forward, so a late or repeated ack is harmless
+ACK_OUTBOX = Query("ack_outbox", """
+    INSERT INTO Outbox_Consumer (name, position, updated) VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(name) DO UPDATE SET position = MAX(position, excluded.position), updated = excluded.updated
+""")
+
+# Room for every named statement plus the ad-hoc ones (API, archive, maintenance)
+STATEMENT_CACHE_SIZE = max(128, 2 * len(REGISTRY))
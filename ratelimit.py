@@ -0,0 +1,155 @@
+"""Token-bucket rate limiting shared by every worker on the host.
+
+Buckets live in a fixed-size table in a memory-mapped file (RATE_LIMIT_FILE),
+so all gunicorn workers draw from the same budget. A check hashes the
+"<endpoint>:<user or address>" key to one slot, takes an flock on the file
+and reads and writes that slot in place: constant time and no database
+access, and it runs ahead of the app's own request hooks so shed requests
+never open a connection. Two keys that land in the same slot simply start each
+other's bucket over.
+
+Budgets are per endpoint as (capacity, seconds): up to `capacity` requests in
+a burst, refilled evenly over `seconds`. Override them with e.g.
+RATE_LIMITS="login=10/60,register=3/3600". Only POSTs, the GET_WRITES
+links and the LIMITED_GETS are limited; those without a budget of their own
+get WRITE_BUDGET.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from flask import Response, request, session
+
+import metrics
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_FILE = os.environ.get("RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "contractor-ratelimit.bin"))
+SLOTS = 4096
+
+# Endpoints that change data on a GET (plain links rather than forms)
+GET_WRITES = {"request_claim", "claim_job", "approve_contractor", "reject_contractor",
+              "delete_company", "delete_jobrequest"}
+# Reads that tie up a worker thread: each /events request may hold one open
+LIMITED_GETS = {"events"}
+
+BUDGETS = {
+    "login": (10, 60),
+    "register": (5, 3600),
+    "request_claim": (20, 60),
+    "claim_job": (20, 60),
+    "approve_contractor": (30, 60),
+    "reject_contractor": (30, 60),
+    "delete_company": (10, 60),
+    "delete_jobrequest": (30, 60),
+    # each applies up to bulk.MAX_ITEMS changes
+    "bulk_claims": (10, 60),
+    "bulk_jobrequests": (10, 60),
+    # change-feed consumers acknowledge every page they process
+    "outbox_consumer": (600, 60),
+    # a tab reconnects every few seconds at worst, or on every page load
+    "events": (30, 60),
+}
+WRITE_BUDGET = (60, 60)
+
+# key hash, tokens left, time of the last update
+_SLOT = struct.Struct("<Qdd")
+
+
+def parse_budgets(spec):
+    """Parse "endpoint=capacity/seconds,..." into {endpoint: (capacity, seconds)}."""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, budget = item.partition("=")
+        capacity, _, seconds = budget.partition("/")
+        budgets[endpoint.strip()] = (int(capacity), float(seconds))
+    return budgets
+
+
+BUDGETS.update(parse_budgets(os.environ.get("RATE_LIMITS", "")))
+
+
+class TokenBuckets:
+    """A table of token buckets in a file every process maps."""
+
+    def __init__(self, path, slots=SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    def _mapping(self):
+        # Opened per process: an flock taken through a descriptor inherited
+        # across fork would not keep the parent and children apart
+        if self._pid != os.getpid():
+            size = self.slots * _SLOT.size
+            self._file = open(self.path, "a+b")
+            if os.fstat(self._file.fileno()).st_size < size:
+                self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+            self._pid = os.getpid()
+        return self._map
+
+    def take(self, key, capacity, seconds, now=None):
+        """Take a token from key's bucket. Returns 0 if one was available,
+        otherwise the seconds until there will be one."""
+        now = time.time() if now is None else now
+        rate = capacity / seconds
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        offset = digest % self.slots * _SLOT.size
+        with self._lock:
+            mapping = self._mapping()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                stored, tokens, updated = _SLOT.unpack_from(mapping, offset)
+                if stored != digest:
+                    tokens, updated = capacity, now
+                tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0
+                else:
+                    wait = (1 - tokens) / rate
+                _SLOT.pack_into(mapping, offset, digest, tokens, now)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        return wait
+
+
+_buckets = None
+
+
+def _budget():
+    if request.method != "POST" and request.endpoint not in GET_WRITES | LIMITED_GETS:
+        return None
+    return BUDGETS.get(request.endpoint, WRITE_BUDGET)
+
+
+def _before_request():
+    global _buckets
+    if not RATE_LIMIT_ENABLED:
+        return None
+    budget = _budget()
+    if budget is None:
+        return None
+    if _buckets is None or _buckets.path != RATE_LIMIT_FILE:
+        _buckets = TokenBuckets(RATE_LIMIT_FILE)
+    who = session.get("user_id") or request.remote_addr
+    wait = _buckets.take(f"{request.endpoint}:{who}", *budget)
+    if not wait:
+        return None
+    metrics.inc("rate_limited_total", endpoint=request.endpoint)
+    return Response("Too many requests, please slow down.", status=429,
+                    headers={"Retry-After": str(int(wait) + 1)})
+
+
+def init_app(app):
+    """Install the rate limit check on `app`; call it before any hook that
+    touches the database is registered."""
+    app.before_request(_before_request)
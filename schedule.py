@@ -0,0 +1,59 @@
+"""Job time windows and contractor availability.
+
+A job may carry a scheduled window (scheduled_start, scheduled_end); a
+contractor may list the windows they are available (Contractor_Availability).
+Triggers keep both in R*Tree indexes keyed on (contractor, minute), so
+whether a window clashes with a contractor's other jobs, or fits inside
+their availability, is a logarithmic lookup however many jobs they have.
+
+Windows are half-open: a job ending at 12:00 does not clash with one
+starting at 12:00. Jobs without a window never clash, and contractors who
+have not listed any availability are taken to be available at any time.
+"""
+import datetime
+
+import queries
+
+FORM_FORMAT = "%Y-%m-%dT%H:%M"
+STORED_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def parse_window(start, end):
+    """Turn the form's datetime-local values into stored (start, end).
+
+    Returns (None, None) when both are blank; raises ValueError with a
+    message for the user otherwise.
+    """
+    if not start and not end:
+        return None, None
+    if not (start and end):
+        raise ValueError("Give both a start and an end time, or neither.")
+    try:
+        start, end = (datetime.datetime.strptime(value, FORM_FORMAT) for value in (start, end))
+    except ValueError:
+        raise ValueError("Times must look like 2025-06-30T09:00.") from None
+    if end <= start:
+        raise ValueError("The end time must be after the start time.")
+    return start.strftime(STORED_FORMAT), end.strftime(STORED_FORMAT)
+
+
+def form_value(stored):
+    """A stored time as a datetime-local input value."""
+    return stored.replace(" ", "T") if stored else ""
+
+
+def assignment_problem(conn, job_id, contractor_id):
+    """Why contractor_id cannot take job_id on, or None if they can."""
+    job = queries.JOB_WINDOW.one(conn, (job_id,))
+    if job is None or job.startMinute is None or job.endMinute is None:
+        return None
+    clash = queries.SCHEDULE_CONFLICT.one(
+        conn, (contractor_id, contractor_id, job.endMinute, job.startMinute, job_id))
+    if clash:
+        return (f"Job #{job_id} overlaps job #{clash.jobID} "
+                f"({clash.scheduled_start} to {clash.scheduled_end}).")
+    if (queries.HAS_AVAILABILITY.one(conn, (contractor_id,))
+            and not queries.AVAILABILITY_COVERING.one(
+                conn, (contractor_id, contractor_id, job.startMinute, job.endMinute))):
+        return f"Job #{job_id} ({job.scheduled_start} to {job.scheduled_end}) falls outside the contractor's availability."
+    return None
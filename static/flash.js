@@ -0,0 +1,10 @@
+// Fade out flash messages after 2 seconds
+setTimeout(function() {
+  const alerts = document.querySelectorAll('.flash-container .alert');
+  alerts.forEach(alert => {
+    alert.style.opacity = '0';
+    alert.style.transform = 'translateY(-20px)';
+    // Remove from DOM after transition
+    setTimeout(() => alert.remove(), 500);
+  });
+}, 2000);
@@ -0,0 +1,22 @@
+// Live notices from /events (see notifications.py), shown like flash messages
+(function () {
+  if (!window.EventSource) return;
+  var container = document.getElementById('live-notices');
+  var messages = {
+    claim: function (e) { return (e.contractorName || 'A contractor') + ' wants to take your ' + e.service + ' job.'; },
+    approval: function (e) { return 'Your request for the ' + e.service + ' job was approved.'; },
+    rejection: function (e) { return 'Your request for the ' + e.service + ' job was declined.'; },
+    payment: function (e) { return 'You were paid $' + e.amount + ' for the ' + e.service + ' job.'; }
+  };
+  var links = { claim: '/dashboard/client', approval: '/dashboard/contractor/jobs', rejection: '/dashboard/contractor/jobs', payment: '/dashboard/contractor' };
+  var source = new EventSource('/events');
+  Object.keys(messages).forEach(function (kind) {
+    source.addEventListener(kind, function (message) {
+      var alert = document.createElement('a');
+      alert.className = 'alert alert-info';
+      alert.href = links[kind];
+      alert.textContent = messages[kind](JSON.parse(message.data));
+      container.appendChild(alert);
+    });
+  });
+})();
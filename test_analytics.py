@@ -0,0 +1,97 @@
+import datetime
+import sqlite3
+import unittest
+
+import analytics
+from fixtures import DatabaseTestCase
+
+NOW = datetime.datetime(2025, 6, 30, 12, tzinfo=datetime.timezone.utc)
+
+
+class TestAnalytics(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_user("boss", "client")
+        _, self.client_id = self.create_user("cli", "client")
+        _, self.contractor_id = self.create_user("con", "contractor")
+        self.old_admins = analytics.ADMINS
+        analytics.ADMINS = {"boss"}
+
+    def tearDown(self):
+        analytics.ADMINS = self.old_admins
+        super().tearDown()
+
+    def daily(self, day, service, **counters):
+        columns = ", ".join(["day", "service", *counters])
+        marks = ", ".join("?" * (len(counters) + 2))
+        self.conn.execute(f"INSERT INTO Analytics_Daily ({columns}) VALUES ({marks})", (day, service, *counters.values()))
+
+    def test_triggers_roll_up_events(self):
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Roofing', DATE('now'))",
+                    (self.client_id,))
+        job_id = cur.lastrowid
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'roofing', DATE('now'))",
+                    (self.client_id,))
+        cur.execute("UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?", (self.contractor_id, job_id))
+        cur.execute("UPDATE Job_Request SET status='Completed', date_fulfilled=DATE('now') WHERE jobID=?", (job_id,))
+        cur.execute("INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date) VALUES (?, ?, ?, 250, 'Cash', DATE('now'))",
+                    (job_id, self.client_id, self.contractor_id))
+        cur.execute("INSERT INTO Review (jobID, clientID, contractorID, rating, date) VALUES (?, ?, ?, 4, DATE('now'))",
+                    (job_id, self.client_id, self.contractor_id))
+        # Archiving does not take history back
+        cur.execute("DELETE FROM Job_Request WHERE jobID=?", (job_id,))
+
+        for table in ("Analytics_Daily", "Analytics_Hourly"):
+            row = cur.execute(f"""
+                SELECT service, posted, claimed, completed, payments, revenue, reviews, ratingTotal FROM {table}
+            """).fetchall()
+            self.assertEqual(row, [("Roofing", 2, 1, 1, 1, 250, 1, 4)], table)
+
+    def test_report_reads_only_rollups(self):
+        self.daily("2025-06-29", "Roofing", posted=4, claimed=3, claimHours=30, completed=2, completeHours=96,
+                   payments=2, revenue=500, reviews=2, ratingTotal=9)
+        self.daily("2025-06-30", "Roofing", posted=1)
+        self.daily("2025-06-30", "Plumbing", posted=2, claimed=1, claimHours=4)
+        self.daily("2025-05-01", "Plumbing", posted=50)
+        self.conn.execute("INSERT INTO Analytics_Hourly (hour, service, posted) VALUES ('2025-06-30 11:00', 'Roofing', 1)")
+
+        read = set()
+
+        def authorizer(action, table, *_):
+            if action == sqlite3.SQLITE_READ:
+                read.add(table)
+            return sqlite3.SQLITE_OK
+
+        self.conn.set_authorizer(authorizer)
+        report = analytics.report(self.conn, days=7, now=NOW)
+        self.conn.set_authorizer(None)
+        self.assertLessEqual(read, {"Analytics_Daily", "Analytics_Hourly"})
+
+        totals = report["totals"]
+        self.assertEqual((totals.posted, totals.claimed, totals.revenue), (7, 4, 500))
+        self.assertAlmostEqual(totals.fillRate, 4 / 7)
+        roofing, plumbing = report["by_service"]
+        self.assertEqual(roofing.key, "Roofing")
+        self.assertAlmostEqual(roofing.hoursToClaim, 10)
+        self.assertAlmostEqual(roofing.hoursToComplete, 48)
+        self.assertAlmostEqual(roofing.avgRating, 4.5)
+        self.assertEqual(roofing.avgPayment, 250)
+        self.assertIsNone(plumbing.avgRating)
+        self.assertEqual([day.key for day in report["by_day"]], ["2025-06-30", "2025-06-29"])
+        self.assertEqual([hour.posted for hour in report["by_hour"]], [1])
+
+    def test_page_is_for_admins(self):
+        self.daily("2000-01-01", "Roofing", posted=1)
+        self.conn.commit()
+        self.login("cli")
+        self.assertEqual(self.client.get("/admin/analytics").status_code, 403)
+        self.client.get("/logout")
+        self.login("boss")
+        body = self.client.get("/admin/analytics?days=7").get_data(as_text=True)
+        self.assertIn("<strong>7 days</strong>", body)
+        self.assertIn("No activity in this period.", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
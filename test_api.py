@@ -0,0 +1,56 @@
+import unittest
+
+import app as app_module
+from fixtures import DatabaseTestCase
+
+
+class TestApi(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO User (username, password, role) VALUES ('client1', 'pw', 'client')")
+        self.client_user = cur.lastrowid
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (?, 'A', 'B')", (self.client_user,))
+        client_id = cur.lastrowid
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (99, 'Other', 'Client')")
+        other_client = cur.lastrowid
+        for i in range(5):
+            cur.execute("INSERT INTO Company (name, serviceType) VALUES (?, 'Plumbing')", (f"Company {i}",))
+        for owner in (client_id, client_id, other_client):
+            cur.execute("""
+                INSERT INTO Job_Request (clientID, service, status, date_posted) VALUES (?, 'Roof', 'Pending', DATE('now'))
+            """, (owner,))
+        self.conn.commit()
+
+        with self.client.session_transaction() as sess:
+            sess["user_id"] = self.client_user
+            sess["role"] = "client"
+
+    def test_login_required(self):
+        response = app_module.app.test_client().get("/api/v1/companies")
+        self.assertEqual(response.status_code, 401)
+
+    def test_field_selection_and_cursor_pagination(self):
+        response = self.client.get("/api/v1/companies?fields=name&limit=2")
+        page = response.get_json()
+        self.assertEqual(page["fields"], ["name"])
+        self.assertEqual(page["data"], [["Company 0"], ["Company 1"]])
+
+        names = [row[0] for row in page["data"]]
+        while page["next_cursor"]:
+            page = self.client.get(f"/api/v1/companies?fields=name&limit=2&cursor={page['next_cursor']}").get_json()
+            names.extend(row[0] for row in page["data"])
+        self.assertEqual(names, [f"Company {i}" for i in range(5)])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/v1/contractors?fields=earnings")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("earnings", response.get_json()["error"])
+
+    def test_clients_only_see_their_own_job_requests(self):
+        page = self.client.get("/api/v1/jobrequests").get_json()
+        self.assertEqual(len(page["data"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sqlite3
+import unittest
+
+import app as app_module
+from archive import archive_jobs, attach_archive
+from fixtures import DatabaseTestCase, memory_uri
+
+
+class TestArchive(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_archive_file = app_module.ARCHIVE_DB_FILE
+        self.archive_file = app_module.ARCHIVE_DB_FILE = memory_uri("archive")
+        # Keeps the in-memory archive alive between the connections that attach it
+        self.archive_conn = sqlite3.connect(self.archive_file, uri=True)
+
+        _, self.client_id = self.create_user("client1", "client", firstName="A", lastName="B")
+        _, self.contractor_id = self.create_user("contractor1", "contractor", firstName="C", lastName="D")
+        cur = self.conn.cursor()
+        jobs = [
+            ("Completed", "DATE('now', '-200 days')"),
+            ("Cancelled", "DATE('now', '-200 days')"),
+            ("Completed", "DATE('now')"),
+            ("Pending", "DATE('now', '-200 days')"),
+        ]
+        self.job_ids = []
+        for status, posted in jobs:
+            cur.execute(f"""
+                INSERT INTO Job_Request (clientID, contractorID, service, status, client_approval, date_posted)
+                VALUES (?, ?, 'Plumbing', ?, 'Approved', {posted})
+            """, (self.client_id, self.contractor_id, status))
+            self.job_ids.append(cur.lastrowid)
+            self.pay(self.job_ids[-1])
+        cur.execute("""
+            INSERT INTO Contractor_Claim_Request (jobID, contractorID, status, date_requested)
+            VALUES (?, ?, 'Accepted', DATE('now', '-200 days'))
+        """, (self.job_ids[0], self.contractor_id))
+        cur.execute("""
+            INSERT INTO Review (jobID, clientID, contractorID, rating, comment, date)
+            VALUES (?, ?, ?, 5, 'Great', DATE('now', '-200 days'))
+        """, (self.job_ids[0], self.client_id, self.contractor_id))
+        self.conn.commit()
+
+    def pay(self, job_id):
+        self.conn.execute("""
+            INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date)
+            VALUES (?, ?, ?, 100, 'Cash', DATE('now'))
+        """, (job_id, self.client_id, self.contractor_id))
+
+    def tearDown(self):
+        app_module.ARCHIVE_DB_FILE = self.old_archive_file
+        super().tearDown()
+        self.archive_conn.close()
+
+    def test_only_old_finished_jobs_are_archived(self):
+        attach_archive(self.conn, self.archive_file)
+        moved = archive_jobs(self.conn, 90, batch_size=1)
+        self.assertEqual(moved, 2)
+
+        hot = [r[0] for r in self.conn.execute("SELECT jobID FROM main.Job_Request ORDER BY jobID")]
+        cold = [r[0] for r in self.conn.execute("SELECT jobID FROM archive.Job_Request ORDER BY jobID")]
+        self.assertEqual(hot, self.job_ids[2:])
+        self.assertEqual(cold, self.job_ids[:2])
+
+        # Claims move with their job, reviews stay hot and still resolve
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM main.Contractor_Claim_Request").fetchone()[0], 0)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM archive.Contractor_Claim_Request").fetchone()[0], 1)
+        row = self.conn.execute("""
+            SELECT jr.status FROM main.Review r JOIN archive.Job_Request jr ON r.jobID = jr.jobID
+        """).fetchone()
+        self.assertEqual(row[0], "Completed")
+
+    def test_unsettled_jobs_stay_hot(self):
+        unsettled = {}
+        for approval in ("Pending", "Approved", "Denied"):
+            unsettled[approval] = self.conn.execute("""
+                INSERT INTO Job_Request (clientID, contractorID, service, status, client_approval, date_posted)
+                VALUES (?, ?, 'Plumbing', 'Completed', ?, DATE('now', '-200 days'))
+            """, (self.client_id, self.contractor_id, approval)).lastrowid
+        self.conn.commit()
+        attach_archive(self.conn, self.archive_file)
+        archive_jobs(self.conn, 90)
+
+        hot = {r[0] for r in self.conn.execute("SELECT jobID FROM main.Job_Request")}
+        # Denied needs nothing more; approved but unpaid still has to be paid
+        self.assertNotIn(unsettled["Denied"], hot)
+        self.assertLessEqual({unsettled["Pending"], unsettled["Approved"]}, hot)
+
+        self.pay(unsettled["Approved"])
+        self.conn.commit()
+        self.assertEqual(archive_jobs(self.conn, 90), 1)
+
+    def test_archive_is_idempotent(self):
+        attach_archive(self.conn, self.archive_file)
+        archive_jobs(self.conn, 90)
+        self.assertEqual(archive_jobs(self.conn, 90), 0)
+
+    def test_client_history_page_reads_archive(self):
+        attach_archive(self.conn, self.archive_file)
+        archive_jobs(self.conn, 90)
+
+        self.login("client1")
+        response = self.client.get("/dashboard/client/jobs/history")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Cancelled", response.data)
+        self.assertIn(b"C D", response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
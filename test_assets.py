@@ -0,0 +1,66 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, render_template_string
+
+import assets
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"), self.static,
+                        ignore=shutil.ignore_patterns(assets.DIST_DIR))
+        self.app = Flask(__name__, static_folder=self.static)
+        assets.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def url(self, name):
+        with self.app.test_request_context():
+            return render_template_string("{{ asset_url(name) }}", name=name)
+
+    def test_names_carry_a_content_hash(self):
+        url = self.url("style.css")
+        self.assertRegex(url, r"^/assets/style\.[0-9a-f]{12}\.css$")
+        self.assertEqual(self.url("missing.css"), "/static/missing.css")
+
+    def test_gzip_variant_is_negotiated(self):
+        url = self.url("style.css")
+        with open(os.path.join(self.static, "style.css"), "rb") as f:
+            original = f.read()
+
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertEqual(response.mimetype, "text/css")
+        self.assertEqual(gzip.decompress(response.data), original)
+        response.close()
+
+        response = self.client.get(url, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(response.data, original)
+        response.close()
+
+        self.assertEqual(self.client.get("/assets/style.css").status_code, 404)
+
+    def test_edited_file_gets_a_new_name(self):
+        before = self.url("flash.js")
+        path = os.path.join(self.static, "flash.js")
+        with open(path, "a") as f:
+            f.write("\n// changed\n")
+        manifest_time = os.path.getmtime(os.path.join(self.static, assets.DIST_DIR, assets.MANIFEST))
+        os.utime(path, (manifest_time + 1, manifest_time + 1))
+        self.assertIsNone(assets.load_manifest(self.static))
+        self.assertNotEqual(assets.build_assets(self.static)["flash.js"], before.rsplit("/", 1)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import gzip
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import backup
+from backup import backup_database, rotate_backups
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, "project.db")
+        self.backup_dir = os.path.join(self.tmp.name, "backups")
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("CREATE TABLE Company (companyID INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO Company (name) VALUES (?)", [(f"Company {i}",) for i in range(500)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_uncompressed_backup_is_a_usable_copy(self):
+        path = backup_database(self.db_file, self.backup_dir, pages=1, pause=0, compress=False)
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM Company").fetchone()[0], 500)
+        conn.close()
+
+    def test_compressed_backup(self):
+        path = backup_database(self.db_file, self.backup_dir, pause=0)
+        self.assertTrue(path.endswith(".db.gz"))
+        with gzip.open(path, "rb") as packed:
+            self.assertTrue(packed.read(16).startswith(b"SQLite format 3"))
+        self.assertFalse([n for n in os.listdir(self.backup_dir) if n.endswith(".tmp")])
+
+    def test_rotation_keeps_newest(self):
+        os.makedirs(self.backup_dir)
+        for stamp in ("20240101-000000", "20240102-000000", "20240103-000000"):
+            open(os.path.join(self.backup_dir, f"project-{stamp}.db.gz"), "w").close()
+        removed = rotate_backups(self.backup_dir, "project-", keep=2)
+        self.assertEqual(removed, ["project-20240101-000000.db.gz"])
+        self.assertEqual(len(os.listdir(self.backup_dir)), 2)
+
+    def test_rotation_needs_a_backup_to_keep(self):
+        with self.assertRaises(ValueError):
+            backup_database(self.db_file, self.backup_dir, keep=0)
+        self.assertFalse(os.path.exists(self.backup_dir))
+
+    def test_backups_in_the_same_second_do_not_collide(self):
+        paths = {backup_database(self.db_file, self.backup_dir, pause=0, keep=3) for _ in range(3)}
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(sorted(os.listdir(self.backup_dir)), sorted(map(os.path.basename, paths)))
+
+    def test_copy_restarted_by_writes_finishes_in_one_step(self):
+        writer = sqlite3.connect(self.db_file)
+        throttle = backup._throttle
+
+        def writing(pause, max_restarts):
+            progress = throttle(pause, max_restarts)
+
+            def step(status, remaining, total):
+                writer.execute("INSERT INTO Company (name) VALUES ('During')")
+                writer.commit()
+                progress(status, remaining, total)
+            return step
+
+        with mock.patch.object(backup, "_throttle", writing):
+            path = backup_database(self.db_file, self.backup_dir, pages=1, pause=0, compress=False, max_restarts=2)
+        writer.close()
+        conn = sqlite3.connect(path)
+        self.assertGreater(conn.execute("SELECT COUNT(*) FROM Company").fetchone()[0], 500)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+from fixtures import DatabaseTestCase
+
+
+class TestBulk(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("cli", "client")
+        _, self.other_client = self.create_user("oth", "client")
+        _, self.alice = self.create_user("alice", "contractor")
+        _, self.bob = self.create_user("bob", "contractor")
+
+    def job(self, client_id=None, window=None, status="Pending"):
+        start, end = window or (None, None)
+        cur = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, service, status, scheduled_start, scheduled_end, date_posted)
+            VALUES (?, 'Roof', ?, ?, ?, DATE('now'))
+        """, (client_id or self.client_id, status, start, end))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def claim(self, job_id, contractor_id):
+        cur = self.conn.execute("""
+            INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))
+        """, (job_id, contractor_id))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def claim_statuses(self, *request_ids):
+        return [self.conn.execute("SELECT status FROM Contractor_Claim_Request WHERE requestID=?", (request_id,)).fetchone()[0]
+                for request_id in request_ids]
+
+    def job_row(self, job_id):
+        return self.conn.execute("SELECT status, contractorID, service FROM Job_Request WHERE jobID=?", (job_id,)).fetchone()
+
+    def decide(self, *decisions):
+        response = self.client.post("/claims/bulk", json={
+            "decisions": [{"requestID": request_id, "decision": decision} for request_id, decision in decisions]})
+        self.assertEqual(response.status_code, 200)
+        return [(result["id"], result["ok"]) for result in response.get_json()["results"]]
+
+    def test_mixed_decisions(self):
+        first, second, theirs = self.job(), self.job(), self.job(self.other_client)
+        a1, b1 = self.claim(first, self.alice), self.claim(first, self.bob)
+        b2 = self.claim(second, self.bob)
+        stranger = self.claim(theirs, self.alice)
+        self.login("cli")
+
+        results = self.decide((a1, "approve"), (b1, "approve"), (b2, "reject"), (stranger, "approve"), (999, "reject"))
+        self.assertEqual(results, [(a1, True), (b1, False), (b2, True), (stranger, False), (999, False)])
+        self.assertEqual(self.claim_statuses(a1, b1, b2, stranger), ["Accepted", "Declined", "Declined", "Pending"])
+        self.assertEqual(self.job_row(first)[:2], ("In Progress", self.alice))
+        self.assertEqual(self.job_row(second)[:2], ("Pending", None))
+        self.assertEqual(self.job_row(theirs)[:2], ("Pending", None))
+
+        # Deciding again reports the earlier decision instead of changing it
+        self.assertEqual(self.decide((b1, "approve")), [(b1, False)])
+
+    def test_batch_checks_schedules_against_itself(self):
+        morning = self.job(window=("2025-07-01 09:00", "2025-07-01 12:00"))
+        overlapping = self.job(window=("2025-07-01 11:00", "2025-07-01 13:00"))
+        afternoon = self.job(window=("2025-07-01 12:00", "2025-07-01 14:00"))
+        claims = [self.claim(job_id, self.alice) for job_id in (morning, overlapping, afternoon)]
+        self.login("cli")
+
+        results = self.decide(*((request_id, "approve") for request_id in claims))
+        self.assertEqual(results, [(claims[0], True), (claims[1], False), (claims[2], True)])
+        self.assertEqual(self.claim_statuses(*claims), ["Accepted", "Pending", "Accepted"])
+
+    def test_dashboard_form(self):
+        job_id = self.job()
+        a1, b1 = self.claim(job_id, self.alice), self.claim(job_id, self.bob)
+        self.login("cli")
+        self.assertIn(f'name="decision-{a1}"', self.client.get("/dashboard/client").get_data(as_text=True))
+
+        body = self.client.post("/claims/bulk", data={f"decision-{a1}": "later", f"decision-{b1}": "reject"}).get_data(as_text=True)
+        self.assertIn("1 of 1 changed", body)
+        self.assertEqual(self.claim_statuses(a1, b1), ["Pending", "Declined"])
+
+    def test_bulk_cancel_and_edit(self):
+        pending, other_pending = self.job(), self.job()
+        started = self.job(status="In Progress")
+        theirs = self.job(self.other_client)
+        claim = self.claim(pending, self.alice)
+        self.login("cli")
+        self.assertIn(f'name="jobID" value="{pending}"', self.client.get("/jobrequests").get_data(as_text=True))
+
+        body = self.client.post("/jobrequests/bulk", data={
+            "action": "edit", "service": "Gutters", "jobID": [pending, other_pending, started, theirs]}).get_data(as_text=True)
+        self.assertIn("2 of 4 changed", body)
+        self.assertEqual([self.job_row(job_id)[2] for job_id in (pending, other_pending, started, theirs)],
+                         ["Gutters", "Gutters", "Roof", "Roof"])
+
+        self.client.post("/jobrequests/bulk", data={"action": "cancel", "jobID": [pending, started]})
+        self.assertEqual([self.job_row(job_id)[0] for job_id in (pending, other_pending, started)],
+                         ["Cancelled", "Pending", "In Progress"])
+        self.assertEqual(self.claim_statuses(claim), ["Declined"])
+
+    def test_only_clients(self):
+        self.login("alice")
+        self.assertEqual(self.client.post("/claims/bulk", json={"decisions": []}).status_code, 403)
+        self.assertEqual(self.client.post("/jobrequests/bulk", data={"action": "cancel"}).status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
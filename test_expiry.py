@@ -0,0 +1,65 @@
+import unittest
+
+import expiry
+from fixtures import DatabaseTestCase
+
+
+class TestExpiry(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("cli", "client")
+        _, self.contractor_id = self.create_user("con", "contractor")
+
+    def job(self, posted, status="Pending"):
+        cur = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, service, status, date_posted) VALUES (?, 'Roof', ?, DATE('now', ?))
+        """, (self.client_id, status, posted))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def claim(self, job_id, requested):
+        cur = self.conn.execute("""
+            INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now', ?))
+        """, (job_id, self.contractor_id, requested))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def status(self, table, key, item_id):
+        return self.conn.execute(f"SELECT status FROM {table} WHERE {key}=?", (item_id,)).fetchone()[0]
+
+    def test_expires_in_batches_and_logs(self):
+        stale = [self.job("-90 days") for _ in range(5)]
+        fresh = self.job("-10 days")
+        started = self.job("-90 days", status="In Progress")
+        stale_claim = self.claim(stale[0], "-90 days")
+        old_claim, new_claim = self.claim(fresh, "-30 days"), self.claim(fresh, "-1 days")
+
+        self.assertEqual(expiry.expire_jobs(self.conn, 60, batch_size=2, pause=0), 5)
+        self.assertEqual(expiry.expire_claims(self.conn, 14, batch_size=2, pause=0), 1)
+        self.assertEqual({self.status("Job_Request", "jobID", job_id) for job_id in stale}, {"Cancelled"})
+        self.assertEqual(self.status("Job_Request", "jobID", fresh), "Pending")
+        self.assertEqual(self.status("Job_Request", "jobID", started), "In Progress")
+        self.assertEqual([self.status("Contractor_Claim_Request", "requestID", request_id)
+                          for request_id in (stale_claim, old_claim, new_claim)], ["Declined", "Declined", "Pending"])
+
+        logged = self.conn.execute("SELECT kind, itemID FROM Expiry_Log ORDER BY kind, itemID").fetchall()
+        self.assertEqual(logged, sorted([("claim", stale_claim), ("claim", old_claim)] + [("job", job_id) for job_id in stale]))
+        self.assertEqual(self.conn.execute("SELECT pendingJobs, cancelledJobs FROM Client_Summary WHERE clientID=?",
+                                           (self.client_id,)).fetchone(), (1, 5))
+
+        # Nothing left to do the second time round
+        self.assertEqual(expiry.expire_stale(self.conn, 60, 14), {"jobs_cancelled": 0, "claims_declined": 0})
+
+    def test_sweeps_use_the_pending_indexes(self):
+        for table, column in (("Job_Request", "date_posted"), ("Contractor_Claim_Request", "date_requested")):
+            plan = " ".join(row[3] for row in self.conn.execute(f"""
+                EXPLAIN QUERY PLAN SELECT rowid FROM {table}
+                WHERE status = 'Pending' AND {column} < DATE('now', '-1 days') ORDER BY {column} LIMIT 10
+            """))
+            with self.subTest(table=table):
+                self.assertIn("USING INDEX idx_", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
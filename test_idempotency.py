@@ -0,0 +1,74 @@
+import time
+import unittest
+
+import idempotency
+from fixtures import DatabaseTestCase
+from idempotency import DedupeCache
+
+
+class TestDedupeCache(unittest.TestCase):
+    def test_expiry_and_size(self):
+        cache = DedupeCache(ttl=0.05, size=2)
+        cache.put("a", "/a")
+        self.assertEqual(cache.get("a"), "/a")
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+
+        for entry in ("a", "b", "c"):
+            cache.put(entry, f"/{entry}")
+        self.assertEqual([cache.get(entry) for entry in ("a", "b", "c")], [None, "/b", "/c"])
+
+
+class TestIdempotentPosts(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("cli", "client")
+        _, self.contractor_id = self.create_user("con", "contractor")
+        self.job_id = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, contractorID, service, status, client_approval, date_posted)
+            VALUES (?, ?, 'Roof', 'Completed', 'Approved', DATE('now'))
+        """, (self.client_id, self.contractor_id)).lastrowid
+        self.conn.commit()
+        self.login("cli")
+
+    def count(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE jobID=?", (self.job_id,)).fetchone()[0]
+
+    def earnings(self):
+        return self.conn.execute("SELECT earnings FROM Contractor WHERE contractorID=?", (self.contractor_id,)).fetchone()[0]
+
+    def test_payment_retries_pay_once(self):
+        page = self.client.get(f"/jobrequests/payment/{self.job_id}").get_data(as_text=True)
+        self.assertIn('name="idempotency_key"', page)
+        form = {"amount": "150", "method": "Cash", "idempotency_key": "k1"}
+
+        first = self.client.post(f"/jobrequests/payment/{self.job_id}", data=form)
+        retry = self.client.post(f"/jobrequests/payment/{self.job_id}", data=form)
+        # Another worker has not seen the key yet, only the table has
+        idempotency.cache.clear()
+        late_retry = self.client.post(f"/jobrequests/payment/{self.job_id}", data=form)
+        self.assertEqual({first.headers["Location"], retry.headers["Location"], late_retry.headers["Location"]},
+                         {f"/jobrequests/review/{self.job_id}"})
+        self.assertEqual((self.count("Transactions"), self.earnings()), (1, 150))
+
+        self.client.post(f"/jobrequests/payment/{self.job_id}", data={**form, "idempotency_key": "k2"})
+        self.assertEqual((self.count("Transactions"), self.earnings()), (2, 300))
+
+    def test_review_retries_review_once(self):
+        form = {"rating": "5", "comment": "Great", "idempotency_key": "r1"}
+        for _ in range(3):
+            self.client.post(f"/jobrequests/review/{self.job_id}", data=form)
+        self.client.post(f"/jobrequests/review/{self.job_id}", headers={"Idempotency-Key": "r2"},
+                         data={"rating": "3"})
+        self.client.post(f"/jobrequests/review/{self.job_id}", headers={"Idempotency-Key": "r2"},
+                         data={"rating": "3"})
+        self.assertEqual(self.count("Review"), 2)
+
+    def test_keys_are_per_user(self):
+        self.client.post(f"/jobrequests/payment/{self.job_id}", data={"amount": "10", "method": "Cash", "idempotency_key": "k"})
+        self.assertIsNone(idempotency.begin(self.conn, 999, "client_payment", "k", "/elsewhere"))
+        self.conn.rollback()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from fixtures import DatabaseTestCase
+from migrations import JOB_CARD_SELECT, add_job_card_schedules, create_job_cards
+
+
+class TestJobCard(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cur = self.conn.cursor()
+
+    def assertCardsConsistent(self):
+        cards = self.cur.execute("SELECT * FROM Job_Card ORDER BY jobID").fetchall()
+        expected = self.cur.execute(f"{JOB_CARD_SELECT} ORDER BY jr.jobID").fetchall()
+        self.assertEqual(cards, expected)
+
+    def test_triggers_keep_cards_in_step(self):
+        cur = self.cur
+        cur.execute("INSERT INTO Company (name) VALUES ('Acme')")
+        company_id = cur.lastrowid
+        # Job posted before the client row exists
+        cur.execute("INSERT INTO Job_Request (clientID, companyID, service, date_posted) VALUES (1, ?, 'Roof', DATE('now'))", (company_id,))
+        job_id = cur.lastrowid
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (1, 'Cli', 'Ent')")
+        cur.execute("INSERT INTO Contractor (userID, firstName, lastName) VALUES (2, 'Con', 'Tractor')")
+        contractor_id = cur.lastrowid
+        self.assertCardsConsistent()
+
+        cur.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))", (job_id, contractor_id))
+        cur.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, 99, DATE('now'))", (job_id,))
+        self.assertEqual(cur.execute("SELECT pendingClaims FROM Job_Card").fetchone()[0], 2)
+
+        cur.execute("UPDATE Contractor_Claim_Request SET status='Declined' WHERE contractorID=99")
+        cur.execute("UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?", (contractor_id, job_id))
+        cur.execute("UPDATE Client SET firstName='New' WHERE clientID=1")
+        cur.execute("UPDATE Contractor SET lastName='Renamed' WHERE contractorID=?", (contractor_id,))
+        cur.execute("UPDATE Company SET name='Acme Inc' WHERE companyID=?", (company_id,))
+        cur.execute("UPDATE Job_Request SET scheduled_start='2026-05-01 09:00', scheduled_end='2026-05-01 12:00' "
+                    "WHERE jobID=?", (job_id,))
+        self.assertCardsConsistent()
+
+        cur.execute("DELETE FROM Company WHERE companyID=?", (company_id,))
+        cur.execute("DELETE FROM Contractor_Claim_Request WHERE jobID=?", (job_id,))
+        self.assertCardsConsistent()
+
+        cur.execute("DELETE FROM Job_Request WHERE jobID=?", (job_id,))
+        self.assertEqual(cur.execute("SELECT COUNT(*) FROM Job_Card").fetchone()[0], 0)
+
+    def test_existing_jobs_are_backfilled(self):
+        self.assertEqual(self.cur.execute("SELECT COUNT(*) FROM Job_Card").fetchone()[0], 0)
+        self.cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (1, 'A', 'B')")
+        self.cur.execute("INSERT INTO Job_Request (clientID, service, scheduled_start, scheduled_end, date_posted) "
+                         "VALUES (1, 'Roof', '2026-05-01 09:00', '2026-05-01 12:00', DATE('now'))")
+        # As on a database from before Job_Card
+        self.cur.execute("DROP TABLE Job_Card")
+        self.conn.commit()
+        # Run just these migrations: rewinding user_version would also re-run
+        # every later one against a schema they have already changed
+        create_job_cards(self.conn)
+        add_job_card_schedules(self.conn)
+        self.conn.commit()
+        self.assertCardsConsistent()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+import app as app_module
+import leaderboards
+from fixtures import DatabaseTestCase
+
+
+class TestLeaderboards(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_user("cli", "client")
+        self.client_id = 1
+        _, self.plumber = self.create_user("pete", "contractor", service="Plumbing", city="Austin", state="TX")
+        _, self.roofer = self.create_user("rita", "contractor", service="Roofing", city="Dallas", state="TX")
+        self.boards = app_module.boards
+
+    def start_job(self, contractor_id):
+        cur = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, contractorID, service, status, date_posted)
+            VALUES (?, ?, 'Work', 'In Progress', DATE('now'))
+        """, (self.client_id, contractor_id))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def complete(self, contractor_id, rating):
+        job_id = self.start_job(contractor_id)
+        response = self.client.post(f"/jobrequests/complete/{job_id}",
+                                    data={"rating": rating, "review": "ok"})
+        self.assertEqual(response.status_code, 302)
+
+    def ids(self, metric, scope="all", value=""):
+        return [standing.contractorID for standing in self.boards.top(metric, scope, value)]
+
+    def test_completions_and_reviews_move_contractors(self):
+        self.login("cli")
+        self.assertEqual(self.ids("completed"), [])
+
+        self.complete(self.roofer, 4)
+        self.assertEqual(self.ids("completed"), [self.roofer])
+        self.assertEqual(self.ids("recent", "state", "TX"), [self.roofer])
+        self.assertEqual(self.ids("completed", "service", "Plumbing"), [])
+
+        for rating in (5, 5):
+            self.complete(self.plumber, rating)
+        self.assertEqual(self.ids("completed"), [self.plumber, self.roofer])
+        self.assertEqual(self.ids("completed", "city", "Austin, TX"), [self.plumber])
+        # Not enough reviews to be ranked by rating yet
+        self.assertEqual(self.ids("rating"), [])
+
+        self.complete(self.plumber, 2)
+        self.assertEqual(self.ids("rating"), [self.plumber])
+        self.assertAlmostEqual(self.boards.top("rating")[0].rating, 4)
+
+        job_id = self.start_job(self.plumber)
+        for _ in range(leaderboards.MIN_REVIEWS):
+            self.client.post(f"/jobrequests/review/{job_id}", data={"rating": 1, "comment": "late"})
+        self.assertEqual(self.ids("rating"), [self.plumber])
+        self.assertLess(self.boards.top("rating")[0].rating, 4)
+
+    def test_profile_edit_moves_contractor_between_scopes(self):
+        self.login("cli")
+        self.complete(self.plumber, 5)
+        self.client.get("/logout")
+        self.login("pete")
+        self.client.post("/profile/edit", data={"firstName": "Pete", "lastName": "Test", "service": "Electrical",
+                                                "city": "Houston", "state": "TX"})
+        self.assertEqual(self.ids("completed", "service", "Plumbing"), [])
+        self.assertEqual(self.ids("completed", "service", "Electrical"), [self.plumber])
+        self.assertEqual(self.boards.values("city"), ["Houston, TX"])
+
+    def test_reconciliation_picks_up_other_writers(self):
+        self.assertEqual(self.ids("completed"), [])
+        # Another worker completes a job: this process is not told
+        job_id = self.start_job(self.roofer)
+        self.conn.execute("UPDATE Job_Request SET status='Completed' WHERE jobID=?", (job_id,))
+        self.conn.commit()
+        self.assertEqual(self.ids("completed"), [])
+
+        self.boards._loaded -= leaderboards.RECONCILE_INTERVAL
+        self.assertEqual(self.ids("completed"), [self.roofer])
+
+    def test_page(self):
+        self.login("cli")
+        self.complete(self.roofer, 5)
+        body = self.client.get("/contractors/leaderboard?metric=completed&scope=service&value=Roofing").get_data(as_text=True)
+        self.assertIn("Rita Test", body)
+        self.assertIn('<option selected>Roofing</option>', body)
+        self.assertEqual(self.client.get("/contractors/leaderboard?metric=bogus").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
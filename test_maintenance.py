@@ -0,0 +1,112 @@
+import sqlite3
+import unittest
+
+import app as app_module
+from archive import attach_archive
+from fixtures import DatabaseTestCase, memory_uri
+from maintenance import (delete_orphans, enable_incremental_vacuum, incremental_vacuum, prune_hourly_rollups,
+                         prune_idempotency_keys, prune_notifications, prune_outbox)
+from migrations import LEGACY_TABLES, MIGRATIONS
+
+
+class TestMaintenance(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        attach_archive(self.conn, ":memory:")
+
+    def old_database(self):
+        """A database that still carries the legacy tables, run through init_db()."""
+        app_module.DB_FILE = memory_uri("legacy")
+        conn = sqlite3.connect(app_module.DB_FILE, uri=True)
+        for table in LEGACY_TABLES:
+            conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        app_module.init_db()
+        return conn
+
+    def test_migrations_drop_legacy_tables(self):
+        conn = self.old_database()
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertFalse(tables & set(LEGACY_TABLES))
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], len(MIGRATIONS))
+        conn.close()
+
+    def test_incremental_vacuum_is_enabled_outside_migrations(self):
+        # The database predates init_db(), so only a VACUUM can switch it over
+        conn = self.old_database()
+        self.assertEqual(conn.execute("PRAGMA main.auto_vacuum").fetchone()[0], 0)
+        self.assertTrue(enable_incremental_vacuum(conn))
+        self.assertEqual(conn.execute("PRAGMA main.auto_vacuum").fetchone()[0], 2)
+        self.assertFalse(enable_incremental_vacuum(conn))
+        conn.close()
+
+    def test_delete_orphans_in_batches(self):
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (1, 'Kept', DATE('now'))")
+        live_job = cur.lastrowid
+        for job_id in (live_job, 999, 999, 999):
+            cur.execute("""
+                INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested)
+                VALUES (?, 1, DATE('now'))
+            """, (job_id,))
+        reviewed, untouched = (cur.execute("INSERT INTO Contractor (userID, firstName, lastName, rating) "
+                                           "VALUES (?, 'Con', 'Tractor', 4.5)", (user,)).lastrowid for user in (1, 2))
+        cur.executemany("INSERT INTO Review (jobID, clientID, contractorID, rating, date) VALUES (?, 1, ?, ?, DATE('now'))",
+                        [(999, reviewed, 3), (live_job, reviewed, 5)])
+        self.conn.commit()
+
+        deleted = delete_orphans(self.conn, batch_size=2, pause=0)
+        self.assertEqual(deleted["Contractor_Claim_Request"], 3)
+        self.assertEqual(deleted["Review"], 1)
+        remaining = [r[0] for r in self.conn.execute("SELECT jobID FROM Contractor_Claim_Request")]
+        self.assertEqual(remaining, [live_job])
+        # Only the contractor who lost a review has their rating recomputed
+        ratings = self.conn.execute("SELECT contractorID, rating FROM Contractor ORDER BY contractorID").fetchall()
+        self.assertEqual(ratings, [(reviewed, 5.0), (untouched, 4.5)])
+
+    def test_prune_notifications_keeps_recent_ones(self):
+        self.conn.executemany("INSERT INTO Notification (userID, kind, created) VALUES (1, 'claim', ?)",
+                              [("2000-01-01 00:00:00",)] * 3 + [("9999-01-01 00:00:00",)])
+        self.conn.commit()
+        self.assertEqual(prune_notifications(self.conn, keep_days=7, batch_size=2, pause=0), 3)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM Notification").fetchone()[0], 1)
+
+    def test_prune_hourly_rollups_keeps_recent_hours(self):
+        self.conn.executemany("INSERT INTO Analytics_Hourly (hour, service, posted) VALUES (?, ?, 1)",
+                              [("2000-01-01 00:00", "Roof"), ("2000-01-01 01:00", "Roof"), ("9999-01-01 00:00", "Roof")])
+        self.conn.commit()
+        self.assertEqual(prune_hourly_rollups(self.conn, keep_days=14, batch_size=1, pause=0), 2)
+        self.assertEqual(self.conn.execute("SELECT hour FROM Analytics_Hourly").fetchall(), [("9999-01-01 00:00",)])
+
+    def test_prune_outbox_waits_for_consumers(self):
+        self.conn.executemany("INSERT INTO Outbox (topic, payload, created) VALUES ('job.posted', '{}', ?)",
+                              [("2000-01-01",), ("2000-01-02",), ("2000-01-03",), ("9999-01-01",)])
+        self.conn.execute("INSERT INTO Outbox_Consumer (name, position) VALUES ('search', 2), ('cache', 3)")
+        self.conn.commit()
+        self.assertEqual(prune_outbox(self.conn, keep_days=30, batch_size=1, pause=0), 2)
+        self.conn.execute("DELETE FROM Outbox_Consumer")
+        self.conn.commit()
+        self.assertEqual(prune_outbox(self.conn, keep_days=30, pause=0), 1)
+        self.assertEqual(self.conn.execute("SELECT created FROM Outbox").fetchall(), [("9999-01-01",)])
+
+    def test_prune_idempotency_keys(self):
+        self.conn.executemany("INSERT INTO Idempotency_Key (userID, endpoint, idempotencyKey, result, created) "
+                              "VALUES (1, 'client_payment', ?, '/', ?)", [("old", "2000-01-01"), ("new", "9999-01-01")])
+        self.conn.commit()
+        self.assertEqual(prune_idempotency_keys(self.conn, pause=0), 1)
+        self.assertEqual(self.conn.execute("SELECT idempotencyKey FROM Idempotency_Key").fetchall(), [("new",)])
+
+    def test_incremental_vacuum_reclaims_pages(self):
+        # New databases start out with incremental vacuum
+        self.assertFalse(enable_incremental_vacuum(self.conn))
+        self.conn.execute("CREATE TABLE Filler (data TEXT)")
+        self.conn.executemany("INSERT INTO Filler VALUES (?)", [("x" * 1000,)] * 200)
+        self.conn.commit()
+        self.conn.execute("DROP TABLE Filler")
+        self.conn.commit()
+        self.assertGreater(incremental_vacuum(self.conn, pause=0), 0)
+        self.assertEqual(self.conn.execute("PRAGMA main.freelist_count").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
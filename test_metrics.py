@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+import metrics
+from fixtures import DatabaseTestCase
+
+
+class TestMetrics(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Workers share their numbers through snapshot files, so those need a real directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old = (metrics.METRICS_DIR, metrics.METRICS_TOKEN)
+        metrics.METRICS_DIR = self.tmp.name
+        metrics.METRICS_TOKEN = "secret"
+
+    def tearDown(self):
+        metrics.METRICS_DIR, metrics.METRICS_TOKEN = self.old
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_requests_are_counted_and_timed(self):
+        self.client.get("/help")
+        body = self.client.get("/metrics", headers={"Authorization": "Bearer secret"}).get_data(as_text=True)
+        self.assertIn('http_requests_total{endpoint="help_page",method="GET",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="help_page",le="+Inf"}', body)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('sqlite_connections_open{pid="%d"}' % os.getpid(), body)
+
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+        metrics.METRICS_TOKEN = ""
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer "}).status_code, 404)
+
+    def test_snapshots_from_other_workers_are_summed(self):
+        metrics.inc("logins_total", 2, result="ok")
+        metrics.flush(force=True)
+        # A worker that has since exited: its counters still count, its gauges do not
+        other = {
+            "counters": [["logins_total", [["result", "ok"]], 3]],
+            "histograms": [],
+            "gauges": [["sqlite_connections_open", [["pid", "999999999"]], 4]],
+        }
+        with open(os.path.join(self.tmp.name, "metrics-999999999.json"), "w") as f:
+            json.dump(other, f)
+
+        counters, _, gauges = metrics.collect()
+        self.assertGreaterEqual(counters[("logins_total", (("result", "ok"),))], 5)
+        self.assertNotIn(("sqlite_connections_open", (("pid", "999999999"),)), gauges)
+
+    def test_connection_collected_during_flush_does_not_deadlock(self):
+        conn = metrics.TimedConnection(":memory:")
+        with metrics._lock:
+            # What the garbage collector does if it runs inside flush()
+            conn.__del__()
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+import app as app_module
+import notifications
+from fixtures import DatabaseTestCase
+
+
+class TestNotifications(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_poll = notifications.POLL_INTERVAL
+        self.old_timeout = notifications.STREAM_TIMEOUT
+        notifications.POLL_INTERVAL = 0.01
+        self.client_user, self.client_id = self.create_user("cl", "client", firstName="Cli", lastName="Ent")
+        self.contractor_user, self.contractor_id = self.create_user("co", "contractor",
+                                                                    firstName="Con", lastName="Tractor")
+        self.job_id = self.conn.execute("INSERT INTO Job_Request (clientID, service, date_posted) "
+                                        "VALUES (?, 'Roof', DATE('now'))", (self.client_id,)).lastrowid
+        self.conn.commit()
+        self.broker = notifications.Broker(app_module.get_db)
+
+    def tearDown(self):
+        # Watcher threads exit once their last subscriber is gone
+        for broker in (self.broker, app_module.app.extensions["notifications"]):
+            thread = broker._thread
+            if thread is not None:
+                thread.join()
+        notifications.POLL_INTERVAL = self.old_poll
+        notifications.STREAM_TIMEOUT = self.old_timeout
+        super().tearDown()
+
+    def claim(self):
+        self.conn.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))",
+                          (self.job_id, self.contractor_id))
+        self.conn.commit()
+
+    def test_triggers_record_events_for_the_right_user(self):
+        self.claim()
+        self.conn.execute("UPDATE Contractor_Claim_Request SET status='Accepted'")
+        self.conn.execute("INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date) VALUES (?, ?, ?, 50, 'Cash', DATE('now'))",
+                          (self.job_id, self.client_id, self.contractor_id))
+        rows = self.conn.execute("SELECT userID, kind, service FROM Notification ORDER BY eventID").fetchall()
+        self.assertEqual(rows, [(self.client_user, "claim", "Roof"),
+                                (self.contractor_user, "approval", "Roof"),
+                                (self.contractor_user, "payment", "Roof")])
+
+    def test_commit_from_another_connection_reaches_subscriber(self):
+        broker = self.broker
+        subscriber = broker.subscribe(self.client_user)
+        try:
+            other = broker.subscribe(self.contractor_user)
+            # Let the watcher read its starting point before anything is committed
+            broker._thread.join(0.1)
+            self.claim()
+            event = subscriber.get(timeout=2)
+            self.assertEqual((event.kind, event.jobID, event.contractorName), ("claim", self.job_id, "Con Tractor"))
+            self.assertTrue(other.empty())
+        finally:
+            broker.unsubscribe(self.client_user, subscriber)
+            broker.unsubscribe(self.contractor_user, other)
+
+    def test_stream_replays_after_last_event_id(self):
+        self.claim()
+        self.claim()
+        first = self.conn.execute("SELECT MIN(eventID) FROM Notification").fetchone()[0]
+        notifications.STREAM_TIMEOUT = 0
+        self.assertEqual(self.client.get("/events").status_code, 401)
+        self.login("cl")
+        response = self.client.get("/events", headers={"Last-Event-ID": str(first)})
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertNotIn(f"id: {first}\n", body)
+        self.assertIn(f"id: {first + 1}\nevent: claim\n", body)
+
+    def test_streams_beyond_the_cap_fall_back_to_polling(self):
+        self.claim()
+        first = self.conn.execute("SELECT MIN(eventID) FROM Notification").fetchone()[0]
+        self.claim()
+        old_cap, notifications.MAX_STREAMS = notifications.MAX_STREAMS, 0
+        try:
+            self.login("cl")
+            body = self.client.get("/events").get_data(as_text=True)
+            self.assertEqual(body, f"retry: {notifications.POLL_RETRY_MS}\n\nid: {first + 1}\n\n")
+            body = self.client.get("/events", headers={"Last-Event-ID": str(first)}).get_data(as_text=True)
+            self.assertTrue(body.startswith(f"retry: {notifications.POLL_RETRY_MS}\n\n"))
+            self.assertIn(f"id: {first + 1}\nevent: claim\n", body)
+        finally:
+            notifications.MAX_STREAMS = old_cap
+        broker = app_module.app.extensions["notifications"]
+        self.assertTrue(broker.open_stream())
+        broker.close_stream()
+
+
+if __name__ == "__main__":
+    unittest.main()
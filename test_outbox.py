@@ -0,0 +1,116 @@
+import json
+import sqlite3
+import unittest
+
+import outbox
+from archive import archive_jobs, attach_archive
+from fixtures import DatabaseTestCase
+
+TOKEN = {"Authorization": "Bearer secret"}
+
+
+class TestOutbox(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_token, outbox.OUTBOX_TOKEN = outbox.OUTBOX_TOKEN, "secret"
+        self.client_user, self.client_id = self.create_user("cli", "client")
+        _, self.contractor_id = self.create_user("con", "contractor")
+
+    def tearDown(self):
+        outbox.OUTBOX_TOKEN = self.old_token
+        super().tearDown()
+
+    def topics(self, after=0):
+        return [event.topic for event in outbox.read(self.conn, after, 1000)]
+
+    def latest(self):
+        return self.conn.execute("SELECT IFNULL(MAX(eventID), 0) FROM Outbox").fetchone()[0]
+
+    def test_job_lifecycle_through_the_routes(self):
+        self.assertEqual(self.topics(), ["user.registered", "client.profile", "user.registered", "contractor.profile"])
+        start = self.latest()
+        self.login("cli")
+        self.client.post("/jobrequests/new", data={"service": "Roof"})
+        job_id = self.conn.execute("SELECT MAX(jobID) FROM Job_Request").fetchone()[0]
+        self.client.get("/logout")
+        self.login("con")
+        self.client.get(f"/request_claim/{job_id}")
+        self.client.get("/logout")
+        self.login("cli")
+        self.client.get(f"/approve_contractor/{job_id}/{self.contractor_id}")
+        self.client.post(f"/jobrequests/complete/{job_id}", data={"rating": 5, "payment": 100})
+        self.client.post(f"/jobrequests/approval/{job_id}", data={"decision": "Approved"})
+        self.client.post(f"/jobrequests/payment/{job_id}", data={"amount": 100, "method": "Cash"})
+
+        self.assertEqual(self.topics(start), [
+            "job.posted", "claim.requested", "claim.accepted", "job.assigned",
+            "review.posted", "job.completed", "job.approved", "payment.received"])
+        (posted,) = outbox.read(self.conn, start, 1)
+        self.assertEqual((posted.entityID, json.loads(posted.payload)["service"]), (job_id, "Roof"))
+
+    def test_rolled_back_writes_leave_no_events(self):
+        start = self.latest()
+        self.conn.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Roof', DATE('now'))",
+                          (self.client_id,))
+        self.conn.rollback()
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.conn:
+                self.conn.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Roof', DATE('now'))",
+                                  (self.client_id,))
+                self.conn.execute("INSERT INTO Review (jobID, clientID, contractorID, rating, date) VALUES (1, 1, 1, 9, DATE('now'))")
+        self.assertEqual(self.latest(), start)
+
+    def add_job(self, status, posted="DATE('now')"):
+        job_id = self.conn.execute(f"""
+            INSERT INTO Job_Request (clientID, contractorID, service, status, client_approval, date_posted)
+            VALUES (?, ?, 'Roof', ?, 'Approved', {posted})
+        """, (self.client_id, self.contractor_id, status)).lastrowid
+        self.conn.execute("INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date) "
+                          "VALUES (?, ?, ?, 10, 'Cash', DATE('now'))", (job_id, self.client_id, self.contractor_id))
+        self.conn.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, status, date_requested) "
+                          "VALUES (?, ?, 'Accepted', DATE('now'))", (job_id, self.contractor_id))
+        self.conn.commit()
+        return job_id
+
+    def test_deleted_and_archived_jobs_are_told_apart(self):
+        deleted, archived = self.add_job("Completed"), self.add_job("Completed", "DATE('now', '-200 days')")
+        start = self.latest()
+        self.login("cli")
+        self.client.get(f"/jobrequests/delete/{deleted}")
+        attach_archive(self.conn, ":memory:")
+        self.assertEqual(archive_jobs(self.conn, 90), 1)
+
+        events = [(event.topic, json.loads(event.payload)["jobID"]) for event in outbox.read(self.conn, start, 1000)]
+        self.assertEqual(events, [("claim.deleted", deleted), ("job.deleted", deleted),
+                                  ("claim.archived", archived), ("job.archived", archived)])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM Archive_Run").fetchone()[0], 0)
+
+    def test_feed_and_consumers(self):
+        for service in ("Roof", "Sink", "Deck"):
+            self.conn.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, ?, DATE('now'))",
+                              (self.client_id, service))
+        self.conn.execute("INSERT INTO Company (name) VALUES ('Acme')")
+        self.conn.commit()
+
+        self.assertEqual(self.client.get("/outbox/events").status_code, 401)
+        page = self.client.get("/outbox/events?topics=job&limit=2", headers=TOKEN).get_json()
+        self.assertEqual([event["data"]["service"] for event in page["events"]], ["Roof", "Sink"])
+        page = self.client.get(f"/outbox/events?topics=job,company.added&after={page['next']}", headers=TOKEN).get_json()
+        self.assertEqual([event["topic"] for event in page["events"]], ["job.posted", "company.added"])
+
+        lines = self.client.get("/outbox/events.ndjson?after=4", headers=TOKEN).get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["topic"] for line in lines], ["job.posted"] * 3 + ["company.added"])
+
+        ack = self.client.post("/outbox/consumers/search", json={"position": page["next"]}, headers=TOKEN)
+        self.assertEqual(ack.get_json(), {"name": "search", "position": page["next"]})
+        self.client.post("/outbox/consumers/search", json={"position": 1}, headers=TOKEN)
+        self.assertEqual(outbox.position(self.conn, "search"), page["next"])
+        self.assertEqual(outbox.position(self.conn, "unknown"), 0)
+
+    def test_feed_is_off_without_a_token(self):
+        outbox.OUTBOX_TOKEN = ""
+        self.assertEqual(self.client.get("/outbox/events", headers=TOKEN).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
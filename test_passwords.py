@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+
+import passwords
+from fixtures import DatabaseTestCase
+from passwords import Busy, HashPool
+
+
+class TestPasswords(unittest.TestCase):
+    def test_hash_and_verify(self):
+        stored = passwords.hash_password("hunter2")
+        self.assertTrue(stored.startswith("scrypt$"))
+        self.assertNotEqual(stored, passwords.hash_password("hunter2"))
+        self.assertTrue(passwords.verify_password("hunter2", stored))
+        self.assertFalse(passwords.verify_password("hunter3", stored))
+        self.assertFalse(passwords.verify_password("", None))
+        self.assertFalse(passwords.needs_rehash(stored))
+
+    def test_legacy_and_outdated_passwords(self):
+        self.assertTrue(passwords.verify_password("pw", "pw"))
+        self.assertFalse(passwords.verify_password("pw2", "pw"))
+        self.assertTrue(passwords.needs_rehash("pw"))
+        old_n, passwords.SCRYPT_N = passwords.SCRYPT_N, 2 ** 10
+        try:
+            weak = passwords.hash_password("pw")
+        finally:
+            passwords.SCRYPT_N = old_n
+        self.assertTrue(passwords.verify_password("pw", weak))
+        self.assertTrue(passwords.needs_rehash(weak))
+
+    def test_pool_sheds_work_beyond_its_queue(self):
+        pool = HashPool(workers=0, queue=1)
+        started, release = threading.Semaphore(0), threading.Event()
+
+        def slow():
+            started.release()
+            release.wait()
+            return "done"
+
+        threads = [threading.Thread(target=pool.run, args=(slow,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            started.acquire()
+        with self.assertRaises(Busy):
+            pool.run(slow)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.run(str, 1), "1")
+
+    def test_pool_hashes_in_another_process(self):
+        pool = HashPool(workers=1, queue=0)
+        try:
+            self.assertTrue(passwords._verify("pw", pool.run(passwords._hash, "pw", 2 ** 10, 8, 1)))
+        finally:
+            pool.shutdown()
+
+    def test_slow_hashes_time_out_but_keep_their_slot(self):
+        pool = HashPool(workers=1, queue=0)
+        # Start the worker process before the timeout is cut short
+        pool.run(str, 0)
+        old_timeout, passwords.HASH_TIMEOUT = passwords.HASH_TIMEOUT, 0.05
+        try:
+            with self.assertRaises(Busy):
+                pool.run(time.sleep, 1)
+            # Still sleeping in the pool, so there is no room for another
+            with self.assertRaises(Busy):
+                pool.run(str, 1)
+            time.sleep(1.5)
+            self.assertEqual(pool.run(str, 1), "1")
+        finally:
+            passwords.HASH_TIMEOUT = old_timeout
+            pool.shutdown()
+
+
+
+class TestLogin(DatabaseTestCase):
+    def stored(self, username):
+        return self.conn.execute("SELECT password FROM User WHERE username=?", (username,)).fetchone()[0]
+
+    def test_register_stores_a_hash(self):
+        self.client.post("/register", data={"username": "new", "password": "s3cret", "role": "client"})
+        self.assertTrue(self.stored("new").startswith("scrypt$"))
+        self.assertEqual(self.login("new", "s3cret").headers["Location"], "/dashboard")
+        self.assertEqual(self.login("new", "wrong").get_data(as_text=True), "Invalid credentials")
+        self.assertEqual(self.login("nobody", "s3cret").get_data(as_text=True), "Invalid credentials")
+
+    def test_login_rehashes_plain_passwords(self):
+        self.create_user("old", "client", password="pw")
+        self.assertEqual(self.login("old", "nope").get_data(as_text=True), "Invalid credentials")
+        self.assertEqual(self.stored("old"), "pw")
+        self.assertEqual(self.login("old", "pw").status_code, 302)
+        stored = self.stored("old")
+        self.assertTrue(passwords.verify_password("pw", stored) and stored != "pw")
+        self.assertEqual(self.login("old", "pw").status_code, 302)
+        self.assertEqual(self.stored("old"), stored)
+
+    def test_busy_pool_answers_503(self):
+        self.client.post("/register", data={"username": "new", "password": "s3cret", "role": "client"})
+        old_pool, passwords.pool = passwords.pool, HashPool(workers=0, queue=0)
+        passwords.pool._slots.acquire()
+        try:
+            response = self.login("new", "s3cret")
+        finally:
+            passwords.pool = old_pool
+        self.assertEqual((response.status_code, response.headers["Retry-After"]), (503, "1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+import app as app_module
+import pricing
+from fixtures import DatabaseTestCase
+from pricing import TDigest
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class TestTDigest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(5, 0.8) for _ in range(20000)]
+
+    def assertClose(self, digest, values):
+        for q in (0.1, 0.5, 0.9, 0.99):
+            expected = exact_quantile(values, q)
+            self.assertAlmostEqual(digest.quantile(q), expected, delta=expected * 0.03, msg=q)
+
+    def test_quantiles(self):
+        digest = TDigest()
+        for value in self.values:
+            digest.add(value)
+        self.assertClose(digest, self.values)
+        self.assertLess(len(digest.centroids), 2 * pricing.COMPRESSION)
+
+    def test_small_samples_are_exact(self):
+        digest = TDigest()
+        for value in (30, 10, 20):
+            digest.add(value)
+        self.assertEqual(digest.quantile(0.5), 20)
+        self.assertEqual(digest.quantile(0), 10)
+        self.assertEqual(digest.quantile(1), 30)
+
+    def test_merge_and_round_trip(self):
+        halves = TDigest(), TDigest()
+        for i, value in enumerate(self.values):
+            halves[i % 2].add(value)
+        merged = TDigest.from_bytes(halves[0].to_bytes())
+        merged.merge(TDigest.from_bytes(halves[1].to_bytes()))
+        self.assertEqual(merged.count, len(self.values))
+        self.assertClose(merged, self.values)
+
+
+class TestPriceGuidance(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("cli", "client", state="tx")
+        _, self.contractor_id = self.create_user("con", "contractor")
+        _, self.other_client = self.create_user("far", "client", state="ME")
+
+    def approved_job(self, service, client_id=None):
+        cur = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, contractorID, service, status, client_approval, date_posted)
+            VALUES (?, ?, ?, 'Completed', 'Approved', DATE('now'))
+        """, (client_id or self.client_id, self.contractor_id, service))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def pay(self, service, amount):
+        job_id = self.approved_job(service)
+        response = self.client.post(f"/jobrequests/payment/{job_id}", data={"amount": amount, "method": "Cash"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_payments_feed_guidance(self):
+        self.login("cli")
+        for amount in (100, 200, 300, 400):
+            self.pay("Roofing", amount)
+        self.pay("roofing ", 1000)
+        self.pay("Painting", 50)
+
+        rows = self.conn.execute("SELECT service, region, count FROM Price_Sketch ORDER BY region, service").fetchall()
+        self.assertEqual(rows, [("Painting", "", 1), ("Roofing", "", 5), ("Painting", "TX", 1), ("Roofing", "TX", 5)])
+        (roofing,) = pricing.guidance(self.conn, "TX")
+        self.assertEqual((roofing.service, roofing.median), ("Roofing", 300))
+
+        body = self.client.get("/jobrequests/new").get_data(as_text=True)
+        self.assertIn("<td>$300.00</td>", body)
+        self.assertNotIn("Painting", body)
+
+    def test_other_regions_fall_back_to_everywhere(self):
+        self.login("cli")
+        for amount in (100, 200, 300):
+            self.pay("Roofing", amount)
+        rows = pricing.guidance(self.conn, "ME")
+        self.assertEqual([(row.service, row.count) for row in rows], [("Roofing", 3)])
+
+    def test_rebuild_matches_incremental(self):
+        self.login("cli")
+        for amount in (120, 80, 95, 400):
+            self.pay("Plumbing", amount)
+        before = self.conn.execute("SELECT * FROM Price_Sketch ORDER BY region").fetchall()
+        pricing.rebuild_sketches(self.conn)
+        self.assertEqual(self.conn.execute("SELECT * FROM Price_Sketch ORDER BY region").fetchall(), before)
+
+    def test_upgraded_database_is_rebuilt_once(self):
+        self.login("cli")
+        for amount in (120, 80, 95):
+            self.pay("Plumbing", amount)
+        before = self.conn.execute("SELECT * FROM Price_Sketch ORDER BY region").fetchall()
+        # As left by create_price_sketches on a database that already had payments
+        self.conn.execute("DELETE FROM Price_Sketch")
+        self.conn.execute("INSERT INTO Pending_Rebuild (name) VALUES ('price_sketches')")
+        self.conn.commit()
+        app_module.init_db()
+        self.assertEqual(self.conn.execute("SELECT * FROM Price_Sketch ORDER BY region").fetchall(), before)
+        self.conn.execute("DELETE FROM Price_Sketch")
+        self.conn.commit()
+        app_module.init_db()
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM Price_Sketch").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
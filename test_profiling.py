@@ -0,0 +1,61 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import app as app_module
+import profiling
+from fixtures import DatabaseTestCase
+
+
+class TestProfiling(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Profiles are written out as files, so they need a real directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old = (profiling.PROFILING_ENABLED, profiling.PROFILE_TOKEN, profiling.PROFILE_DIR)
+        profiling.PROFILING_ENABLED = True
+        profiling.PROFILE_TOKEN = "letmein"
+        profiling.PROFILE_DIR = self.tmp.name
+
+    def tearDown(self):
+        profiling.PROFILING_ENABLED, profiling.PROFILE_TOKEN, profiling.PROFILE_DIR = self.old
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_request_without_token_is_not_profiled(self):
+        response = self.client.get("/help?_profile=wrong")
+        self.assertNotIn("X-Profile-File", response.headers)
+        self.assertFalse([n for n in os.listdir(self.tmp.name) if n.endswith(".folded")])
+
+    def test_profiled_request_writes_collapsed_stacks(self):
+        response = self.client.get("/help", headers={"X-Profile": "letmein"})
+        self.assertEqual(response.status_code, 200)
+        path = response.headers["X-Profile-File"]
+        self.assertTrue(path.endswith(".folded"))
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(path[:-len(".folded")] + ".json"))
+        self.assertGreater(int(response.headers["X-Profile-Peak-Memory"]), 0)
+
+    def test_disabled_by_config(self):
+        profiling.PROFILING_ENABLED = False
+        response = self.client.get("/help?_profile=letmein")
+        self.assertNotIn("X-Profile-File", response.headers)
+
+    def test_rows_read_from_a_cursor_count_as_sql(self):
+        conn = app_module.get_db()
+        sampler = profiling.Sampler(threading.get_ident())
+        sampler.start()
+        # A few slow steps, so nearly every sample lands inside TimedCursor.__next__
+        rows = conn.execute("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000000)
+            SELECT i FROM n WHERE i % 500000 = 0
+        """)
+        self.assertEqual(len(list(rows)), 6)
+        sampler.stop()
+        conn.close()
+        self.assertGreater(sampler.categories["sql"], sampler.categories["python"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import sqlite3
+import unittest
+
+import app as app_module
+import queries
+from archive import attach_archive
+from fixtures import DatabaseTestCase
+
+
+class TestQueryRegistry(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = app_module.get_db()
+        attach_archive(self.db, ":memory:")
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def test_every_statement_compiles_against_the_schema(self):
+        for name, query in queries.REGISTRY.items():
+            with self.subTest(name):
+                try:
+                    self.db.execute("EXPLAIN " + query.sql, (None,) * query.sql.count("?"))
+                except sqlite3.Error as e:
+                    self.fail(f"{name}: {e}")
+
+    def test_no_select_star(self):
+        for name, query in queries.REGISTRY.items():
+            self.assertNotIn("*", query.sql.replace("COUNT(*)", ""), name)
+
+    def test_rows_are_named_tuples(self):
+        queries.INSERT_COMPANY(self.db, ("Acme", "Roofing", "Austin"))
+        company = queries.ALL_COMPANIES.one(self.db)
+        self.assertIsInstance(company, tuple)
+        self.assertEqual(company.name, "Acme")
+        self.assertEqual(company._fields, ("companyID", "name", "serviceType", "location"))
+
+    def test_statement_cache_holds_every_query(self):
+        self.assertGreaterEqual(queries.STATEMENT_CACHE_SIZE, len(queries.REGISTRY))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import re
+import unittest
+
+import app as app_module
+import queries
+from archive import attach_archive
+from fixtures import DatabaseTestCase
+
+# Tables that grow with usage; a full scan of any of them is a regression
+LARGE_TABLES = {
+    "User", "Client", "Contractor", "Job_Request", "Job_Card", "Review", "Contractor_Claim_Request",
+    "Transactions", "Notification", "Client_Summary", "Contractor_Summary", "Price_Sketch",
+    "Analytics_Hourly", "Analytics_Daily", "Outbox",
+}
+
+# Statements allowed to scan a large table, and why
+ALLOWED_SCANS = {
+    "contractors_with_rating": "/contractors lists every contractor",
+    "reviews_by_contractor": "/contractors lists every review alongside its contractor",
+    "contractor_standings": "leaderboards are rebuilt from every contractor",
+    "all_payments": "pricing.rebuild_sketches() reads every payment",
+}
+
+_TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_NOT_ALIASES = {"WHERE", "JOIN", "LEFT", "INNER", "ON", "SET", "ORDER", "GROUP", "LIMIT", "VALUES", "USING"}
+
+
+def _aliases(sql):
+    """Map every name a plan may use for a table (the table or its alias) to the table."""
+    names = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        names[table] = table
+        if alias and alias.upper() not in _NOT_ALIASES:
+            names[alias] = table
+    return names
+
+
+def seed(conn, clients=200, contractors=100, jobs_per_client=10):
+    """Enough rows, in production's proportions, for the planner's statistics to matter."""
+    cur = conn.cursor()
+    for i in range(5):
+        cur.execute("INSERT INTO Company (name, serviceType) VALUES (?, 'General')", (f"Company {i}",))
+    for i in range(contractors):
+        cur.execute("INSERT INTO User (username, password, role) VALUES (?, 'pw', 'contractor')", (f"co{i}",))
+        cur.execute("INSERT INTO Contractor (userID, firstName, lastName, service, companyID) VALUES (?, 'C', ?, 'Plumbing', ?)",
+                    (cur.lastrowid, str(i), i % 5 + 1))
+    for i in range(clients):
+        cur.execute("INSERT INTO User (username, password, role) VALUES (?, 'pw', 'client')", (f"cl{i}",))
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (?, 'L', ?)", (cur.lastrowid, str(i)))
+        client_id = cur.lastrowid
+        for j in range(jobs_per_client):
+            contractor_id = (i * jobs_per_client + j) % contractors + 1
+            status = ("Pending", "In Progress", "Completed")[j % 3]
+            cur.execute("""
+                INSERT INTO Job_Request (clientID, contractorID, companyID, service, status, date_posted)
+                VALUES (?, ?, ?, 'Roof', ?, DATE('now', ?))
+            """, (client_id, contractor_id if status != "Pending" else None, j % 5 + 1, status, f"-{j} days"))
+            job_id = cur.lastrowid
+            if status == "Pending":
+                cur.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))",
+                            (job_id, contractor_id))
+            elif status == "Completed":
+                cur.execute("INSERT INTO Review (jobID, clientID, contractorID, rating, date) VALUES (?, ?, ?, 4, DATE('now'))",
+                            (job_id, client_id, contractor_id))
+                cur.execute("""
+                    INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date)
+                    VALUES (?, ?, ?, 100, 'Cash', DATE('now'))
+                """, (job_id, client_id, contractor_id))
+    # A year of daily rollups and two weeks of hourly ones
+    for days in range(1, 366):
+        for service in ("Roof", "Plumbing", "Painting"):
+            cur.execute("INSERT INTO Analytics_Daily (day, service, posted) VALUES (DATE('now', ?), ?, 1)",
+                        (f"-{days} days", service))
+            if days <= 14:
+                cur.executemany("INSERT INTO Analytics_Hourly (hour, service, posted) VALUES (STRFTIME('%Y-%m-%d %H:00', 'now', ?), ?, 1)",
+                                [(f"-{days * 24 + hour} hours", service) for hour in range(24)])
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+class TestQueryPlans(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        seed(self.conn)
+        self.db = app_module.get_db()
+        attach_archive(self.db, ":memory:")
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def plan(self, query):
+        rows = self.db.execute("EXPLAIN QUERY PLAN " + query.sql, (None,) * query.sql.count("?")).fetchall()
+        return [row[3] for row in rows]
+
+    def test_no_full_scans_of_large_tables(self):
+        for name, query in queries.REGISTRY.items():
+            if name in ALLOWED_SCANS:
+                continue
+            names = _aliases(query.sql)
+            with self.subTest(name):
+                for detail in self.plan(query):
+                    match = re.match(r"SCAN (\w+)", detail)
+                    if match and names.get(match.group(1), match.group(1)) in LARGE_TABLES:
+                        self.fail(f"{name}: {detail}")
+
+    def test_no_sort_for_order_by_date_posted(self):
+        for name, query in queries.REGISTRY.items():
+            if not re.search(r"ORDER BY[^;]*date_posted", query.sql, re.I):
+                continue
+            with self.subTest(name):
+                self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", self.plan(query), name)
+
+    def test_allowlist_is_current(self):
+        for name in ALLOWED_SCANS:
+            self.assertTrue(name in queries.REGISTRY, f"{name} is allowlisted but no longer exists")
+
+
+if __name__ == "__main__":
+    unittest.main()
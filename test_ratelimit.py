@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import ratelimit
+from fixtures import DatabaseTestCase
+
+
+class TestRateLimit(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Buckets are an mmap'd file shared between workers, so they need a real one
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ratelimit.bin")
+        self.old_limits = ratelimit.RATE_LIMIT_FILE
+        self.old_budgets = dict(ratelimit.BUDGETS)
+        ratelimit.RATE_LIMIT_FILE = self.path
+        ratelimit.RATE_LIMIT_ENABLED = True
+
+    def tearDown(self):
+        ratelimit.RATE_LIMIT_FILE = self.old_limits
+        ratelimit.BUDGETS.clear()
+        ratelimit.BUDGETS.update(self.old_budgets)
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_bucket_refills_over_time(self):
+        buckets = ratelimit.TokenBuckets(self.path)
+        self.assertEqual([buckets.take("k", 2, 10, now=100) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(buckets.take("k", 2, 10, now=100), 5)
+        self.assertEqual(buckets.take("k", 2, 10, now=105), 0)
+        self.assertEqual(buckets.take("other", 2, 10, now=105), 0)
+
+    def test_state_is_shared_through_the_file(self):
+        # Two instances stand in for two workers mapping the same file
+        first, second = ratelimit.TokenBuckets(self.path), ratelimit.TokenBuckets(self.path)
+        self.assertEqual(first.take("k", 1, 60, now=0), 0)
+        self.assertGreater(second.take("k", 1, 60, now=1), 0)
+
+    def test_parse_budgets(self):
+        self.assertEqual(ratelimit.parse_budgets("login=3/60, register=1/3600,"),
+                         {"login": (3, 60.0), "register": (1, 3600.0)})
+
+    def test_login_posts_are_limited_but_the_form_is_not(self):
+        ratelimit.BUDGETS["login"] = (2, 60)
+        statuses = [self.client.post("/login", data={"username": "x", "password": "y"}).status_code for _ in range(3)]
+        self.assertEqual(statuses[2], 429)
+        self.assertNotEqual(statuses[0], 429)
+        self.assertEqual(self.client.get("/login").status_code, 200)
+
+    def test_event_streams_are_limited(self):
+        ratelimit.BUDGETS["events"] = (1, 60)
+        self.assertEqual([self.client.get("/events").status_code for _ in range(2)], [401, 429])
+
+    def test_anonymous_clients_are_keyed_on_the_forwarded_address(self):
+        ratelimit.BUDGETS["login"] = (1, 60)
+
+        def log_in(address):
+            return self.client.post("/login", data={"username": "x", "password": "y"},
+                                    headers={"X-Forwarded-For": address}).status_code
+
+        # Both arrive from the same proxy; only the forwarded hop tells them apart
+        self.assertNotEqual(log_in("203.0.113.1"), 429)
+        self.assertNotEqual(log_in("203.0.113.2"), 429)
+        self.assertEqual(log_in("203.0.113.1"), 429)
+        # A client cannot pick its own bucket by prepending addresses
+        self.assertEqual(log_in("198.51.100.7, 203.0.113.1"), 429)
+
+
+if __name__ == "__main__":
+    unittest.main()
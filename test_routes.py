@@ -0,0 +1,69 @@
+import unittest
+
+from fixtures import DatabaseTestCase
+
+
+class TestRoutes(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("alice", "client")
+        _, self.contractor_id = self.create_user("bob", "contractor", service="Plumbing")
+
+    def post_job(self, service="Fix sink"):
+        self.login("alice")
+        self.client.post("/jobrequests/new", data={"service": service})
+        return self.conn.execute("SELECT MAX(jobID) FROM Job_Request").fetchone()[0]
+
+    def switch_to(self, username):
+        self.client.get("/logout")
+        self.login(username)
+
+    def test_register_and_login(self):
+        response = self.client.post("/register", data={"username": "carol", "password": "pw", "role": "client"})
+        self.assertEqual(response.headers["Location"], "/login")
+        response = self.login("carol")
+        self.assertEqual(response.headers["Location"], "/dashboard")
+        self.assertEqual(self.client.get("/dashboard/client").status_code, 200)
+        self.assertEqual(self.login("carol", "wrong").get_data(as_text=True), "Invalid credentials")
+
+    def test_roles_are_enforced(self):
+        self.login("bob")
+        self.assertEqual(self.client.get("/dashboard/client").status_code, 403)
+        self.assertEqual(self.client.post("/jobrequests/new", data={"service": "x"}).status_code, 403)
+
+    def test_claim_approve_complete_and_pay(self):
+        job_id = self.post_job()
+        self.assertIn(b"Fix sink", self.client.get("/jobrequests").data)
+
+        self.switch_to("bob")
+        self.assertIn(b"Fix sink", self.client.get("/dashboard/contractor/jobs").data)
+        self.client.get(f"/request_claim/{job_id}")
+
+        self.switch_to("alice")
+        self.assertIn(f"/approve_contractor/{job_id}/{self.contractor_id}".encode(),
+                      self.client.get("/dashboard/client").data)
+        self.client.get(f"/approve_contractor/{job_id}/{self.contractor_id}")
+        job = self.conn.execute("SELECT status, contractorID FROM Job_Request WHERE jobID=?", (job_id,)).fetchone()
+        self.assertEqual(job, ("In Progress", self.contractor_id))
+
+        self.client.post(f"/jobrequests/complete/{job_id}", data={"rating": "4", "review": "Good", "payment": "0"})
+        self.client.post(f"/jobrequests/approval/{job_id}", data={"decision": "Approved"})
+        response = self.client.post(f"/jobrequests/payment/{job_id}", data={"amount": "120", "method": "Cash"})
+        self.assertEqual(response.headers["Location"], f"/jobrequests/review/{job_id}")
+
+        earnings, rating = self.conn.execute("SELECT earnings, rating FROM Contractor WHERE contractorID=?",
+                                             (self.contractor_id,)).fetchone()
+        self.assertEqual((earnings, rating), (120, 4))
+        self.assertIn(b"Completed: 1", self.client.get("/dashboard/client").data)
+
+    def test_edit_and_delete_job(self):
+        job_id = self.post_job()
+        self.client.post(f"/jobrequests/edit/{job_id}", data={"service": "Paint fence"})
+        self.assertEqual(self.conn.execute("SELECT service FROM Job_Request WHERE jobID=?", (job_id,)).fetchone()[0],
+                         "Paint fence")
+        self.client.get(f"/jobrequests/delete/{job_id}")
+        self.assertIsNone(self.conn.execute("SELECT 1 FROM Job_Request WHERE jobID=?", (job_id,)).fetchone())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+import schedule
+from fixtures import DatabaseTestCase
+
+
+class TestParseWindow(unittest.TestCase):
+    def test_parse_window(self):
+        self.assertEqual(schedule.parse_window("", ""), (None, None))
+        self.assertEqual(schedule.parse_window("2025-06-30T09:00", "2025-06-30T11:30"),
+                         ("2025-06-30 09:00", "2025-06-30 11:30"))
+        for start, end in (("2025-06-30T09:00", ""), ("2025-06-30T09:00", "2025-06-30T09:00"), ("soon", "later")):
+            with self.subTest(start=start, end=end), self.assertRaises(ValueError):
+                schedule.parse_window(start, end)
+
+
+class TestSchedule(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client_id = self.create_user("cli", "client")
+        _, self.contractor_id = self.create_user("con", "contractor")
+
+    def job(self, start, end, contractor_id=None):
+        cur = self.conn.execute("""
+            INSERT INTO Job_Request (clientID, contractorID, service, status, scheduled_start, scheduled_end, date_posted)
+            VALUES (?, ?, 'Roof', ?, ?, ?, DATE('now'))
+        """, (self.client_id, contractor_id, "In Progress" if contractor_id else "Pending",
+              f"2025-07-01 {start}", f"2025-07-01 {end}"))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def assigned(self, job_id):
+        return self.conn.execute("SELECT contractorID FROM Job_Request WHERE jobID=?", (job_id,)).fetchone()[0]
+
+    def test_claim_rejects_overlapping_jobs(self):
+        busy = self.job("10:00", "12:00", self.contractor_id)
+        overlapping = self.job("11:00", "13:00")
+        adjacent = self.job("12:00", "14:00")
+        self.login("con")
+
+        response = self.client.get(f"/jobrequests/claim/{overlapping}", follow_redirects=True)
+        self.assertIn(f"overlaps job #{busy}", response.get_data(as_text=True))
+        self.assertIsNone(self.assigned(overlapping))
+
+        self.client.get(f"/jobrequests/claim/{adjacent}")
+        self.assertEqual(self.assigned(adjacent), self.contractor_id)
+
+        # Finishing a job frees its window
+        self.conn.execute("UPDATE Job_Request SET status='Completed' WHERE jobID=?", (busy,))
+        self.conn.commit()
+        self.client.get(f"/jobrequests/claim/{overlapping}")
+        self.assertIsNone(self.assigned(overlapping))  # still clashes with the 12:00 job
+        self.conn.execute("UPDATE Job_Request SET scheduled_start='2025-07-01 09:00', scheduled_end='2025-07-01 12:00' "
+                          "WHERE jobID=?", (overlapping,))
+        self.conn.commit()
+        self.client.get(f"/jobrequests/claim/{overlapping}")
+        self.assertEqual(self.assigned(overlapping), self.contractor_id)
+
+    def test_approval_respects_availability(self):
+        morning = self.job("08:00", "10:00")
+        evening = self.job("19:00", "21:00")
+        unscheduled = self.conn.execute(
+            "INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Sink', DATE('now'))", (self.client_id,)).lastrowid
+        self.conn.commit()
+        self.login("con")
+        self.client.post("/availability", data={"starts": "2025-07-01T07:00", "ends": "2025-07-01T18:00"})
+        body = self.client.get("/dashboard/contractor/jobs?available=1").get_data(as_text=True)
+        self.assertIn(f"Job #{morning} ", body)
+        self.assertNotIn(f"Job #{evening} ", body)
+        self.assertNotIn(f"Job #{unscheduled} ", body)
+
+        self.client.get("/logout")
+        self.login("cli")
+        self.client.get(f"/approve_contractor/{evening}/{self.contractor_id}")
+        self.assertIsNone(self.assigned(evening))
+        self.client.get(f"/approve_contractor/{morning}/{self.contractor_id}")
+        self.assertEqual(self.assigned(morning), self.contractor_id)
+        self.client.get(f"/approve_contractor/{unscheduled}/{self.contractor_id}")
+        self.assertEqual(self.assigned(unscheduled), self.contractor_id)
+
+    def test_edit_cannot_move_job_onto_another(self):
+        self.job("10:00", "12:00", self.contractor_id)
+        other = self.job("13:00", "14:00", self.contractor_id)
+        self.login("cli")
+        self.client.post(f"/jobrequests/edit/{other}", data={
+            "service": "Roof", "scheduled_start": "2025-07-01T11:00", "scheduled_end": "2025-07-01T14:00"})
+        window = self.conn.execute("SELECT scheduled_start FROM Job_Request WHERE jobID=?", (other,)).fetchone()[0]
+        self.assertEqual(window, "2025-07-01 13:00")
+
+    def test_index_follows_jobs(self):
+        job_id = self.job("10:00", "12:00")
+        index = "SELECT contractorLo, endMinute - startMinute FROM Job_Schedule WHERE jobID=?"
+        self.assertEqual(self.conn.execute(index, (job_id,)).fetchone(), (0, 120))
+        self.conn.execute("UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?", (self.contractor_id, job_id))
+        self.assertEqual(self.conn.execute(index, (job_id,)).fetchone(), (self.contractor_id, 120))
+        self.conn.execute("UPDATE Job_Request SET status='Cancelled' WHERE jobID=?", (job_id,))
+        self.assertIsNone(self.conn.execute(index, (job_id,)).fetchone())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import sqlite3
+import unittest
+
+import app as app_module
+from fixtures import DatabaseTestCase, memory_uri
+from migrations import MIGRATIONS
+
+
+class TestStartup(DatabaseTestCase):
+    def test_profiles(self):
+        self.assertTrue(app_module.create_app("testing").testing)
+        self.assertTrue(app_module.create_app("development").debug)
+        production = app_module.create_app("production")
+        self.assertIsNotNone(production.jinja_env.bytecode_cache)
+        self.assertFalse(production.jinja_env.auto_reload)
+
+    def test_every_app_gets_the_routes(self):
+        other = app_module.create_app("testing")
+        self.assertEqual({rule.endpoint for rule in other.url_map.iter_rules()},
+                         {rule.endpoint for rule in app_module.app.url_map.iter_rules()})
+        self.assertEqual(other.test_client().get("/login").status_code, 200)
+        self.assertIsNot(other.extensions["leaderboards"], app_module.boards)
+        self.assertIn("maintenance", other.cli.commands)
+
+    def test_warm_up_migrates_and_compiles_templates(self):
+        # An empty database rather than the migrated clone
+        app_module._schema_ready.discard(app_module.DB_FILE)
+        app_module.DB_FILE = memory_uri("empty")
+        conn = sqlite3.connect(app_module.DB_FILE, uri=True)
+        app_module.warm_up()
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], len(MIGRATIONS))
+        conn.close()
+        self.assertIn(app_module.DB_FILE, app_module._schema_ready)
+        env = app_module.app.jinja_env
+        # Compiled templates are in the environment's cache before any request
+        loaded = {key[1] for key in env.cache.keys()}
+        self.assertTrue(set(env.list_templates()) <= loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
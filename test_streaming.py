@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import app as app_module
+import metrics
+from fixtures import DatabaseTestCase
+
+
+class TestStreamedPages(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO User (username, password, role) VALUES ('client1', 'pw', 'client')")
+        self.client_user = cur.lastrowid
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (?, 'Cli', 'Ent')", (self.client_user,))
+        client_id = cur.lastrowid
+        contractors = []
+        for name in ("Ann", "Bob", "Cat"):
+            cur.execute("INSERT INTO Contractor (userID, firstName, lastName) VALUES (?, ?, 'Smith')", (100 + len(contractors), name))
+            contractors.append(cur.lastrowid)
+        # Reviews for the first and last contractor only
+        for contractor_id, comment in ((contractors[2], "Tidy work"), (contractors[0], "On time"), (contractors[2], "Again!")):
+            cur.execute("""
+                INSERT INTO Review (jobID, clientID, contractorID, rating, comment, date) VALUES (1, ?, ?, 4, ?, DATE('now'))
+            """, (client_id, contractor_id, comment))
+        for i in range(30):
+            cur.execute("""
+                INSERT INTO Job_Request (clientID, service, status, date_posted) VALUES (?, ?, 'Pending', DATE('now'))
+            """, (client_id, f"Job {i}"))
+        self.conn.commit()
+
+        with self.client.session_transaction() as sess:
+            sess["user_id"] = self.client_user
+            sess["role"] = "client"
+
+    def test_contractors_page_pairs_reviews_with_contractors(self):
+        response = self.client.get("/contractors")
+        self.assertTrue(response.is_streamed)
+        html = response.get_data(as_text=True)
+        ann, bob, cat = html.index("Ann"), html.index("Bob"), html.index("Cat")
+        self.assertLess(ann, html.index("On time"))
+        self.assertLess(html.index("On time"), bob)
+        self.assertLess(bob, html.index("No reviews yet."))
+        self.assertLess(cat, html.index("Tidy work"))
+        self.assertLess(cat, html.index("Again!"))
+
+    def test_job_requests_page_streams_every_row(self):
+        response = self.client.get("/jobrequests")
+        html = response.get_data(as_text=True)
+        for i in range(30):
+            self.assertIn(f"Job {i}<", html)
+
+    def test_flash_is_shown_once(self):
+        with self.client.session_transaction() as sess:
+            sess["_flashes"] = [("success", "Saved!")]
+        self.assertIn("Saved!", self.client.get("/contractors").get_data(as_text=True))
+        self.assertNotIn("Saved!", self.client.get("/contractors").get_data(as_text=True))
+
+    def test_db_time_includes_rows_read_while_streaming(self):
+        def counter(name):
+            return metrics._counters.get(metrics._key(name, {"endpoint": "view_jobrequests"}), 0)
+
+        before = counter("db_time_seconds_total"), counter("db_queries_total")
+        with mock.patch.object(metrics, "_record_db_time", wraps=metrics._record_db_time) as recorded:
+            response = self.client.get("/jobrequests")
+            self.assertEqual(counter("db_queries_total"), before[1])
+            recorded.reset_mock()
+            response.get_data()
+            response.close()
+        self.assertTrue(recorded.called)
+        self.assertGreater(counter("db_time_seconds_total"), before[0])
+        self.assertGreater(counter("db_queries_total"), before[1])
+
+    def test_connection_is_closed_when_the_page_is_never_read(self):
+        before = metrics._open_connections
+        response = self.client.get("/jobrequests")
+        self.assertGreater(metrics._open_connections, before)
+        response.close()
+        self.assertEqual(metrics._open_connections, before)
+
+    def test_writes_go_through_while_a_page_streams(self):
+        # WAL only exists for databases on disk
+        with tempfile.TemporaryDirectory() as tmp:
+            app_module.DB_FILE = os.path.join(tmp, "project.db")
+            app_module.init_db()
+            writer = sqlite3.connect(app_module.DB_FILE, timeout=0.2)
+            writer.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (?, 'Cli', 'Ent')",
+                           (self.client_user,))
+            writer.executemany("INSERT INTO Job_Request (clientID, service, status, date_posted) "
+                               "VALUES (1, ?, 'Pending', DATE('now'))", [(f"Job {i} " + "x" * 200,) for i in range(200)])
+            writer.commit()
+
+            response = self.client.get("/jobrequests")
+            chunks = iter(response.response)
+            next(chunks)
+            # The page is part way through its cursor
+            writer.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (1, 'Late', DATE('now'))")
+            writer.commit()
+            html = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+            response.close()
+            writer.close()
+        self.assertIn("Job 199 ", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from fixtures import DatabaseTestCase
+from migrations import CLIENT_SUMMARY_SELECT, CONTRACTOR_SUMMARY_SELECT
+
+
+class TestSummaries(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cur = self.conn.cursor()
+
+    def assertSummariesConsistent(self):
+        for table, select, key in (("Client_Summary", CLIENT_SUMMARY_SELECT, "clientID"),
+                                   ("Contractor_Summary", CONTRACTOR_SUMMARY_SELECT, "contractorID")):
+            expected = self.cur.execute(f"{select} ORDER BY s.{key}").fetchall()
+            # Columns added by later migrations are left out of the comparison
+            width = len(self.cur.description)
+            rows = [row[:width] for row in self.cur.execute(f"SELECT * FROM {table} ORDER BY {key}")]
+            self.assertEqual(rows, expected, table)
+
+    def test_triggers_keep_summaries_in_step(self):
+        cur = self.cur
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (1, 'Cli', 'Ent')")
+        client_id = cur.lastrowid
+        cur.execute("INSERT INTO Contractor (userID, firstName, lastName) VALUES (2, 'Con', 'Tractor')")
+        contractor_id = cur.lastrowid
+        cur.execute("INSERT INTO Contractor (userID, firstName, lastName) VALUES (3, 'Oth', 'Er')")
+        other_id = cur.lastrowid
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Roof', DATE('now'))", (client_id,))
+        job_id = cur.lastrowid
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Sink', DATE('now'))", (client_id,))
+        self.assertSummariesConsistent()
+
+        cur.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))", (job_id, contractor_id))
+        cur.execute("INSERT INTO Contractor_Claim_Request (jobID, contractorID, date_requested) VALUES (?, ?, DATE('now'))", (job_id, other_id))
+        self.assertSummariesConsistent()
+        self.assertEqual(cur.execute("SELECT pendingClaims FROM Client_Summary WHERE clientID=?", (client_id,)).fetchone()[0], 2)
+
+        cur.execute("UPDATE Contractor_Claim_Request SET status='Accepted' WHERE contractorID=?", (contractor_id,))
+        cur.execute("UPDATE Contractor_Claim_Request SET status='Declined' WHERE contractorID=?", (other_id,))
+        cur.execute("UPDATE Job_Request SET contractorID=?, status='In Progress' WHERE jobID=?", (contractor_id, job_id))
+        self.assertSummariesConsistent()
+
+        cur.execute("UPDATE Job_Request SET status='Completed', client_approval='Approved' WHERE jobID=?", (job_id,))
+        cur.execute("INSERT INTO Review (jobID, clientID, contractorID, rating, date) VALUES (?, ?, ?, 5, DATE('now'))", (job_id, client_id, contractor_id))
+        self.assertSummariesConsistent()
+        self.assertEqual(cur.execute("SELECT unpaidApprovedJobs FROM Contractor_Summary WHERE contractorID=?", (contractor_id,)).fetchone()[0], 1)
+
+        for amount in (40, 60):
+            cur.execute("INSERT INTO Transactions (jobID, clientID, contractorID, amount, method, date) VALUES (?, ?, ?, ?, 'Cash', DATE('now'))",
+                        (job_id, client_id, contractor_id, amount))
+        self.assertSummariesConsistent()
+        self.assertEqual(cur.execute("SELECT unpaidApprovedJobs, lifetimeSpend FROM Client_Summary WHERE clientID=?", (client_id,)).fetchone(), (0, 100))
+
+        cur.execute("DELETE FROM Transactions")
+        cur.execute("DELETE FROM Review")
+        cur.execute("DELETE FROM Contractor_Claim_Request")
+        self.assertSummariesConsistent()
+
+    def test_archived_jobs_stay_in_lifetime_counts(self):
+        cur = self.cur
+        cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (1, 'Cli', 'Ent')")
+        cur.execute("INSERT INTO Job_Request (clientID, service, status, date_posted) VALUES (1, 'Roof', 'Completed', DATE('now'))")
+        cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (1, 'Sink', DATE('now'))")
+        cur.execute("DELETE FROM Job_Request")
+        row = cur.execute("SELECT pendingJobs, completedJobs FROM Client_Summary WHERE clientID=1").fetchone()
+        self.assertEqual(row, (0, 1))
+
+    def test_dashboard_reads_summary(self):
+        self.cur.execute("INSERT INTO User (username, password, role) VALUES ('c', 'pw', 'client')")
+        self.cur.execute("INSERT INTO Client (userID, firstName, lastName) VALUES (?, 'Cli', 'Ent')", (self.cur.lastrowid,))
+        self.cur.execute("INSERT INTO Job_Request (clientID, service, date_posted) VALUES (?, 'Roof', DATE('now'))", (self.cur.lastrowid,))
+        self.conn.commit()
+        self.login("c")
+        body = self.client.get("/dashboard/client").get_data(as_text=True)
+        self.assertIn("Pending: 1 |", body)
+        self.assertIn("No pending contractor requests", body)
+
+
+if __name__ == "__main__":
+    unittest.main()